@@ -0,0 +1,88 @@
+import buffers, compressed_files, threading, os
+from typing import Union
+
+
+
+#Autosaving writes the current buffer to it's file in the background, so saving a big buffer never stops typing. The editor
+#takes a snapshot of the text, see "buffers.snapshot_text", and an "AutosaveJob" writes it on it's own thread. The snapshot
+#is written to a temporary file next to the file, which then replaces it, so the file is always either the old version or the
+#new one, never half written. Lines modified while the job runs are copied first, so the snapshot doesn't change under it.
+#A compressed file is written compressed, on the job's thread, see "compressed_files.py". If the file changed outside the
+#editor since it was read or saved, it isn't replaced, the editor offers to merge the change instead, see "file_watcher.py".
+"""
+Example:
+Modifications:     1 2 3 4 5 6
+Snapshot taken:          ^       <- The job writes the text as it was after modification 3.
+Job finished:                ^   <- 2 modifications since the snapshot, so the buffer is still modified.
+"""
+
+#How long the editor waits before trying again after an autosave failed, in seconds.
+RETRY_INTERVAL = 30
+
+
+
+#Writing a snapshot of a buffer to it's file.
+class AutosaveJob:
+    def __init__(self, buffer: buffers.Buffer, path: str, text: list, modification_count: int, disk_stat: Union[tuple, None]) -> None:
+        #The buffer the snapshot belongs to, it might not be the current one anymore when the job finishes.
+        self.buffer = buffer
+        self.path = path
+        #How many modifications the buffer had when the snapshot was taken, those are saved once the job finishes.
+        self.modification_count = modification_count
+        #The changes made to the buffer while the job runs, as operations of "journal.RecoveryJournal.record". The recovery journal
+        #is started again from the new file with them, see "journal.py".
+        self.operations = []
+        #Whether writing failed, the file is left as it was.
+        self.failed = False
+        #The stat the file had when it was read or last saved, and whether it didn't have it anymore once the snapshot was
+        #written. The file is left as it was then too.
+        self.disk_stat = disk_stat
+        self.file_changed = False
+        #The stat of the file once it's written, see "buffers.file_stat".
+        self.stat = None
+
+        #Once written, the snapshot is the text that's on disk.
+        self.text = buffers.snapshot_text(text)[0]
+        self.done = threading.Event()
+
+        threading.Thread(target=self.writer, daemon=True).start()
+
+
+    def writer(self) -> None:
+        directory, filename = os.path.split(self.path)
+        temporary_path = os.path.join(directory, "." + filename + ".autosave")
+
+        try:
+            with compressed_files.open_text(temporary_path, "w", compressed_files.save_codec(self.path)) as f:
+                #The lines are joined in chunks, so the thread doesn't hold a copy of the whole file.
+                for start in range(0, len(self.text), buffers.LOAD_CHUNK_SIZE):
+                    f.write("".join(line.line_text + "\n" for line in self.text[start:start + buffers.LOAD_CHUNK_SIZE]))
+
+                f.flush()
+                os.fsync(f.fileno())
+
+            #The new file keeps the permissions of the old one.
+            try:
+                os.chmod(temporary_path, os.stat(self.path).st_mode)
+            except OSError:
+                pass
+
+            if buffers.file_stat(self.path) != self.disk_stat:
+                self.file_changed = True
+                os.remove(temporary_path)
+                return
+
+            os.replace(temporary_path, self.path)
+            self.stat = buffers.file_stat(self.path)
+
+        except (OSError, UnicodeEncodeError):
+            self.failed = True
+            self.text = None
+
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+
+        finally:
+            self.done.set()
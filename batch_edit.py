@@ -0,0 +1,94 @@
+import text_editor, editor_config, sys, os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+
+#Batch mode runs a script of tool console commands over many files without a terminal. The script has one command per line,
+#exactly as it would be typed in the tool console. Empty lines and lines starting with "#" are ignored.
+"""
+Example script:
+# Point every config to the new server.
+r old-server\.local new-server.local
+wc
+s
+"""
+
+
+
+#Reads the commands from the given script.
+def read_script(path: str) -> list[str]:
+    commands = []
+
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+
+            if line != "" and not line.startswith("#"):
+                commands.append(line)
+
+    return commands
+
+
+
+#Runs every command on the given file, using an editor without a terminal. It's run in the worker processes, so everything it
+#gets and returns must be picklable. Returns the file and a list of "(command, output)" tuples, where the output is every
+#message the command showed in the prompt.
+def edit_file(file: str, commands: list[str], config: editor_config.EditorConfig) -> tuple[str, list[tuple[str, list[str]]]]:
+    editor = text_editor.TextEditor(True)
+    editor.apply_config(config)
+    #There's no one to answer a prompt, so any prompt a command opens is immediately cancelled by pressing escape.
+    editor.key_source = lambda: 27
+
+    results = []
+
+    if editor.load_file(os.path.join(os.getcwd(), file)):
+        return file, [("", ["Failed to read file"])]
+
+    editor.file = file
+
+    for command in commands:
+        editor.prompt.log = []
+
+        try:
+            editor.run_command(command)
+        #"q" and "qf" stop the script for this file.
+        except SystemExit:
+            results.append((command, editor.prompt.log))
+            break
+
+        results.append((command, editor.prompt.log))
+
+    return file, results
+
+
+
+#Runs the script in the given path over all the files, using a pool of "jobs" processes. If "jobs" is "None" one process per
+#CPU is used. The results of each file are written to stdout as soon as the file is done, so they come in the order in which
+#files finish. Returns the exit status, 1 if any file couldn't be processed, otherwise 0.
+def run_batch(script_path: str, files: list[str], jobs: int = None) -> int:
+    commands = read_script(script_path)
+    config, cached = editor_config.read_config_file()
+    exit_status = 0
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(edit_file, file, commands, config) : file for file in files}
+
+        for future in as_completed(futures):
+            try:
+                file, results = future.result()
+            except Exception as e:
+                print("{}: error: {}".format(futures[future], e))
+                exit_status = 1
+                continue
+
+            for command, output in results:
+                for message in output:
+                    if command == "":
+                        print("{}: {}".format(file, message))
+                        exit_status = 1
+                    else:
+                        print("{}: {}: {}".format(file, command, message))
+
+            sys.stdout.flush()
+
+    return exit_status
@@ -0,0 +1,125 @@
+import text_editor, editor_config, keytrace, journal, compressed_files, tempfile, random, time, sys, os
+from typing import Union
+
+
+
+#Measures how long the editor takes to handle each key, with and without the recovery journal, while typing and while pasting,
+#and while typing in the middle of a very long line.
+#It runs without a terminal, so it measures the editing and journaling, not drawing. Typing is a key at a time, with a short
+#pause now and then like a person typing, pasting is a burst of keys with no pauses.
+#It also measures how fast files are opened and saved, plain and compressed with each codec, see "compressed_files.py".
+"""
+Usage: python benchmarks.py [keys] [lines]
+"""
+
+
+
+#Some text to type, with newlines so lines are split as well as edited.
+SAMPLE_TEXT = "The quick brown fox jumps over the lazy dog.\n    def function(argument):\n        return argument * 2\n"
+#The length of the long line, like a minified file, see "buffers.Line".
+LONG_LINE_LENGTH = 20 * 2**20
+
+
+
+#Types "key_count" keys into a new editor editing a copy of a 10000 line file, with the journal enabled or not. If "pause" is
+#not zero the editor waits that many seconds every 100 keys. If "long_line" is True the file is a single "LONG_LINE_LENGTH"
+#line instead, and the keys are typed in the middle of it, without newlines. Returns the time each key took, in seconds.
+def measure_keys(directory: str, key_count: int, journaling: bool, pause: float, long_line: bool = False) -> list[float]:
+    path = os.path.join(directory, "benchmark.txt")
+    sample_text = SAMPLE_TEXT.replace("\n", " ") if long_line else SAMPLE_TEXT
+
+    with open(path, "w") as f:
+        f.write("0123456789abcdef" * (LONG_LINE_LENGTH // 16) + "\n" if long_line else SAMPLE_TEXT * 3333)
+
+    editor = text_editor.TextEditor(True)
+    editor.apply_config(editor_config.read_config_file()[0])
+    editor.load_file(path)
+    editor.file = "benchmark.txt"
+    editor.journaling = journaling
+
+    if long_line:
+        editor.cursor_pos_x = len(editor.text[0]) // 2
+
+    latencies = []
+
+    for i in range(key_count):
+        editor.key = ord(sample_text[i % len(sample_text)])
+
+        start_time = time.perf_counter()
+        editor.detect_key()
+        latencies.append(time.perf_counter() - start_time)
+
+        if pause != 0 and i % 100 == 0:
+            time.sleep(pause)
+
+    if editor.journal != None:
+        editor.journal.close()
+
+    return latencies
+
+
+#Returns "line_count" lines that look like a log, so they compress about as well as a real one. They are always the same.
+def sample_log(line_count: int) -> str:
+    generator = random.Random(0)
+    words = ["GET", "POST", "/api/users", "/api/orders", "/static/app.js", "200", "404", "500", "user", "session", "timeout",
+        "connected", "request", "finished", "cache", "miss", "hit"]
+
+    return "".join("2024-05-{:02} {:02}:{:02}:{:02}.{:03} [{}] {} {}ms\n".format(generator.randint(1, 28), generator.randint(0, 23),
+        generator.randint(0, 59), generator.randint(0, 59), generator.randint(0, 999), generator.randint(1000, 9999),
+        " ".join(generator.choices(words, k=generator.randint(3, 8))), generator.randint(1, 5000)) for i in range(line_count))
+
+
+#Opens and saves a file with the given text, compressed with the codec or plain if it's "None". Returns the seconds taken to
+#open it and to save it, and the size of the file.
+def measure_codec(directory: str, codec: Union[str, None], text: str) -> tuple[float, float, int]:
+    path = os.path.join(directory, "benchmark.txt" + ("." + codec if codec != None else ""))
+
+    with compressed_files.open_text(path, "w", codec) as f:
+        f.write(text)
+
+    editor = text_editor.TextEditor(True)
+    editor.apply_config(editor_config.read_config_file()[0])
+
+    start_time = time.perf_counter()
+    editor.load_file(path)
+    load_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    editor.save_file(path)
+    save_time = time.perf_counter() - start_time
+
+    return load_time, save_time, os.path.getsize(path)
+
+
+def report(name: str, latencies: list[float]) -> str:
+    latencies = sorted(latencies)
+
+    return "{:<28}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.2f}".format(name, sum(latencies) / len(latencies) * 1000000,
+        keytrace.percentile(latencies, 50) * 1000000, keytrace.percentile(latencies, 99) * 1000000, latencies[-1] * 1000000)
+
+
+
+if __name__ == "__main__":
+    key_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    line_count = int(sys.argv[2]) if len(sys.argv) > 2 else 300000
+
+    print("{} keys per run, times in microseconds".format(key_count))
+    print("{:<28}{:>10}{:>10}{:>10}{:>10}".format("", "mean", "p50", "p99", "max"))
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, pause, long_line in (("typing", journal.WRITE_INTERVAL / 4, False), ("paste", 0, False), ("long line", journal.WRITE_INTERVAL / 4, True)):
+            for journaling in (False, True):
+                latencies = measure_keys(directory, key_count, journaling, pause, long_line)
+                print(report("{} {}".format(name, "(journal)" if journaling else "(no journal)"), latencies))
+
+        #Throughput is measured in megabytes of text, so it's comparable between codecs.
+        text = sample_log(line_count)
+        text_size = len(text.encode()) / 2**20
+
+        print()
+        print("{} lines ({:.1f}MB of text) per file, throughput in MB of text per second".format(line_count, text_size))
+        print("{:<28}{:>10}{:>10}{:>10}".format("", "open", "save", "size"))
+
+        for codec in (None, "gzip", "bz2", "xz"):
+            load_time, save_time, size = measure_codec(directory, codec, text)
+            print("{:<28}{:>10.1f}{:>10.1f}{:>9.2f}M".format(codec or "plain", text_size / load_time, text_size / save_time, size / 2**20))
@@ -0,0 +1,591 @@
+import compressed_files, threading, os
+from layout import char_width
+from bisect import bisect_right
+from itertools import accumulate
+from dataclasses import dataclass, field
+from typing import Union
+
+
+
+#Lines longer than this are stored in chunks, so editing them or showing a part of them doesn't copy the whole line.
+LONG_LINE_LENGTH = 65536
+#The size of the chunks of a long line. Chunks grow as text is inserted and are split when they are twice this size.
+LINE_CHUNK_SIZE = 16384
+#How many characters are measured at a time when the display columns of a line are needed further than they are known.
+COLUMN_BATCH_SIZE = 1024
+
+
+
+#Each line of the text. Normal lines simply store their text. Very long lines, like minified files, are stored as a list of
+#chunks instead, along with the column at which each chunk starts, so getting the visible part of the line, inserting and
+#deleting only touch the chunks involved. For long lines "line_text" joins the chunks, the result is kept until the line is
+#modified, so it should only be used when the whole line is actually needed.
+#Because of tabs and wide characters the display column of a character isn't it's index. The display column where every
+#character starts is calculated the first time it's needed, and only up to where it's needed. Modifying the line only discards
+#the columns after the modified character, so mapping between indexes and columns is usually a lookup or a binary search.
+#Lines with only one cell characters, most of them, don't need it.
+#Snapshots of the text, see "snapshot_text", share their lines with the text. Every line has the generation it was created in,
+#and taking a snapshot starts a new generation, so the editor knows which lines a snapshot might have and copies them before
+#modifying them, see "TextEditor.editable_line". Lines are never modified in place otherwise.
+"""
+Example of a long line with a chunk size of 4:
+chunks:       ["abcd", "efgh", "ij"]
+chunk_starts: [0, 4, 8, 10]  <- The last entry is the length of the line.
+slice(3, 6) -> "d" + "ef"
+
+Column offsets of "a\tb" with a tabstop of 4:
+column_offsets: [0, 1, 4, 5]  <- The last entry is the display width of the line.
+"""
+class Line:
+    __slots__ = ("plain_text", "chunks", "chunk_starts", "length", "column_offsets", "column_tabstop", "generation")
+
+    #The generation of the lines created now, incremented by every snapshot.
+    current_generation = 0
+
+    def __init__(self, line_text: str = "") -> None:
+        self.set_text(line_text)
+        self.generation = Line.current_generation
+
+
+    def __repr__(self) -> str:
+        return "Line({!r})".format(self.line_text)
+
+
+    def __len__(self) -> int:
+        return self.length
+
+
+    def set_text(self, text: str) -> None:
+        self.length = len(text)
+        self.plain_text = text
+        self.chunk_starts = None
+        self.column_offsets = None
+        self.column_tabstop = None
+
+        if self.length > LONG_LINE_LENGTH:
+            self.chunks = [text[i:i + LINE_CHUNK_SIZE] for i in range(0, self.length, LINE_CHUNK_SIZE)]
+        else:
+            self.chunks = None
+
+
+    def get_text(self) -> str:
+        if self.plain_text == None:
+            self.plain_text = "".join(self.chunks)
+
+        return self.plain_text
+
+
+    line_text = property(get_text, set_text)
+
+
+    #Returns a new line with the same text, in the current generation. Strings can't be modified, so the text and the chunks are
+    #shared, only the list of chunks is copied.
+    def copy(self) -> "Line":
+        line = Line()
+        line.plain_text = self.plain_text
+        line.chunks = list(self.chunks) if self.chunks != None else None
+        line.length = self.length
+
+        return line
+
+
+    #Whenever the chunks change the joined text and the chunk starts are no longer valid. If the line got short enough it's
+    #stored normally again.
+    def chunks_changed(self) -> None:
+        self.chunks = [chunk for chunk in self.chunks if chunk != ""] or [""]
+        self.chunk_starts = None
+        self.plain_text = None
+        self.column_tabstop = None
+
+        if self.length <= LONG_LINE_LENGTH // 2:
+            self.set_text("".join(self.chunks))
+
+
+    #Starts the display columns for the given tabstop width, unless they are already started. If every character takes a
+    #single cell "column_offsets" is left as "None", since columns and indexes are the same. Otherwise the offsets are only
+    #calculated as far as they are needed, see "extend_column_offsets".
+    def start_column_offsets(self, tabstop: int) -> None:
+        if self.column_tabstop == tabstop:
+            return
+
+        self.column_tabstop = tabstop
+        pieces = self.chunks if self.chunks != None else [self.plain_text]
+
+        if all(piece.isascii() and piece.isprintable() for piece in pieces):
+            self.column_offsets = None
+        else:
+            self.column_offsets = [0]
+
+
+    #Calculates the offsets until the one of index "x" is known or until one is past the given column, whatever comes first.
+    def extend_column_offsets(self, x: int, column: float) -> None:
+        offsets = self.column_offsets
+        tabstop = self.column_tabstop
+
+        while len(offsets) - 1 < min(x, self.length) and offsets[-1] <= column:
+            current_column = offsets[-1]
+
+            for char in self.slice(len(offsets) - 1, len(offsets) - 1 + COLUMN_BATCH_SIZE):
+                current_column += char_width(char, current_column, tabstop)
+                offsets.append(current_column)
+
+
+    #Has to be called after every modification, with the display columns from before it and the index of the first character
+    #that changed. The columns of the characters before it are still valid, so they are kept. A line with only one cell
+    #characters stays like that if the added text, if any, also has only one cell characters.
+    def keep_column_offsets(self, offsets: Union[list, None], tabstop: Union[int, None], x: int, single_cell: bool = True) -> None:
+        if tabstop == None:
+            return
+
+        if offsets != None:
+            del offsets[x + 1:]
+        elif not single_cell:
+            return
+
+        self.column_offsets = offsets
+        self.column_tabstop = tabstop
+
+
+    #The display column at which the character at the given index starts, the end of the line is it's display width.
+    def column_of(self, x: int, tabstop: int) -> int:
+        self.start_column_offsets(tabstop)
+
+        if self.column_offsets == None:
+            return x
+
+        self.extend_column_offsets(x, float("inf"))
+
+        return self.column_offsets[x]
+
+
+    #The index of the character that covers the given display column, or the end of the line if it's past it.
+    def index_at_column(self, column: int, tabstop: int) -> int:
+        self.start_column_offsets(tabstop)
+
+        if self.column_offsets == None:
+            return min(column, self.length)
+
+        self.extend_column_offsets(self.length, column)
+
+        return min(bisect_right(self.column_offsets, column) - 1, self.length)
+
+
+    def display_width(self, tabstop: int) -> int:
+        return self.column_of(self.length, tabstop)
+
+
+    #Returns the chunk that has the given column and the column's position inside of it. The end of the line is in the last
+    #chunk.
+    def locate(self, column: int) -> tuple[int, int]:
+        if self.chunk_starts == None:
+            self.chunk_starts = list(accumulate((len(chunk) for chunk in self.chunks), initial=0))
+
+        chunk = min(bisect_right(self.chunk_starts, column) - 1, len(self.chunks) - 1)
+
+        return chunk, column - self.chunk_starts[chunk]
+
+
+    #Returns the text between the given columns, like slicing a string would.
+    def slice(self, start: int, end: int) -> str:
+        if self.chunks == None:
+            return self.plain_text[start:end]
+
+        start = max(start, 0)
+        end = min(end, self.length)
+
+        if start >= end:
+            return ""
+
+        chunk, position = self.locate(start)
+        pieces = []
+        remaining = end - start
+
+        while remaining > 0:
+            piece = self.chunks[chunk][position:position + remaining]
+            pieces.append(piece)
+            remaining -= len(piece)
+
+            chunk += 1
+            position = 0
+
+        return "".join(pieces)
+
+
+    def insert(self, column: int, text: str) -> None:
+        offsets, tabstop = self.column_offsets, self.column_tabstop
+
+        if self.chunks == None:
+            self.set_text(self.plain_text[:column] + text + self.plain_text[column:])
+            self.keep_column_offsets(offsets, tabstop, column, text.isascii() and text.isprintable())
+            return
+
+        chunk, position = self.locate(column)
+        new_chunk = self.chunks[chunk][:position] + text + self.chunks[chunk][position:]
+
+        #Split the chunk if it got too big.
+        if len(new_chunk) > LINE_CHUNK_SIZE * 2:
+            self.chunks[chunk:chunk + 1] = [new_chunk[i:i + LINE_CHUNK_SIZE] for i in range(0, len(new_chunk), LINE_CHUNK_SIZE)]
+        else:
+            self.chunks[chunk] = new_chunk
+
+        self.length += len(text)
+        self.chunks_changed()
+        self.keep_column_offsets(offsets, tabstop, column, text.isascii() and text.isprintable())
+
+
+    #Deletes "count" characters starting at the given column.
+    def delete(self, column: int, count: int) -> None:
+        offsets, tabstop = self.column_offsets, self.column_tabstop
+
+        if self.chunks == None:
+            self.set_text(self.plain_text[:column] + self.plain_text[column + count:])
+            self.keep_column_offsets(offsets, tabstop, column)
+            return
+
+        count = max(0, min(count, self.length - column))
+        self.length -= count
+        chunk, position = self.locate(column)
+
+        while count > 0:
+            removed = min(count, len(self.chunks[chunk]) - position)
+            self.chunks[chunk] = self.chunks[chunk][:position] + self.chunks[chunk][position + removed:]
+            count -= removed
+
+            chunk += 1
+            position = 0
+
+        self.chunks_changed()
+        self.keep_column_offsets(offsets, tabstop, column)
+
+
+    #The amount of spaces at the beginning of the line.
+    def indentation(self) -> int:
+        spaces = 0
+
+        for chunk in (self.chunks if self.chunks != None else [self.plain_text]):
+            stripped_chunk = chunk.lstrip(" ")
+            spaces += len(chunk) - len(stripped_chunk)
+
+            if stripped_chunk != "":
+                break
+
+        return spaces
+
+
+    #Cuts the line at the given column, the line keeps the text before it and the text after it is returned as a new line.
+    def split(self, column: int) -> "Line":
+        offsets, tabstop = self.column_offsets, self.column_tabstop
+
+        if self.chunks == None:
+            new_line = Line(self.plain_text[column:])
+            self.set_text(self.plain_text[:column])
+            self.keep_column_offsets(offsets, tabstop, column)
+
+            return new_line
+
+        chunk, position = self.locate(column)
+
+        new_line = Line()
+        new_line.chunks = [self.chunks[chunk][position:]] + self.chunks[chunk + 1:]
+        new_line.length = self.length - column
+        new_line.chunks_changed()
+
+        self.chunks = self.chunks[:chunk] + [self.chunks[chunk][:position]]
+        self.length = column
+        self.chunks_changed()
+        self.keep_column_offsets(offsets, tabstop, column)
+
+        return new_line
+
+
+    #Adds the text of the given line at the end of this line.
+    def append(self, other: "Line") -> None:
+        offsets, tabstop, length = self.column_offsets, self.column_tabstop, self.length
+
+        if self.length + other.length <= LONG_LINE_LENGTH:
+            self.set_text(self.line_text + other.line_text)
+        else:
+            self.chunks = (self.chunks if self.chunks != None else [self.plain_text]) + (other.chunks if other.chunks != None else [other.plain_text])
+            self.length += other.length
+            self.chunks_changed()
+
+        self.keep_column_offsets(offsets, tabstop, length, other.column_tabstop == tabstop and other.column_offsets == None)
+
+
+
+#This class is what makes the search function work. It handles all the search cursor logic. It stores the variables needed for
+#the search function. They are separated manly to avoid cluttering the program's class with variables.
+@dataclass
+class SearchMatch:
+    #This dictionary contains the line and index of a match. The line is the key for the dictionary entry.
+    line_and_index: dict = field(default_factory=dict)
+    #This dictionary contains the length of every match found, to account for the possibility of matches with different
+    #lengths.
+    line_match_length: dict = field(default_factory=dict)
+    #Whether or not the find function is currently active
+    find_enabled: bool = False
+    #The line of the the match the cursor was last set to.
+    current_match_line: int = 0
+    #The number of match in the line the cursor was last set to.
+    current_match_number_in_line: int = 0
+
+
+
+#How many lines the loader reads before handing them to the buffer. The first screen of a file appears as soon as the first
+#chunk is read.
+LOAD_CHUNK_SIZE = 10000
+
+#The editor variables that belong to a buffer. The editor works directly with it's own variables, when the buffer changes they
+#are stored in the old buffer and the new buffer's are restored, so switching only copies these references.
+BUFFER_STATE = ["text", "file", "cursor_pos_y", "cursor_pos_x", "desired_cursor_x_pos", "vertical_scroll_line",
+    "vertical_scroll_segment", "horizontal_scroll_character", "find_results", "selection", "buffer_modification_counter",
+    "journal", "disk_text", "disk_stat"]
+
+
+
+#Reads the file in the given path into "text", which must be a list or a "line_store.LineStore". The lines are added to the list in chunks, so the list can
+#be displayed while it's being filled. If the list had a placeholder line it's replaced by the first chunk, and if the file is
+#empty the list is left as it is. Compressed files are decompressed as they are read, see "compressed_files.py".
+def load_lines(path: str, text: list) -> None:
+    chunk = []
+    first_chunk = True
+
+    for line in compressed_files.read_lines(path):
+        #Remove the newline, the last line might not have one.
+        if line[-1:] == "\n":
+            line = line[:-1]
+
+        chunk.append(Line(line))
+
+        if len(chunk) >= LOAD_CHUNK_SIZE:
+            if first_chunk:
+                text[:] = chunk
+                first_chunk = False
+            else:
+                text.extend(chunk)
+
+            chunk = []
+
+    if first_chunk:
+        if chunk != []:
+            text[:] = chunk
+    else:
+        text.extend(chunk)
+
+
+
+#Returns a snapshot of the given text, and the generation of it's lines. The snapshot only copies the list, the lines are
+#shared with the text, which must copy a line of that generation or an older one before modifying it. Copying the list is a
+#single "memcpy", a few milliseconds even for millions of lines. A "line_store.LineStore" only copies it's list of blocks.
+def snapshot_text(text: list) -> tuple[list, int]:
+    generation = Line.current_generation
+    Line.current_generation += 1
+
+    return text.copy(), generation
+
+
+#Returns the lines "[start, stop)" of the text, shared with it like a snapshot, see "snapshot_text". A list only copies the
+#references to the lines, and a "line_store.LineStore" only copies the lines of the blocks at both ends, the rest of it's
+#blocks are shared.
+def share_lines(text: list, start: int, stop: int) -> list:
+    import line_store
+
+    lines = text.share(start, stop) if isinstance(text, line_store.LineStore) else text[start:stop]
+    Line.current_generation += 1
+
+    return lines
+
+
+
+#Returns a new text with the given lines, or with a single empty line. If there's a hot line budget the text is a
+#"line_store.LineStore", which keeps the lines that aren't being used compressed, see the configuration file.
+def new_text(lines: Union[list, None] = None) -> list:
+    import line_store
+
+    if lines == None:
+        lines = [Line()]
+
+    if line_store.cache.hot_line_budget > 0:
+        return line_store.LineStore(lines)
+
+    return lines
+
+
+
+#Identifies the version of the file in the given path, it changes whenever the file is modified or replaced. Returns "None"
+#if the file doesn't exist.
+def file_stat(path: str) -> Union[tuple[int, int, int], None]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+
+#An open document, with it's own text, cursor, scroll, search results and modified state. See "BUFFER_STATE".
+class Buffer:
+    def __init__(self, file: Union[str, None] = None) -> None:
+        self.text = [Line()]
+        self.file = file
+        self.cursor_pos_y = 0
+        self.cursor_pos_x = 0
+        self.desired_cursor_x_pos = 0
+        self.vertical_scroll_line = 0
+        self.vertical_scroll_segment = 0
+        self.horizontal_scroll_character = 0
+        self.find_results = SearchMatch()
+        #The selected text, see "clipboard.Selection", or "None".
+        self.selection = None
+        self.buffer_modification_counter = 0
+        #The recovery journal of the buffer's unsaved changes, if there are any, see "journal.py".
+        self.journal = None
+        #A snapshot of the text as it is on disk, and the file's stat, so changes made by other programs can be detected and
+        #merged, see "file_watcher.py". "disk_text" is "None" while it's not known.
+        self.disk_text = None
+        self.disk_stat = None
+
+        #Whether the file is still being read by the loader thread. A loading buffer can be displayed, but not modified.
+        self.loading = False
+        #Whether the last load failed.
+        self.load_failed = False
+        #Whether the editor has already told the user that the load finished.
+        self.load_reported = True
+        #Used to find the least recently used buffers, the higher the more recent.
+        self.last_used = 0
+
+
+    #Starts reading the given path in a background thread, the buffer's text is filled as the file is read.
+    def start_loading(self, path: str) -> None:
+        self.text = new_text()
+        self.loading = True
+        self.load_failed = False
+        self.load_reported = False
+        self.disk_text = None
+        self.disk_stat = file_stat(path)
+
+        threading.Thread(target=self.loader, args=(path, self.text), daemon=True).start()
+
+
+    def loader(self, path: str, text: list) -> None:
+        try:
+            load_lines(path, text)
+        except (OSError, UnicodeDecodeError):
+            self.load_failed = True
+        finally:
+            self.loading = False
+
+
+    #Whether the buffer is new and untouched, in which case opening a file can simply reuse it.
+    def is_blank(self) -> bool:
+        return self.file == None and self.buffer_modification_counter == 0 and len(self.text) == 1 and len(self.text[0]) == 0
+
+
+    #Whether the buffer's text can be dropped to save memory. It has to be possible to read it back from the file exactly as
+    #it was.
+    def can_drop_text(self) -> bool:
+        return self.text != None and self.file != None and self.buffer_modification_counter == 0 and not self.loading and not self.load_failed
+
+
+    def drop_text(self) -> None:
+        self.text = None
+        self.disk_text = None
+        self.find_results = SearchMatch()
+
+
+    #Reads the text back from the file if it was dropped. The cursor and scroll are kept, unless the file got shorter.
+    def ensure_loaded(self) -> bool:
+        if self.text != None:
+            return False
+
+        self.text = new_text()
+        path = os.path.join(os.getcwd(), self.file)
+        self.disk_stat = file_stat(path)
+
+        try:
+            load_lines(path, self.text)
+            self.disk_text = snapshot_text(self.text)[0]
+        except (OSError, UnicodeDecodeError):
+            self.load_failed = True
+
+        self.cursor_pos_y = min(self.cursor_pos_y, len(self.text) - 1)
+        self.cursor_pos_x = min(self.cursor_pos_x, len(self.text[self.cursor_pos_y]))
+        self.vertical_scroll_line = min(self.vertical_scroll_line, self.cursor_pos_y)
+        self.vertical_scroll_segment = 0
+
+        return self.load_failed
+
+
+
+#The list of open buffers, one of which is the current one.
+class BufferList:
+    def __init__(self) -> None:
+        self.buffers = [Buffer()]
+        self.current_index = 0
+        #Incremented every time a buffer becomes the current one, see "Buffer.last_used".
+        self.use_counter = 0
+
+
+    @property
+    def current(self) -> Buffer:
+        return self.buffers[self.current_index]
+
+
+    def __len__(self) -> int:
+        return len(self.buffers)
+
+
+    #Makes the buffer at the given index the current one.
+    def select(self, index: int) -> Buffer:
+        self.current_index = index
+        self.use_counter += 1
+        self.current.last_used = self.use_counter
+
+        return self.current
+
+
+    def add(self, buffer: Buffer) -> int:
+        self.buffers.append(buffer)
+        return len(self.buffers) - 1
+
+
+    def remove(self, index: int) -> None:
+        self.buffers.pop(index)
+
+        #There must always be a buffer.
+        if self.buffers == []:
+            self.buffers.append(Buffer())
+
+        if self.current_index >= index and self.current_index > 0:
+            self.current_index -= 1
+
+
+    #Returns the index of the buffer editing the given file, or "None" if there's none.
+    def find(self, file: str) -> Union[int, None]:
+        path = os.path.abspath(file)
+
+        for index, buffer in enumerate(self.buffers):
+            if buffer.file != None and os.path.abspath(buffer.file) == path:
+                return index
+
+        return None
+
+
+    #Drops the text of the least recently used idle buffers until all idle buffers together hold at most "line_budget" lines.
+    #Only buffers whose text can be read back from their file are dropped. Returns how many buffers were dropped.
+    def trim_idle(self, line_budget: int) -> int:
+        idle_buffers = [buffer for buffer in self.buffers if buffer is not self.current and buffer.text != None]
+        idle_lines = sum(len(buffer.text) for buffer in idle_buffers)
+        dropped = 0
+
+        for buffer in sorted(idle_buffers, key=lambda b: b.last_used):
+            if idle_lines <= line_budget:
+                break
+
+            if buffer.can_drop_text():
+                idle_lines -= len(buffer.text)
+                buffer.drop_text()
+                dropped += 1
+
+        return dropped
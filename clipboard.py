@@ -0,0 +1,78 @@
+import buffers
+from buffers import Line
+from dataclasses import dataclass
+
+
+
+#Text is selected between the mark and the cursor. Moving the cursor with shift starts a selection where the cursor was and
+#extends it, moving without shift ends it. The mark key starts a selection that moving the cursor without shift also extends,
+#until it's cut, copied or cancelled. In block mode the selection is a rectangle, the display columns between the mark and
+#the cursor in every line between them.
+#Cut and copied text goes to a register, the keys use the default one and the tool console can name others. Registers don't
+#copy the lines they hold, the whole lines are shared with the text like in a snapshot, see "buffers.share_lines", only the
+#partial lines at both ends are new. With a "line_store.LineStore" whole blocks are shared. Cutting removes the lines from the
+#text at once and pasting inserts them at once, both as a single change, so half a million lines take as long as moving the
+#references to them.
+"""
+Example, selecting from "b" to "e" and cutting:
+Text:  abc          Register:  "bc"          Text:  af
+       d                       "d"
+       ef                      "e"
+
+Block mode, from column 1 to column 3:
+Text:  abcd         Register:  "bc"          Text:  ad
+       efgh                    "fg"                 eh
+"""
+
+#The register used by the keys, and by the tool console when no register is given.
+DEFAULT_REGISTER = "\""
+#The registers the tool console can name, besides the default one.
+REGISTER_NAMES = "abcdefghijklmnopqrstuvwxyz"
+
+
+
+@dataclass
+class Selection:
+    #Where the selection started, the cursor is the other end.
+    mark_y: int
+    mark_x: int
+    #Whether it's a rectangle of display columns instead of the text between both ends.
+    block: bool = False
+    #Whether it was started with the mark key, so moving the cursor without shift extends it instead of ending it.
+    marked: bool = False
+
+
+
+@dataclass
+class Register:
+    #A list or a "line_store.LineStore". The whole lines are shared with the text they were copied from, so neither of them
+    #is ever modified in place, see "TextEditor.editable_line".
+    lines: list
+    #Whether it was copied from a block selection, it's pasted as a rectangle too.
+    block: bool
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+
+
+#Returns the text from "(first_y, first_x)" to "(last_y, last_x)" as lines, the first position must be before the last.
+def copy_text(text: list, first_y: int, first_x: int, last_y: int, last_x: int) -> list:
+    if first_y == last_y:
+        return [Line(text[first_y].slice(first_x, last_x))]
+
+    lines = buffers.share_lines(text, first_y + 1, last_y)
+    lines.insert(0, Line(text[first_y].slice(first_x, len(text[first_y]))))
+    lines.append(Line(text[last_y].slice(0, last_x)))
+
+    return lines
+
+
+#Returns the display columns "[first_column, last_column)" of lines "[first_y, last_y]".
+def copy_block(text: list, first_y: int, last_y: int, first_column: int, last_column: int, tabstop: int) -> list:
+    lines = []
+
+    for line in text[first_y:last_y + 1]:
+        lines.append(Line(line.slice(line.index_at_column(first_column, tabstop), line.index_at_column(last_column, tabstop))))
+
+    return lines
@@ -0,0 +1,173 @@
+import queue, threading, re, os
+from typing import Union, Iterator, IO
+
+
+
+#Files compressed with gzip, bzip2 or xz are opened and saved as if they were plain text, they are decompressed while they are
+#read and compressed while they are written, never to a temporary copy on disk. The compression is detected from the first
+#bytes of the file, whatever it's name, and kept when it's saved. A new file is compressed if it's name ends in ".gz", ".bz2"
+#or ".xz". The codecs are the ones of the standard library, imported only when a compressed file is used.
+#Loading goes through "buffers.load_lines" like any file, so a compressed file is shown as it's decompressed. Saving joins the
+#lines on the editor's thread while a worker thread compresses and writes them, the codecs let other threads run while they
+#compress, so both happen at once.
+"""
+Saving:
+Editor thread:  join lines 0-9999 | join lines 10000-19999 | join lines 20000-29999 | ...
+Worker thread:                    | compress and write     | compress and write     | ...
+"""
+
+#A pattern for the bytes every file compressed with each codec starts with, and the name the codec's module is imported as.
+#The whole header is matched, a bzip2 file starts with "BZh", it's block size and the magic of it's first block (or of the end
+#of the stream, if it's empty), since "BZh" alone is also how some plain text starts.
+CODECS = {
+    "gzip" : (rb"\x1f\x8b\x08", "gzip"),
+    "bz2" : (rb"BZh[1-9](1AY&SY|\x17rE8P\x90)", "bz2"),
+    "xz" : (rb"\xfd7zXZ\x00", "lzma"),
+}
+#How many bytes are read to match the headers.
+HEADER_SIZE = 10
+#How many bytes of a file that matches a header are decompressed to check it's really compressed.
+PROBE_SIZE = 65536
+#The codec of new files, by extension.
+EXTENSIONS = {".gz" : "gzip", ".bz2" : "bz2", ".xz" : "xz"}
+#How hard every codec compresses, as the argument it's "open" takes. gzip and bzip2 use the same level as their commands, xz
+#uses the fastest but one, it's default is about ten times slower than the others.
+COMPRESSION_LEVELS = {
+    "gzip" : {"compresslevel" : 6},
+    "bz2" : {"compresslevel" : 9},
+    "xz" : {"preset" : 1},
+}
+
+#How many lines are joined into each chunk handed to the worker thread.
+WRITE_CHUNK_SIZE = 10000
+#How many chunks can be waiting for the worker thread, so the joined text in memory stays small.
+WRITE_QUEUE_SIZE = 4
+
+
+
+#Returns the codec the file in the given path is compressed with, or "None" if it isn't compressed or can't be read. A file
+#that starts like a compressed one but whose first bytes can't be decompressed is plain text, so it's opened and saved as it is.
+def detect_codec(path: str) -> Union[str, None]:
+    try:
+        with open(path, "rb") as f:
+            start = f.read(PROBE_SIZE)
+    except OSError:
+        return None
+
+    for codec, (magic, module) in CODECS.items():
+        if re.match(magic, start[:HEADER_SIZE]) != None:
+            return codec if decompresses(codec, start) else None
+
+    return None
+
+
+#Returns whether the start of a file can be decompressed with the codec, the codecs' decompressors complain as soon as the
+#data is invalid, without needing the rest of the file.
+def decompresses(codec: str, start: bytes) -> bool:
+    if codec == "gzip":
+        import zlib
+        #"31" is the window size of gzip, with it's header.
+        decompressor, errors = zlib.decompressobj(31), (zlib.error,)
+    elif codec == "bz2":
+        import bz2
+        decompressor, errors = bz2.BZ2Decompressor(), (OSError,)
+    else:
+        import lzma
+        decompressor, errors = lzma.LZMADecompressor(), (lzma.LZMAError,)
+
+    try:
+        decompressor.decompress(start)
+    except errors + (EOFError,):
+        return False
+
+    return True
+
+
+#Returns the codec a file saved to the given path is compressed with. An existing file keeps it's compression, a new one is
+#compressed according to it's extension.
+def save_codec(path: str) -> Union[str, None]:
+    if os.path.exists(path):
+        return detect_codec(path)
+
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+#Opens the file in the given path as text, like "open", decompressing or compressing it with the codec if it isn't "None".
+def open_text(path: str, mode: str, codec: Union[str, None]) -> IO[str]:
+    if codec == None:
+        return open(path, mode)
+
+    module = __import__(CODECS[codec][1])
+
+    #The codecs' "open" defaults to binary mode.
+    if mode == "r":
+        return module.open(path, "rt")
+
+    return module.open(path, mode + "t", **COMPRESSION_LEVELS[codec])
+
+
+#Yields the lines of the file in the given path, decompressing it if it's compressed. A corrupt or truncated compressed file
+#raises an "OSError", like any other file that can't be read.
+def read_lines(path: str) -> Iterator[str]:
+    codec = detect_codec(path)
+
+    with open_text(path, "r", codec) as f:
+        try:
+            yield from f
+        except codec_errors(codec) as e:
+            raise OSError("Couldn't decompress {}: {}".format(path, e))
+
+
+#The errors the codecs raise for corrupt or truncated data, other than "OSError".
+def codec_errors(codec: Union[str, None]) -> tuple:
+    if codec == "gzip":
+        import zlib
+        return (EOFError, zlib.error)
+    elif codec == "xz":
+        import lzma
+        return (EOFError, lzma.LZMAError)
+
+    return (EOFError,)
+
+
+
+#Writes the lines to the given path, compressed with the codec. Raises an "OSError" if the file couldn't be written.
+def write_compressed(path: str, codec: str, lines: list) -> None:
+    chunks = queue.Queue(WRITE_QUEUE_SIZE)
+    errors = []
+
+    def writer() -> None:
+        chunk = ""
+
+        try:
+            with open_text(path, "w", codec) as f:
+                while True:
+                    chunk = chunks.get()
+
+                    if chunk == None:
+                        break
+
+                    f.write(chunk)
+
+        except (OSError, UnicodeEncodeError) as e:
+            errors.append(e)
+
+            #The rest of the chunks are taken anyway, so the editor's thread never waits on a full queue.
+            while chunk != None:
+                chunk = chunks.get()
+
+    worker = threading.Thread(target=writer, daemon=True)
+    worker.start()
+
+    try:
+        for start in range(0, len(lines), WRITE_CHUNK_SIZE):
+            if errors != []:
+                break
+
+            chunks.put("".join(line.line_text + "\n" for line in lines[start:start + WRITE_CHUNK_SIZE]))
+    finally:
+        chunks.put(None)
+        worker.join()
+
+    if errors != []:
+        raise OSError("Couldn't write {}: {}".format(path, errors[0]))
@@ -0,0 +1,646 @@
+import text_editor, editor_config, prompt_history, utils, socket, select, subprocess, threading, queue, json, tempfile, traceback, curses, time, sys, os
+from typing import Union
+
+
+
+#The editor daemon keeps the text of the files being edited in a single process, so several editors working on the same file,
+#like a few people editing a big log on a shared machine, don't each hold a copy of it. Every terminal runs a thin client,
+#"DaemonClient", which only sends keys and draws the rows it receives, over a Unix socket. For every client the daemon runs a
+#"Session", a normal editor without a terminal, whose screen sends the rows that changed since the last frame back to the
+#client, see "RemoteScreen".
+#Sessions editing the same file share a "Document", the text itself and what belongs to it, like the modification counter and
+#the recovery journal. Each session has it's own cursor, scroll, search and layout. Only one session runs at a time, they
+#take turns through the daemon's lock, which they only release while waiting for a key or for a filter command. After taking
+#the lock again a session picks up the changes other sessions made to it's document, see "Session.adopt_document". The rows
+#are sent by a thread of each session, so a client that stops reading them doesn't stop the others.
+"""
+Terminal 1: DaemonClient --keys-->  Session 1 \
+                         <--rows--             >-- Document "/var/log/big.log"
+Terminal 2: DaemonClient --keys-->  Session 2 /
+"""
+
+#How long a session waits for a key before drawing the screen again, in seconds, so the clock and the changes made by other
+#sessions are shown.
+KEY_WAIT_TIME = 0.1
+#How long the daemon keeps running without clients, in seconds.
+IDLE_TIMEOUT = 600
+#How long a client waits for the daemon it started to be ready, in seconds.
+START_TIMEOUT = 5
+#How many frames can be waiting to be sent to a client. A client that falls further behind, like a suspended terminal, gets
+#the whole screen once it reads again instead.
+MAX_QUEUED_FRAMES = 64
+
+#The editor variables that belong to a document instead of a session, see "buffers.BUFFER_STATE".
+DOCUMENT_STATE = ["text", "buffer_modification_counter", "journal", "disk_text", "disk_stat"]
+
+
+
+#The default socket, private to the user.
+def default_socket_path() -> str:
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(directory, "text_editor-{}.sock".format(os.getuid()))
+
+
+#Messages are JSON objects, one per line.
+def send_message(connection: socket.socket, message: dict) -> None:
+    connection.sendall((json.dumps(message) + "\n").encode("utf-8"))
+
+
+#Yields the messages received from the connection, until it's closed.
+def receive_messages(connection: socket.socket):
+    pending = b""
+
+    while True:
+        try:
+            data = connection.recv(65536)
+        except OSError:
+            return
+
+        if data == b"":
+            return
+
+        pending += data
+
+        while b"\n" in pending:
+            line, pending = pending.split(b"\n", 1)
+            yield json.loads(line)
+
+
+
+#The text of a file and everything that belongs to it, shared by every session editing the file. See "DOCUMENT_STATE".
+class Document:
+    def __init__(self, editor: text_editor.TextEditor) -> None:
+        for variable in DOCUMENT_STATE:
+            setattr(self, variable, getattr(editor, variable))
+
+        #Incremented every time the text changes, sessions that didn't make the change have to update what they derived from
+        #the text, like the wrap index.
+        self.version = 0
+        self.sessions = set()
+
+
+
+#Stands in for the curses screen of a session. It keeps what's drawn in each row, and when the screen is refreshed only the rows
+#that are different from the last refresh are sent to the client, as lists of "[x, text, colour]". Colours are sent as the
+#index of the colour field, see "SessionEditor.apply_config", the client has it's own curses colours.
+#Refreshing only queues the frame, a writer thread sends it, so the session never waits for the client while it holds the
+#daemon's lock.
+class RemoteScreen(utils.HeadlessScreen):
+    def __init__(self, connection: socket.socket, y_size: int, x_size: int) -> None:
+        super().__init__(y_size, x_size)
+        self.connection = connection
+
+        self.rows = {}
+        self.sent_rows = {}
+        #Where "move" left the cursor.
+        self.cursor = (0, 0)
+
+        #The messages waiting to be sent, "None" stops the writer and closes the connection.
+        self.frames = queue.Queue()
+        threading.Thread(target=self.writer, daemon=True).start()
+
+
+    def addstr(self, y_pos: int, x_pos: int, string: str, colour: int = 0) -> None:
+        super().addstr(y_pos, x_pos, string, colour)
+        self.rows.setdefault(y_pos, []).append([x_pos, string, colour])
+
+
+    def clear(self) -> None:
+        self.rows = {}
+
+
+    def erase(self) -> None:
+        self.rows = {}
+
+
+    def move(self, y_pos: int, x_pos: int) -> None:
+        self.cursor = (y_pos, x_pos)
+
+
+    #Forgets what was printed in the cursor's row from the cursor on, the input prompt redraws only it's row this way.
+    def clrtoeol(self) -> None:
+        y_pos, x_pos = self.cursor
+        calls = [[x, string[:x_pos - x], colour] for x, string, colour in self.rows.get(y_pos, []) if x < x_pos]
+
+        if calls != []:
+            self.rows[y_pos] = calls
+        else:
+            self.rows.pop(y_pos, None)
+
+
+    def refresh(self) -> None:
+        #The client is too far behind, the frames it hasn't received are dropped and every row is sent again.
+        if self.frames.qsize() >= MAX_QUEUED_FRAMES:
+            self.drop_frames()
+            self.sent_rows = {y : None for y in range(self.y_size)}
+
+        changed_rows = {y : calls for y, calls in self.rows.items() if self.sent_rows.get(y) != calls}
+        cleared_rows = [y for y in self.sent_rows if y not in self.rows]
+
+        if changed_rows != {} or cleared_rows != []:
+            self.frames.put({"rows" : changed_rows, "clear" : cleared_rows})
+
+        #The rows are kept when the screen isn't cleared before the next refresh, so they're copied instead of shared.
+        self.sent_rows = self.rows
+        self.rows = {y : list(calls) for y, calls in self.sent_rows.items()}
+
+
+    #After the client's screen changes size it's cleared, so everything has to be sent again.
+    def resize(self, y_size: int, x_size: int) -> None:
+        self.y_size = y_size
+        self.x_size = x_size
+        self.sent_rows = {}
+
+
+    def drop_frames(self) -> None:
+        while True:
+            try:
+                self.frames.get_nowait()
+            except queue.Empty:
+                return
+
+
+    #Sends the last message, after the frames still waiting, and closes the connection.
+    def close(self, message: dict) -> None:
+        self.frames.put(message)
+        self.frames.put(None)
+
+
+    def writer(self) -> None:
+        while True:
+            message = self.frames.get()
+
+            if message == None:
+                break
+
+            try:
+                send_message(self.connection, message)
+            #The client is gone, the session finds out through it's reader.
+            except OSError:
+                pass
+
+        try:
+            self.connection.close()
+        except OSError:
+            pass
+
+
+
+#The editor of a session. It's a normal editor, it only tells the session when something that belongs to the document changed.
+class SessionEditor(text_editor.TextEditor):
+    def __init__(self, session: "Session") -> None:
+        super().__init__(True)
+        self.session = session
+
+
+    #The colours are drawn by the client, so they are sent as the number of their field.
+    def apply_config(self, config: editor_config.EditorConfig) -> None:
+        super().apply_config(config)
+
+        self.attributes = {field : index + 1 for index, field in enumerate(config.colour_fields())}
+        #There is a terminal, it's just not this process's.
+        self.journaling = config.recovery_journal
+        self.interactive = True
+
+
+    #Other sessions run while the filter command does, afterwards the changes they made are picked up, so the screen shows
+    #them and "filter_handler" can tell the text changed.
+    def wait_for_job(self, done: threading.Event, timeout: float) -> bool:
+        self.session.daemon.lock.release()
+
+        try:
+            return done.wait(timeout)
+        finally:
+            self.session.daemon.lock.acquire()
+            self.session.adopt_document()
+
+
+    def text_changed(self, y: int, removed: int, added: int, record: bool = True, edits: Union[list[tuple[int, int, str]], None] = None) -> None:
+        super().text_changed(y, removed, added, record, edits)
+        self.session.document_changed(True)
+
+
+    def modification_handler(self) -> None:
+        super().modification_handler()
+        self.session.document_changed(False)
+
+
+    def save_file(self, path: str) -> bool:
+        failed = super().save_file(path)
+        self.session.document_changed(False)
+
+        return failed
+
+
+    #The journal of a document other sessions are editing has to be kept.
+    def close_buffer(self, index: int, force: bool = False) -> None:
+        self.store_buffer_state()
+        buffer = self.buffers.buffers[index]
+
+        if buffer.buffer_modification_counter == 0 or force:
+            self.session.leave_document(buffer.file)
+
+        super().close_buffer(index, force)
+
+
+    #Quitting only ends the session, the daemon closes the journals of the documents nobody is editing anymore.
+    def quit_editor(self) -> None:
+        self.store_buffer_state()
+        raise SystemExit()
+
+
+
+#A client connected to the daemon, see "EditorDaemon".
+class Session:
+    def __init__(self, daemon: "EditorDaemon", connection: socket.socket) -> None:
+        self.daemon = daemon
+        self.connection = connection
+        #The screen of the editor, created once the client sends it's size.
+        self.screen = None
+
+        #What the client sent: "("key", key)", "("size", y, x)" or "("closed",)". "None" only wakes the session up.
+        self.events = queue.Queue()
+        self.editor = None
+        #The document of the current buffer, and the version of it this session has seen.
+        self.document = None
+        self.seen_version = 0
+        #Documents aren't shared until the editor has opened it's file.
+        self.started = False
+        self.documents = set()
+
+        threading.Thread(target=self.run, daemon=True).start()
+
+
+    def run(self) -> None:
+        messages = receive_messages(self.connection)
+        quit_message = None
+
+        try:
+            attach = next(messages)
+            self.screen = RemoteScreen(self.connection, attach["size"][0], attach["size"][1])
+        except (StopIteration, ValueError, KeyError, IndexError, TypeError):
+            self.connection.close()
+            return
+
+        threading.Thread(target=self.reader, args=(messages,), daemon=True).start()
+
+        with self.daemon.lock:
+            self.daemon.sessions.add(self)
+
+            try:
+                self.start(attach.get("attach"))
+                self.editor.editor()
+            except SystemExit as e:
+                quit_message = e.code if isinstance(e.code, str) else None
+            except Exception:
+                traceback.print_exc()
+                quit_message = "The editor daemon failed, see it's output"
+            finally:
+                self.close()
+
+        self.screen.close({"quit" : quit_message})
+
+
+    def reader(self, messages) -> None:
+        try:
+            for message in messages:
+                if "key" in message:
+                    self.events.put(("key", message["key"]))
+                elif "size" in message:
+                    self.events.put(("size", message["size"][0], message["size"][1]))
+        except ValueError:
+            pass
+
+        self.events.put(("closed",))
+
+
+    #Opens the given file, or simply starts sharing it if another session has it open.
+    def start(self, path: Union[str, None]) -> None:
+        self.editor = SessionEditor(self)
+        self.editor.stdscr = self.screen
+        self.editor.key_source = self.next_key
+        self.editor.prompt_history = self.daemon.prompt_history
+        self.editor.registers = self.daemon.registers
+
+        try:
+            self.editor.apply_config(editor_config.read_config_file()[0])
+        except ValueError as e:
+            raise SystemExit(str(e))
+
+        #The layout depends on the configuration.
+        self.editor.get_size()
+
+        if path != None and path in self.daemon.documents:
+            self.editor.file = path
+        else:
+            self.editor.parse({}, [path] if path != None else [])
+
+        self.started = True
+        self.adopt_document()
+
+
+    #The key source of the editor. The daemon's lock is released while waiting, so other sessions can run.
+    def next_key(self) -> int:
+        self.daemon.lock.release()
+
+        try:
+            event = self.events.get(timeout=KEY_WAIT_TIME)
+        except queue.Empty:
+            event = None
+        finally:
+            self.daemon.lock.acquire()
+
+        key = -1
+
+        if event == None:
+            pass
+        elif event[0] == "closed":
+            raise SystemExit()
+        elif event[0] == "size":
+            #Like curses does for a terminal, the resize is given to the editor as a key.
+            self.editor.stdscr.resize(event[1], event[2])
+            key = curses.KEY_RESIZE
+        else:
+            key = event[1]
+
+        self.adopt_document()
+
+        return key
+
+
+    #The document of the current buffer, if it has a file.
+    def document_path(self) -> Union[str, None]:
+        return os.path.join(os.getcwd(), self.editor.file) if self.editor.file != None else None
+
+
+    #Makes the editor use the shared document of it's current file, the editor's own copy of the text is dropped. If another
+    #session changed the document the cursor and scroll are kept inside of the text and the wrap index is rebuilt. If nobody
+    #else has the file open it's the editor's text that becomes the document.
+    def adopt_document(self) -> None:
+        path = self.document_path()
+
+        if not self.started or path == None or self.editor.buffers.current.loading:
+            self.document = None
+            return
+
+        document = self.daemon.documents.get(path)
+
+        if document == None:
+            document = Document(self.editor)
+            self.daemon.documents[path] = document
+
+        document.sessions.add(self)
+        self.documents.add(path)
+
+        if self.editor.text is not document.text or document.version != self.seen_version or document is not self.document:
+            for variable in DOCUMENT_STATE:
+                setattr(self.editor, variable, getattr(document, variable))
+
+            editor = self.editor
+            editor.text_version += 1
+            editor.wrap_index.invalidate()
+            editor.find_results.find_enabled = False
+            editor.selection = None
+            editor.cursor_pos_y = min(editor.cursor_pos_y, len(editor.text) - 1)
+            editor.cursor_pos_x = min(editor.cursor_pos_x, len(editor.text[editor.cursor_pos_y]))
+            editor.vertical_scroll_line = min(editor.vertical_scroll_line, editor.cursor_pos_y)
+            editor.vertical_scroll_segment = 0
+        else:
+            for variable in DOCUMENT_STATE[1:]:
+                setattr(self.editor, variable, getattr(document, variable))
+
+        self.document = document
+        self.seen_version = document.version
+
+
+    #Called by the editor when something that belongs to the document changed. The other sessions editing it are woken up so
+    #they show the change.
+    def document_changed(self, text_changed: bool) -> None:
+        if self.document == None or self.editor.text is not self.document.text:
+            return
+
+        for variable in DOCUMENT_STATE:
+            setattr(self.document, variable, getattr(self.editor, variable))
+
+        if text_changed:
+            self.document.version += 1
+            self.seen_version = self.document.version
+
+        for session in self.document.sessions:
+            if session is not self:
+                session.events.put(None)
+
+
+    #Stops sharing the document of the given file. If no other session has it open it's journal is closed, otherwise the
+    #journal is taken away from the editor so closing the buffer doesn't close it.
+    def leave_document(self, file: Union[str, None]) -> None:
+        if file == None:
+            return
+
+        path = os.path.join(os.getcwd(), file)
+        document = self.daemon.documents.get(path)
+
+        if document == None:
+            return
+
+        document.sessions.discard(self)
+        self.documents.discard(path)
+
+        if document.sessions == set():
+            del self.daemon.documents[path]
+            return
+
+        for buffer in self.editor.buffers.buffers:
+            if buffer.text is document.text:
+                buffer.journal = None
+
+        if self.editor.text is document.text:
+            self.editor.journal = None
+
+        if self.document is document:
+            self.document = None
+
+
+    def close(self) -> None:
+        self.daemon.sessions.discard(self)
+
+        for path in list(self.documents):
+            document = self.daemon.documents.get(path)
+
+            if document == None:
+                continue
+
+            document.sessions.discard(self)
+
+            if document.sessions == set():
+                if document.journal != None:
+                    document.journal.close()
+
+                del self.daemon.documents[path]
+
+
+
+#Listens on the socket and starts a session for every client. It exits once it had no clients for "IDLE_TIMEOUT" seconds.
+class EditorDaemon:
+    def __init__(self, socket_path: str) -> None:
+        self.socket_path = socket_path
+        #Only the session holding the lock runs, see "Session.next_key".
+        self.lock = threading.Lock()
+        #The documents by absolute path.
+        self.documents = {}
+        self.sessions = set()
+        #The input prompts of all the sessions share their history.
+        self.prompt_history = prompt_history.PromptHistory(prompt_history.history_path())
+        #And their registers, text cut in one session can be pasted in another, see "clipboard.py".
+        self.registers = {}
+
+
+    def serve(self) -> None:
+        #A socket left behind by a daemon that didn't exit properly is removed, one that's still answering isn't.
+        if os.path.exists(self.socket_path):
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                    probe.connect(self.socket_path)
+
+                raise SystemExit("An editor daemon is already listening on {}".format(self.socket_path))
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.remove(self.socket_path)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        server.listen()
+        server.settimeout(1)
+
+        idle_since = time.monotonic()
+
+        try:
+            while True:
+                try:
+                    connection, address = server.accept()
+                    connection.settimeout(None)
+                    Session(self, connection)
+                except socket.timeout:
+                    pass
+
+                if self.sessions != set():
+                    idle_since = time.monotonic()
+                elif time.monotonic() - idle_since > IDLE_TIMEOUT:
+                    break
+        finally:
+            server.close()
+            os.remove(self.socket_path)
+
+
+
+#Connects to the daemon listening on the given socket. If there's none, a daemon is started in the background.
+def connect(socket_path: str) -> socket.socket:
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        connection.connect(socket_path)
+        return connection
+    except (ConnectionRefusedError, FileNotFoundError):
+        pass
+
+    editor_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "text_editor.py")
+    subprocess.Popen([sys.executable, editor_path, "--daemon", "--socket", socket_path], stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+    deadline = time.monotonic() + START_TIMEOUT
+
+    while True:
+        try:
+            connection.connect(socket_path)
+            return connection
+        except (ConnectionRefusedError, FileNotFoundError):
+            if time.monotonic() > deadline:
+                raise SystemExit("Couldn't start the editor daemon on {}".format(socket_path))
+
+            time.sleep(0.05)
+
+
+
+#The terminal side of a session. It sends the keys it reads and the size of the terminal, and draws the rows it receives.
+class DaemonClient(utils.CursesUtils):
+    def __init__(self, socket_path: str) -> None:
+        self.connection = connect(socket_path)
+
+        super().__init__()
+        self.stdscr.nodelay(True)
+
+        try:
+            config = editor_config.read_config_file()[0]
+        except ValueError as e:
+            self.end_curses()
+            raise SystemExit(str(e))
+
+        #The curses attribute of every colour field, by the number the daemon sends, "0" is the default colour.
+        self.colours_by_number = [0] + [self.get_colour(getattr(config, field)) for field in config.colour_fields()]
+
+
+    def client(self, path: Union[str, None]) -> None:
+        send_message(self.connection, {"attach" : path, "size" : [self.y_size, self.x_size]})
+        self.connection.setblocking(False)
+        pending = b""
+
+        try:
+            while True:
+                readable = select.select([sys.stdin, self.connection], [], [], 1)[0]
+
+                #Send every key waiting, and the new size if the terminal was resized.
+                while True:
+                    key = self.read_key()
+
+                    if key == -1:
+                        break
+
+                    #"read_key" already read the new size.
+                    if key == curses.KEY_RESIZE:
+                        send_message(self.connection, {"size" : [self.y_size, self.x_size]})
+                    else:
+                        send_message(self.connection, {"key" : key})
+
+                if self.connection not in readable:
+                    continue
+
+                try:
+                    data = self.connection.recv(1 << 20)
+                except BlockingIOError:
+                    continue
+
+                if data == b"":
+                    raise SystemExit("The editor daemon closed the connection")
+
+                pending += data
+
+                while b"\n" in pending:
+                    line, pending = pending.split(b"\n", 1)
+                    message = json.loads(line)
+
+                    if "quit" in message:
+                        raise SystemExit(message["quit"])
+
+                    self.draw(message)
+
+                self.stdscr.refresh()
+        finally:
+            self.end_curses()
+
+
+    def draw(self, message: dict) -> None:
+        for y in message["clear"]:
+            self.stdscr.move(y, 0)
+            self.stdscr.clrtoeol()
+
+        for y, calls in message["rows"].items():
+            y = int(y)
+            self.stdscr.move(y, 0)
+            self.stdscr.clrtoeol()
+
+            for x, string, colour in calls:
+                #Like the editor, the text might reach the lower right corner.
+                try:
+                    self.stdscr.addstr(y, x, string, self.colours_by_number[colour])
+                except curses.error:
+                    pass
@@ -0,0 +1,277 @@
+import marshal, os, re, time
+from dataclasses import dataclass
+from typing import Union
+
+
+
+#The configuration file is YAML, but importing and running the YAML parser is the slowest part of starting the editor. So once
+#the configuration has been parsed and validated it's stored in a cache file, using "marshal", which loads almost instantly.
+#The cache is only used while the configuration file's modification time and size match the ones stored in the cache.
+
+#Increment it whenever the format of the cache or the validation change, so old caches are discarded.
+CACHE_VERSION = 11
+
+#The configuration file is always looked for next to the editor, not in the working directory.
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yaml")
+
+#The fields every section of the configuration file must have.
+REQUIRED_FIELDS = {
+    "TEXT-COLOUR" : ["text-colour", "normal-cursor-colour", "over-text-cursor-colour", "find-match-colour"],
+    "EDITOR-COLOUR" : ["line-colour", "empty-line-colour", "prompt-colour", "input-colour"],
+    "STATUS-BAR" : ["status-bar-colour", "status-bar-style"],
+    "MISC" : ["confirmation-key-count", "tabstop-width"]
+}
+
+#Fields that can be left out of the configuration file, along with their default value.
+OPTIONAL_FIELDS = {
+    "TEXT-COLOUR" : {"selection-colour" : "BLACK_CYAN"},
+    "MISC" : {"config-hot-reload" : False, "idle-buffer-line-budget" : 1000000, "soft-wrap" : False, "line-index-cache" : False, "recovery-journal" : True,
+        "autosave-idle-seconds" : 0, "autosave-modification-count" : 0, "sort-line-budget" : 1000000,
+        "hot-line-budget" : 0, "compressed-block-budget" : 0}
+}
+
+#The colours that can be used in the configuration file, see README.
+COLOUR_NAMES = ["BLACK", "BLUE", "CYAN", "GREEN", "MAGENTA", "RED", "WHITE", "YELLOW"]
+
+#The elements that can be used in the status-bar.
+STATUS_BAR_ELEMENTS = ["filename", "lines", "modified", "fps", "cursor", "time"]
+
+
+
+#The path of the cache for the given configuration file.
+def cache_path(path: str) -> str:
+    directory, filename = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, "." + filename + ".cache")
+
+
+
+#Makes sure the configuration has every field and that they have valid values. Raises a "ValueError" explaining the problem
+#otherwise.
+def validate_config(config_file: dict) -> None:
+    if not isinstance(config_file, dict):
+        raise ValueError("The configuration file is empty or malformed")
+
+    for section, fields in REQUIRED_FIELDS.items():
+        if not isinstance(config_file.get(section), dict):
+            raise ValueError("Missing section \"{}\" in configuration file".format(section))
+
+        for field in fields:
+            if field not in config_file[section]:
+                raise ValueError("Missing field \"{}\" in section \"{}\" of configuration file".format(field, section))
+
+    #Every field ending in "colour" is a colour pair, see README.
+    for section, fields in REQUIRED_FIELDS.items():
+        for field in fields + list(OPTIONAL_FIELDS.get(section, {})):
+            value = config_file[section].get(field, "WHITE_BLACK")
+
+            if field.endswith("colour"):
+                if not isinstance(value, str) or len(value.split("_")) != 2 or any(c not in COLOUR_NAMES for c in value.split("_")):
+                    raise ValueError("Invalid colour \"{}\" for field \"{}\" in configuration file".format(value, field))
+
+    for field in REQUIRED_FIELDS["MISC"]:
+        value = config_file["MISC"][field]
+
+        if not isinstance(value, int) or value < 1:
+            raise ValueError("Field \"{}\" in configuration file must be a positive integer".format(field))
+
+    for field in ["config-hot-reload", "soft-wrap", "line-index-cache", "recovery-journal"]:
+        if not isinstance(config_file["MISC"].get(field, False), bool):
+            raise ValueError("Field \"{}\" in configuration file must be true or false".format(field))
+
+    for field in ["idle-buffer-line-budget", "autosave-idle-seconds", "autosave-modification-count", "hot-line-budget", "compressed-block-budget"]:
+        value = config_file["MISC"].get(field, 0)
+
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            raise ValueError("Field \"{}\" in configuration file must be zero or a positive integer".format(field))
+
+    sort_line_budget = config_file["MISC"].get("sort-line-budget", 1)
+
+    if not isinstance(sort_line_budget, int) or isinstance(sort_line_budget, bool) or sort_line_budget < 1:
+        raise ValueError("Field \"sort-line-budget\" in configuration file must be a positive integer")
+
+    #Parsing the style validates it.
+    parse_status_bar_style(config_file["STATUS-BAR"]["status-bar-style"])
+
+    #The "KEYS" section is optional, and it can be left empty.
+    keys = config_file.get("KEYS") or {}
+
+    if not isinstance(keys, dict):
+        raise ValueError("Section \"KEYS\" in configuration file must bind actions to keys")
+
+    import keymap
+
+    keymap.validate_keys(keys)
+
+
+
+#Splits the status-bar style into a tuple of "(separator, element)" tuples, see README. Raises a "ValueError" if the style has an
+#invalid element or separator.
+def parse_status_bar_style(style: Union[str, None]) -> tuple[tuple[str, str], ...]:
+    #If there's nothing for the style the status-bar is empty.
+    if style == None:
+        return ()
+
+    #Isolates the added elements.
+    status_added_elements = re.findall("\\w+", style)
+    #Isolates the separators.
+    status_added_separators = re.findall("[-\\\\/]", style)
+
+    for element in status_added_elements:
+        if element not in STATUS_BAR_ELEMENTS:
+            raise ValueError("Invalid element, \"{}\" in statusbar configuration!".format(element))
+
+    if len(status_added_separators) != len(status_added_elements):
+        raise ValueError("Invalid separator in statusbar configuration!")
+
+    return tuple(zip(status_added_separators, status_added_elements))
+
+
+#The validated configuration. It's created once when the configuration is loaded, and replaced as a whole if it's reloaded, so
+#the editor never has to look anything up in the configuration file while running. Besides the fields of the configuration
+#file it has everything that can be derived from them, like the parsed status-bar style.
+@dataclass(frozen=True)
+class EditorConfig:
+    #Colours, see README.
+    text_colour: str
+    normal_cursor_colour: str
+    over_text_cursor_colour: str
+    find_match_colour: str
+    selection_colour: str
+    line_colour: str
+    empty_line_colour: str
+    prompt_colour: str
+    input_colour: str
+    status_bar_colour: str
+
+    #The status-bar style, as a tuple of "(separator, element)" tuples.
+    status_bar_template: tuple
+    confirmation_key_count: int
+    tabstop_width: int
+    #Whether the configuration file is watched for changes and reloaded while the editor runs.
+    config_hot_reload: bool
+    #How many lines the buffers that aren't being edited can hold in total before the least recently used ones are dropped.
+    idle_buffer_line_budget: int
+    #Whether long lines are wrapped instead of scrolled horizontally when the editor starts.
+    soft_wrap: bool
+    #Whether view mode keeps the line index of big files in a cache, so reopening them doesn't index them again.
+    line_index_cache: bool
+    #Whether unsaved changes are written to a recovery journal, see "journal.py".
+    recovery_journal: bool
+    #After how many seconds without modifications, or how many modifications, the current buffer is autosaved. Zero disables
+    #each of them, see "autosave.py".
+    autosave_idle_seconds: int
+    autosave_modification_count: int
+    #How many lines are sorted in memory, bigger ranges are sorted with temporary files, see "line_transforms.py".
+    sort_line_budget: int
+    #How many lines of the text are kept decompressed, and how many megabytes the compressed lines can take before they are
+    #written to a temporary file. Zero disables each of them, see "line_store.py".
+    hot_line_budget: int
+    compressed_block_budget: int
+    #The keys of the actions the "KEYS" section changes, see "keymap.py".
+    keys: dict
+
+    #Creates the configuration from a validated configuration file.
+    @classmethod
+    def from_config_file(cls, config_file: dict) -> "EditorConfig":
+        fields = {}
+
+        for section, section_fields in REQUIRED_FIELDS.items():
+            for field in section_fields:
+                fields[field.replace("-", "_")] = config_file[section][field]
+
+        for section, section_fields in OPTIONAL_FIELDS.items():
+            for field, default in section_fields.items():
+                fields[field.replace("-", "_")] = config_file[section].get(field, default)
+
+        fields["status_bar_template"] = parse_status_bar_style(fields.pop("status_bar_style"))
+        fields["keys"] = config_file.get("KEYS") or {}
+
+        return cls(**fields)
+
+
+    #The names of every colour field, the optional ones after the required ones.
+    @staticmethod
+    def colour_fields() -> list[str]:
+        fields = [field for fields in REQUIRED_FIELDS.values() for field in fields] + [field for fields in OPTIONAL_FIELDS.values() for field in fields]
+        return [field.replace("-", "_") for field in fields if field.endswith("colour")]
+
+
+
+#Reads the configuration file in the given path, from the cache if it's up to date. Otherwise it's parsed, validated and then
+#cached. Returns the configuration and whether the cache was used.
+def read_config_file(path: str = CONFIG_PATH) -> tuple[EditorConfig, bool]:
+    stat = os.stat(path)
+    #What the cache has to match in order to be valid.
+    key = (CACHE_VERSION, stat.st_mtime_ns, stat.st_size)
+
+    try:
+        with open(cache_path(path), "rb") as f:
+            cached_key, config_file = marshal.load(f)
+
+        if tuple(cached_key) == key:
+            return EditorConfig.from_config_file(config_file), True
+
+    #There's no cache or it's corrupt, either way the configuration file is parsed.
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    #The YAML parser is only imported when it's needed.
+    import yaml
+
+    with open(path, "r") as f:
+        try:
+            config_file = yaml.safe_load(f)
+        except yaml.YAMLError as e:
+            raise ValueError("The configuration file isn't valid YAML: {}".format(e))
+
+    validate_config(config_file)
+
+    #Failing to write the cache is not a problem, the file will simply be parsed again next time.
+    #It's written to a temporary file first so a reader never finds half a cache.
+    try:
+        temporary_path = cache_path(path) + ".{}".format(os.getpid())
+
+        with open(temporary_path, "wb") as f:
+            marshal.dump((key, config_file), f)
+
+        os.replace(temporary_path, cache_path(path))
+    except OSError:
+        pass
+
+    return EditorConfig.from_config_file(config_file), False
+
+
+
+#Watches the configuration file for changes by polling it's modification time, at most once every "poll_interval" seconds. It's
+#cheap enough to call "poll" every frame.
+class ConfigWatcher:
+    def __init__(self, path: str = CONFIG_PATH, poll_interval: float = 1) -> None:
+        self.path = path
+        self.poll_interval = poll_interval
+
+        self.next_poll_time = time.monotonic() + poll_interval
+        self.last_mtime = self.get_mtime()
+
+
+    def get_mtime(self) -> Union[int, None]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+
+    #Returns the new configuration if the file changed since the last poll, otherwise "None". If the new configuration is
+    #invalid the "ValueError" explaining why is raised, the change isn't checked again until the file is modified again.
+    def poll(self) -> Union[EditorConfig, None]:
+        if time.monotonic() < self.next_poll_time:
+            return None
+
+        self.next_poll_time = time.monotonic() + self.poll_interval
+        mtime = self.get_mtime()
+
+        if mtime == None or mtime == self.last_mtime:
+            return None
+
+        self.last_mtime = mtime
+
+        return read_config_file(self.path)[0]
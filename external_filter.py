@@ -0,0 +1,91 @@
+import buffers, subprocess, threading, signal, os
+
+
+
+#Runs lines of the buffer through a shell command, like "sort" or "jq", and collects what it prints. The lines are written to
+#the command by one thread while another reads it's output, so the command never blocks on a full pipe and the editor can show
+#the progress and cancel it. The lines are written straight from the buffer, one at a time, only the output is collected, as
+#new lines, so the text isn't copied to be sent.
+"""
+Buffer lines --writer thread--> stdin [command] stdout --reader thread--> output lines
+                                             stderr --error thread--> last "ERROR_TAIL_SIZE" characters
+"""
+
+#How many characters of the command's error output are kept, to show why it failed.
+ERROR_TAIL_SIZE = 4096
+#How often the progress is shown while the command runs, in seconds.
+REFRESH_INTERVAL = 0.05
+
+
+
+class FilterJob:
+    def __init__(self, command: str, lines: list) -> None:
+        self.command = command
+        self.lines = lines
+
+        #How many lines were written to the command and read from it.
+        self.written_lines = 0
+        self.output = []
+        self.error_output = ""
+        self.cancelled = False
+        #The exit status, once the command finished.
+        self.returncode = None
+        self.done = threading.Event()
+
+        #The command gets it's own process group, so cancelling it also stops the commands it started, like the ones in a
+        #pipeline.
+        self.process = subprocess.Popen(command, shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            text=True, errors="replace", start_new_session=True)
+
+        self.error_thread = threading.Thread(target=self.error_reader, daemon=True)
+        self.error_thread.start()
+        threading.Thread(target=self.writer, daemon=True).start()
+        threading.Thread(target=self.reader, daemon=True).start()
+
+
+    def writer(self) -> None:
+        try:
+            for line in self.lines:
+                if self.cancelled:
+                    break
+
+                self.process.stdin.write(line.line_text + "\n")
+                self.written_lines += 1
+
+        #The command stopped reading, like "head" does, the rest of the lines aren't needed.
+        except (BrokenPipeError, OSError, ValueError):
+            pass
+
+        finally:
+            try:
+                self.process.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+
+
+    def reader(self) -> None:
+        for line in self.process.stdout:
+            #Remove the newline, the last line might not have one.
+            if line[-1:] == "\n":
+                line = line[:-1]
+
+            self.output.append(buffers.Line(line))
+
+        self.returncode = self.process.wait()
+        self.error_thread.join()
+        self.done.set()
+
+
+    def error_reader(self) -> None:
+        for line in self.process.stderr:
+            self.error_output = (self.error_output + line)[-ERROR_TAIL_SIZE:]
+
+
+    #Stops the command and everything it started. The output read so far is discarded by the editor.
+    def cancel(self) -> None:
+        self.cancelled = True
+
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except OSError:
+            pass
@@ -0,0 +1,269 @@
+import buffers, difflib, threading, select, struct, os
+from typing import Union
+
+
+
+#Files can be changed by other programs while they are open, a log being written or a generated file being regenerated. The
+#editor watches the file of the current buffer with a "FileWatcher", which only tells it that something might have changed.
+#The editor then checks the file's stat against the one it last read or wrote, and if they differ a "FileChangeJob" reads the
+#file and compares it with the buffer in the background. Only the lines that changed are replaced, so the cursor, scroll and
+#search results stay where they were.
+#If the buffer has unsaved changes the new file can be merged with them instead, with a three way merge using the text as it
+#was last on disk, see "merge_lines".
+"""
+Example of a merge:
+On disk before:  a b c d
+The buffer:      a B c d       <- "b" was changed in the editor.
+On disk now:     a b c d e     <- "e" was added by another program.
+Merged:          a B c d e
+"""
+
+#How often the file is checked when inotify isn't available, in seconds.
+POLL_INTERVAL = 1
+#How long the editor waits between comparisons of a file that keeps changing, like a log being written, in seconds.
+CHECK_INTERVAL = 0.5
+#Above this many lines, after removing the lines that are the same at the start and at the end, the lines in between are
+#simply replaced as a whole instead of compared, comparing them could take too long.
+DIFF_LINE_LIMIT = 200000
+
+#The inotify events that mean the file might have changed, see "man inotify".
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+#Each event starts with "wd", "mask", "cookie" and the length of the name that follows.
+EVENT_HEADER = struct.Struct("iIII")
+
+
+
+#Returns the C library if it has inotify, otherwise "None".
+def load_inotify():
+    try:
+        import ctypes, ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+
+        return libc
+    except (ImportError, OSError, AttributeError):
+        return None
+
+
+
+#Watches the file in the given path from a background thread, "changed" is set whenever it might have changed. The directory
+#is watched instead of the file, so the file being deleted or replaced, like most programs save files, is noticed too. Without
+#inotify the file is polled every "POLL_INTERVAL" seconds.
+class FileWatcher:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.changed = threading.Event()
+        self.stopped = threading.Event()
+
+        threading.Thread(target=self.watcher, daemon=True).start()
+
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+
+    def watcher(self) -> None:
+        libc = load_inotify()
+        directory, filename = os.path.split(self.path)
+        descriptor = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC) if libc != None else -1
+
+        if descriptor < 0 or libc.inotify_add_watch(descriptor, os.fsencode(directory), WATCH_MASK) < 0:
+            if descriptor >= 0:
+                os.close(descriptor)
+
+            self.poll()
+            return
+
+        filename = os.fsencode(filename)
+
+        try:
+            while not self.stopped.is_set():
+                #Waking up now and then is only needed to notice that the watcher was stopped.
+                if select.select([descriptor], [], [], POLL_INTERVAL)[0] == []:
+                    continue
+
+                events = os.read(descriptor, 65536)
+                position = 0
+
+                while position < len(events):
+                    length = EVENT_HEADER.unpack_from(events, position)[3]
+                    name = events[position + EVENT_HEADER.size:position + EVENT_HEADER.size + length].rstrip(b"\0")
+                    position += EVENT_HEADER.size + length
+
+                    if name == filename:
+                        self.changed.set()
+        except OSError:
+            self.poll()
+        finally:
+            try:
+                os.close(descriptor)
+            except OSError:
+                pass
+
+
+    def poll(self) -> None:
+        last_stat = buffers.file_stat(self.path)
+
+        while not self.stopped.wait(POLL_INTERVAL):
+            stat = buffers.file_stat(self.path)
+
+            if stat != last_stat:
+                last_stat = stat
+                self.changed.set()
+
+
+
+#Returns the differences between two lists of lines as "(old start, old end, new start, new end)" hunks, in order. The lines
+#that are the same at the start and at the end, all of them but a few when a file is appended to, are skipped before
+#comparing the rest.
+def diff_hunks(old: list[str], new: list[str]) -> list[tuple[int, int, int, int]]:
+    limit = min(len(old), len(new))
+    prefix = 0
+
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+
+    suffix = 0
+
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+
+    old_end = len(old) - suffix
+    new_end = len(new) - suffix
+
+    if prefix == old_end and prefix == new_end:
+        return []
+
+    if old_end - prefix > DIFF_LINE_LIMIT or new_end - prefix > DIFF_LINE_LIMIT:
+        return [(prefix, old_end, prefix, new_end)]
+
+    matcher = difflib.SequenceMatcher(None, old[prefix:old_end], new[prefix:new_end], autojunk=False)
+
+    return [(i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix) for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"]
+
+
+
+#Merges the changes made to "base" in "local" and in "external". Changes to different lines are all kept, changes to the
+#same lines are kept only once if they are the same, otherwise they are a conflict and both versions are kept between
+#conflict markers, like git does. Returns the merged lines and the number of conflicts.
+"""
+Example of a conflict:
+<<<<<<< buffer
+the line as it's in the editor
+=======
+the line as it's on disk
+>>>>>>> disk
+"""
+def merge_lines(base: list[str], local: list[str], external: list[str]) -> tuple[list[str], int]:
+    hunks = sorted([(hunk, True) for hunk in diff_hunks(base, local)] + [(hunk, False) for hunk in diff_hunks(base, external)])
+
+    merged = []
+    conflicts = 0
+    #How many lines each version has gained, compared to base, before the current position.
+    local_offset = 0
+    external_offset = 0
+    base_position = 0
+    index = 0
+
+    while index < len(hunks):
+        #Changes that overlap, or insert at the same place, are merged together.
+        start, end = hunks[index][0][0], hunks[index][0][1]
+        group = []
+
+        while index < len(hunks) and (hunks[index][0][0] < end or hunks[index][0][0] == start):
+            end = max(end, hunks[index][0][1])
+            group.append(hunks[index])
+            index += 1
+
+        local_changes = sum((j2 - j1) - (i2 - i1) for (i1, i2, j1, j2), is_local in group if is_local)
+        external_changes = sum((j2 - j1) - (i2 - i1) for (i1, i2, j1, j2), is_local in group if not is_local)
+        local_lines = local[start + local_offset:end + local_offset + local_changes]
+        external_lines = external[start + external_offset:end + external_offset + external_changes]
+
+        merged.extend(base[base_position:start])
+
+        if all(not is_local for hunk, is_local in group) or local_lines == external_lines:
+            merged.extend(external_lines)
+        elif all(is_local for hunk, is_local in group):
+            merged.extend(local_lines)
+        else:
+            merged.extend(["<<<<<<< buffer"] + local_lines + ["======="] + external_lines + [">>>>>>> disk"])
+            conflicts += 1
+
+        local_offset += local_changes
+        external_offset += external_changes
+        base_position = end
+
+    merged.extend(base[base_position:])
+
+    return merged, conflicts
+
+
+
+#Reads the file after it changed and compares it with a snapshot of the buffer, see "buffers.snapshot_text". The changes
+#that turn the buffer into the file are in "reload_hunks". If "disk_text", the text as it was on disk before, is given the
+#file is also merged with the buffer, and the changes that turn the buffer into the merged text are in "merge_hunks". Every
+#hunk is a "(y, removed, added lines)" tuple, in order.
+class FileChangeJob:
+    def __init__(self, buffer: buffers.Buffer, path: str, text: list, disk_text: Union[list, None], modification_count: int, disk_stat: Union[tuple, None]) -> None:
+        #The buffer and how it was when the job started, if it changed the results are no longer valid.
+        self.buffer = buffer
+        self.modification_count = modification_count
+        self.disk_stat = disk_stat
+        self.path = path
+
+        #The stat and the lines of the file, "stat" is "None" if the file was deleted.
+        self.stat = None
+        self.new_lines = None
+        self.reload_hunks = []
+        self.merge_hunks = None
+        self.conflicts = 0
+        #Whether the file couldn't be read.
+        self.failed = False
+
+        self.text = buffers.snapshot_text(text)[0]
+        self.disk_text = disk_text
+        self.done = threading.Event()
+
+        threading.Thread(target=self.compare, daemon=True).start()
+
+
+    def compare(self) -> None:
+        try:
+            self.stat = buffers.file_stat(self.path)
+
+            if self.stat == None:
+                return
+
+            new_lines = [buffers.Line()]
+            buffers.load_lines(self.path, new_lines)
+            self.new_lines = new_lines
+
+            local = [line.line_text for line in self.text]
+            external = [line.line_text for line in new_lines]
+
+            self.reload_hunks = [(i1, i2 - i1, new_lines[j1:j2]) for i1, i2, j1, j2 in diff_hunks(local, external)]
+
+            if self.disk_text != None:
+                merged, self.conflicts = merge_lines([line.line_text for line in self.disk_text], local, external)
+                self.merge_hunks = [(i1, i2 - i1, [buffers.Line(line) for line in merged[j1:j2]]) for i1, i2, j1, j2 in diff_hunks(local, merged)]
+
+        except (OSError, UnicodeDecodeError):
+            self.failed = True
+
+        finally:
+            #The snapshots aren't needed anymore.
+            self.text = None
+            self.disk_text = None
+            self.done.set()
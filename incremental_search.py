@@ -0,0 +1,263 @@
+import buffers, itertools, threading, time, re
+from bisect import bisect_right
+from buffers import SearchMatch
+from typing import Union, Callable
+
+
+
+#Incremental search finds the pattern while it's being typed in the find prompt. After every key the lines on the screen are
+#searched right away, so their matches are highlighted as the pattern is typed, and once the pattern stays the same for
+#"DEBOUNCE_TIME" a "SearchJob" searches the rest of the text on it's own thread. A job is cancelled as soon as the pattern
+#changes, it checks every "SEARCH_CHUNK_SIZE" lines. When the pattern is plain text that extends the previous one, like "abc"
+#after "ab", only the lines that matched the previous one are searched again, since every line with "abc" has "ab".
+#Plain text can't match across lines, so it's searched in chunks of lines joined together, which is several times faster than
+#searching them one by one when there are many matches, see "search_lines". Other patterns are searched line by line.
+#The search works on a snapshot of the text, see "buffers.snapshot_text", which doesn't change while it's searched.
+"""
+Example:
+Typed:      a      ab      abc  ........  Enter
+Viewport:   x      x       x                      <- After every key.
+Job:        x(cancelled)   x--(waits DEBOUNCE_TIME)--searches every line with "ab"
+Enter:                                     uses the job's matches, or waits for it
+"""
+
+#How long the pattern has to stay the same before the whole text is searched, in seconds.
+DEBOUNCE_TIME = 0.15
+#How often the prompt checks on the search while it's waiting or running, in seconds.
+POLL_INTERVAL = 0.05
+#How many lines are searched at once, a job checks whether it was cancelled after every chunk.
+SEARCH_CHUNK_SIZE = 10000
+
+#The characters that make a pattern more than plain text.
+PATTERN_SPECIAL_CHARACTERS = set(".^$*+?{}[]\\|()")
+
+
+
+#Returns the compiled pattern, or "None" if it isn't a valid regular expression.
+def compile_pattern(pattern: str) -> Union[re.Pattern, None]:
+    try:
+        return re.compile(pattern)
+    except re.error:
+        return None
+
+
+#Whether the pattern only matches itself, so any line matching a longer pattern starting with it also matches it.
+def is_literal(pattern: str) -> bool:
+    return not any(character in PATTERN_SPECIAL_CHARACTERS for character in pattern)
+
+
+#Adds the matches of the pattern in line "y" to the results, as the index and length of every match.
+def add_line_matches(results: SearchMatch, compiled_pattern: re.Pattern, y: int, line: buffers.Line) -> None:
+    line_matches = []
+    matches_length = []
+
+    for match in compiled_pattern.finditer(line.line_text):
+        line_matches.append(match.start(0))
+        matches_length.append(match.end(0) - match.start(0))
+
+    if line_matches != []:
+        results.line_and_index[y] = line_matches
+        results.line_match_length[y] = matches_length
+
+
+#Adds the matches of the pattern in the given lines of the text, or in every line if "lines" is "None", to the results. The
+#lines must be in order, so the results are too. Stops early if "cancelled" returns True, it's checked after every chunk.
+def search_lines(results: SearchMatch, compiled_pattern: re.Pattern, text: list, lines: Union[list[int], None] = None, cancelled: Callable[[], bool] = lambda: False) -> None:
+    #An empty pattern matches between every character, joining the lines would add matches at the newlines.
+    joined = compiled_pattern.pattern != "" and is_literal(compiled_pattern.pattern)
+    match_length = len(compiled_pattern.pattern)
+    line_count = len(text) if lines == None else len(lines)
+
+    for chunk_start in range(0, line_count, SEARCH_CHUNK_SIZE):
+        if cancelled():
+            return
+
+        #Slicing reads the text a block at a time when it's in a "line_store.LineStore".
+        if lines == None:
+            chunk = text[chunk_start:chunk_start + SEARCH_CHUNK_SIZE]
+            chunk_lines = range(chunk_start, chunk_start + len(chunk))
+        else:
+            chunk_lines = lines[chunk_start:chunk_start + SEARCH_CHUNK_SIZE]
+            chunk = [text[y] for y in chunk_lines]
+
+        if not joined:
+            for y, line in zip(chunk_lines, chunk):
+                add_line_matches(results, compiled_pattern, y, line)
+
+            continue
+
+        #Where every line starts in the joined text, matches are found in the line whose start is the closest before them.
+        line_starts = list(itertools.accumulate((line.length + 1 for line in chunk[:-1]), initial=0))
+        line_index = -1
+        next_line_start = 0
+
+        for match in compiled_pattern.finditer("\n".join(line.line_text for line in chunk)):
+            start = match.start()
+
+            if start >= next_line_start:
+                line_index = bisect_right(line_starts, start, line_index + 1) - 1
+                next_line_start = line_starts[line_index + 1] if line_index + 1 < len(line_starts) else len(match.string)
+
+                y = chunk_lines[line_index]
+                line_matches = results.line_and_index[y] = []
+                matches_length = results.line_match_length[y] = []
+
+            line_matches.append(start - line_starts[line_index])
+            matches_length.append(match_length)
+
+
+
+#Searching the given lines of the text, or every line if "lines" is "None", on it's own thread. The lines must be in order,
+#so the results are too.
+class SearchJob:
+    def __init__(self, pattern: str, compiled_pattern: re.Pattern, text: list, lines: Union[list[int], None] = None) -> None:
+        self.pattern = pattern
+        self.compiled_pattern = compiled_pattern
+        self.text = text
+        self.lines = lines
+
+        self.results = SearchMatch()
+        self.cancelled = False
+        self.done = threading.Event()
+
+        threading.Thread(target=self.searcher, daemon=True).start()
+
+
+    def searcher(self) -> None:
+        try:
+            search_lines(self.results, self.compiled_pattern, self.text, self.lines, lambda: self.cancelled)
+        finally:
+            self.done.set()
+
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+    #Whether the job searched every line it had to.
+    def finished(self) -> bool:
+        return self.done.is_set() and not self.cancelled
+
+
+
+#Searches the text as the find prompt is typed, see "utils.BasicInput". The matches are shown through the editor's search
+#results, the ones it had before are put back if the prompt is cancelled.
+class IncrementalSearch:
+    def __init__(self, editor: "text_editor.TextEditor") -> None:
+        self.editor = editor
+        self.previous_results = editor.find_results
+
+        self.pattern = ""
+        #"None" while the pattern is empty or invalid.
+        self.compiled_pattern = None
+        #When the pattern last changed, the whole text is searched "DEBOUNCE_TIME" after it.
+        self.change_time = 0
+        #The job searching the current pattern, if it started.
+        self.job = None
+        #The last job that finished, a longer literal pattern only has to search the lines it matched.
+        self.finished_job = None
+
+        self.take_snapshot()
+
+
+    def take_snapshot(self) -> None:
+        self.text = buffers.snapshot_text(self.editor.text)[0]
+        #What the snapshot was taken from, in the daemon other sessions can change the text while the prompt is open.
+        self.source_text = self.editor.text
+        self.modification_count = self.editor.buffer_modification_counter
+        self.job = None
+        self.finished_job = None
+
+
+    #Called after every key that changed the pattern. Returns whether the screen has to be drawn again.
+    def text_changed(self, pattern: str) -> bool:
+        if self.job != None:
+            if self.job.finished():
+                self.finished_job = self.job
+            else:
+                self.job.cancel()
+
+            self.job = None
+
+        self.pattern = pattern
+        self.compiled_pattern = compile_pattern(pattern) if pattern != "" else None
+        self.change_time = time.monotonic()
+
+        results = SearchMatch()
+
+        #The lines on the screen are searched right away.
+        if self.compiled_pattern != None:
+            for y in sorted({y for y, row_start in self.editor.visible_rows() if y < len(self.text)}):
+                add_line_matches(results, self.compiled_pattern, y, self.text[y])
+
+            results.find_enabled = True
+
+        self.editor.find_results = results
+
+        return True
+
+
+    #Called while the prompt waits for keys. Starts the job once the pattern stayed the same long enough, and shows it's
+    #matches once it finishes. Returns whether the screen has to be drawn again.
+    def poll(self) -> bool:
+        if self.compiled_pattern == None:
+            return False
+
+        if self.job == None:
+            if time.monotonic() - self.change_time >= DEBOUNCE_TIME:
+                self.start_job()
+
+            return False
+
+        if self.job.finished() and self.editor.find_results is not self.job.results:
+            self.finished_job = self.job
+            self.job.results.find_enabled = True
+            self.editor.find_results = self.job.results
+
+            return True
+
+        return False
+
+
+    #How long the prompt can wait for a key before calling "poll", or "None" if it can wait until there's one.
+    def wait_time(self) -> Union[float, None]:
+        if self.compiled_pattern == None or (self.job != None and self.editor.find_results is self.job.results):
+            return None
+
+        return POLL_INTERVAL
+
+
+    def start_job(self) -> None:
+        lines = None
+
+        if self.finished_job != None and is_literal(self.finished_job.pattern) and is_literal(self.pattern) and self.pattern.startswith(self.finished_job.pattern):
+            lines = list(self.finished_job.results.line_and_index)
+
+        self.job = SearchJob(self.pattern, self.compiled_pattern, self.text, lines)
+
+
+    #Returns the matches of the entered pattern in the whole text, waiting for the job if it's still running.
+    def finish(self, pattern: str) -> SearchMatch:
+        if self.editor.text is not self.source_text or self.editor.buffer_modification_counter != self.modification_count:
+            if self.job != None:
+                self.job.cancel()
+
+            self.take_snapshot()
+
+        if pattern != self.pattern or self.compiled_pattern == None:
+            self.text_changed(pattern)
+
+        if self.job == None:
+            self.start_job()
+
+        self.job.done.wait()
+
+        return self.job.results
+
+
+    #The prompt was cancelled, the search results are the ones from before it.
+    def cancel(self) -> None:
+        if self.job != None:
+            self.job.cancel()
+
+        self.editor.find_results = self.previous_results
@@ -0,0 +1,261 @@
+import buffers, json, os, queue, threading
+
+
+
+#The recovery journal keeps the unsaved changes of a buffer on disk, so they can be recovered if the editor crashes or the
+#terminal is lost. Every change to the text is an operation that replaced some lines with new ones, the editor hands them to the
+#journal and a background thread appends them to the journal file in batches, so typing never waits for the disk. The file is
+#synced to disk at most once every "FSYNC_INTERVAL" seconds. The journal starts from the file as it was on disk, identified by
+#it's size and modification time. When the journal grows past "COMPACT_SIZE" it's replaced by a snapshot of the whole text.
+#Editing a long line, see "buffers.Line", is an operation that replaced some characters of the line instead, so typing in it
+#doesn't join and write the whole line every key.
+"""
+Example journal:
+{"journal": 1, "file": "notes.txt", "size": 12, "mtime": 1700000000000000000}
+{"y": 0, "r": 1, "a": ["hello!"]}
+{"y": 0, "r": 1, "a": ["hel", "lo!"]}
+{"y": 1, "x": 2, "d": 1, "i": "LL"}  <- A long line, 1 character at index 2 replaced by "LL".
+
+After compaction:
+{"journal": 1, "file": "notes.txt", "snapshot": ["hel", "lo!", "world"]}
+"""
+
+#The version of the journal format, it's stored in the header so old journals can be detected if the format ever changes.
+JOURNAL_VERSION = 1
+#How long the writer waits after an operation for more of them, so they are written together.
+WRITE_INTERVAL = 0.2
+#How often the journal is synced to disk, in seconds, while there are operations that haven't been synced.
+FSYNC_INTERVAL = 1
+#The size at which the journal is compacted into a snapshot.
+COMPACT_SIZE = 8 * 1024 * 1024
+
+
+
+#The path of the journal of the file in the given path. It's next to the file, hidden.
+def journal_path(path: str) -> str:
+    directory, filename = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, "." + filename + ".journal")
+
+
+
+#Reads the journal in the given path. Returns the header and the list of operations, "(y, removed, added lines)" or
+#"(y, x, deleted, inserted)" for the characters of a long line. If the editor crashed while writing, the last line might be
+#incomplete, everything from it on is ignored. Raises a "ValueError" if it's not a valid journal.
+def read_journal(path: str) -> tuple[dict, list[tuple]]:
+    operations = []
+
+    with open(path, "r") as f:
+        try:
+            header = json.loads(f.readline())
+        except json.JSONDecodeError:
+            raise ValueError("The journal has no header")
+
+        if not isinstance(header, dict) or header.get("journal") != JOURNAL_VERSION:
+            raise ValueError("Unsupported journal version")
+
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                break
+
+            if "x" in entry:
+                operations.append((entry["y"], entry["x"], entry["d"], entry["i"]))
+            else:
+                operations.append((entry["y"], entry["r"], entry["a"]))
+
+    return header, operations
+
+
+
+#Returns the lines of the text a journal leads to, given it's header and operations, see "read_journal". "file_path" is the
+#file the journal belongs to, it's read unless the journal has a snapshot. Raises a "ValueError" if the journal can't be used,
+#for example if the file changed since the journal was started.
+def recover_lines(header: dict, operations: list[tuple], file_path: str) -> list[str]:
+    if "snapshot" in header:
+        lines = list(header["snapshot"])
+
+    #The file didn't exist when the journal started, so the text started empty.
+    elif header.get("size") == None:
+        lines = [""]
+
+    else:
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            raise ValueError("The file the journal belongs to doesn't exist anymore")
+
+        if stat.st_size != header.get("size") or stat.st_mtime_ns != header.get("mtime"):
+            raise ValueError("The file changed since the journal was written")
+
+        text = [buffers.Line()]
+        buffers.load_lines(file_path, text)
+        lines = [line.line_text for line in text]
+
+    for operation in operations:
+        if len(operation) == 4:
+            y, x, deleted, inserted = operation
+
+            #The long line is edited as a "buffers.Line", so each operation only copies the chunk it changes.
+            if not isinstance(lines[y], buffers.Line):
+                lines[y] = buffers.Line(lines[y])
+
+            lines[y].delete(x, deleted)
+            lines[y].insert(x, inserted)
+        else:
+            y, removed, added = operation
+            lines[y:y + removed] = added
+
+    return [line.line_text if isinstance(line, buffers.Line) else line for line in lines]
+
+
+
+#The entry of an operation in the journal file, see "read_journal".
+def operation_entry(operation: tuple) -> dict:
+    if len(operation) == 4:
+        return {"y" : operation[0], "x" : operation[1], "d" : operation[2], "i" : operation[3]}
+
+    return {"y" : operation[0], "r" : operation[1], "a" : operation[2]}
+
+
+
+#The journal of a single buffer. The journal file is created as soon as the journal is, and deleted when it's closed, which
+#happens when the buffer is saved or closed, or when the editor exits properly. If "resume" is True the journal file already
+#exists, for example after recovering from it, and the new operations are added to it. Otherwise a "FileExistsError" is raised
+#if it exists, a journal left behind is only deleted once the user chose not to recover it.
+class RecoveryJournal:
+    def __init__(self, file_path: str, file: str, resume: bool = False) -> None:
+        self.path = journal_path(file_path)
+        self.file_path = file_path
+
+        #Operations waiting to be written, "None" stops the writer.
+        self.queue = queue.Queue()
+        #Whether the last write failed, the editor tells the user.
+        self.failed = False
+        #Compaction is stopped if it fails, the journal simply keeps growing.
+        self.compaction_enabled = True
+        #Set when the journal is closed, so the writer doesn't wait for more operations. If "discard" is True the queued
+        #operations aren't written, since the journal is going to be deleted.
+        self.closing = threading.Event()
+        self.discard = False
+
+        if resume:
+            self.journal_file = open(self.path, "a")
+        else:
+            try:
+                stat = os.stat(file_path)
+                header = {"journal" : JOURNAL_VERSION, "file" : file, "size" : stat.st_size, "mtime" : stat.st_mtime_ns}
+            except OSError:
+                header = {"journal" : JOURNAL_VERSION, "file" : file, "size" : None, "mtime" : None}
+
+            self.journal_file = open(self.path, "x")
+            self.journal_file.write(json.dumps(header) + "\n")
+            self.journal_file.flush()
+
+        self.writer_thread = threading.Thread(target=self.writer, daemon=True)
+        self.writer_thread.start()
+
+
+    #Has to be called with every change to the text, "(y, removed, added lines)" if lines "[y, y + removed)" were replaced by
+    #"added", or "(y, x, deleted, inserted)" if "deleted" characters of line "y" at index "x" were replaced by "inserted". It
+    #only queues the operation, so it takes the same time no matter how busy the disk is.
+    def record(self, operation: tuple) -> None:
+        self.queue.put(operation)
+
+
+    def writer(self) -> None:
+        unsynced = False
+
+        while True:
+            try:
+                operation = self.queue.get(timeout=FSYNC_INTERVAL if unsynced else None)
+            #Nothing happened for a while, it's a good moment to sync.
+            except queue.Empty:
+                unsynced = not self.sync()
+                continue
+
+            if operation == None:
+                break
+
+            #Wait for more operations, while typing there's usually a few each batch.
+            self.closing.wait(WRITE_INTERVAL)
+            operations = [operation]
+            stop = False
+
+            while True:
+                try:
+                    operation = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                if operation == None:
+                    stop = True
+                    break
+
+                operations.append(operation)
+
+            if self.discard:
+                break
+
+            try:
+                self.journal_file.write("".join(json.dumps(operation_entry(operation)) + "\n" for operation in operations))
+                self.journal_file.flush()
+                unsynced = True
+
+                if self.journal_file.tell() > COMPACT_SIZE and self.compaction_enabled:
+                    self.compact()
+            except OSError:
+                self.failed = True
+
+            if stop:
+                break
+
+        self.sync()
+
+
+    #Syncs the journal to disk. Returns True if it was successful.
+    def sync(self) -> bool:
+        try:
+            os.fsync(self.journal_file.fileno())
+            return True
+        except (OSError, ValueError):
+            return False
+
+
+    #Replaces the journal by one with a snapshot of the current text, calculated from the journal itself. It's written to a
+    #temporary file first so a crash while compacting never leaves a broken journal.
+    def compact(self) -> None:
+        try:
+            header, operations = read_journal(self.path)
+            lines = recover_lines(header, operations, self.file_path)
+        except ValueError:
+            self.compaction_enabled = False
+            return
+
+        temporary_path = self.path + ".{}".format(os.getpid())
+
+        with open(temporary_path, "w") as f:
+            f.write(json.dumps({"journal" : JOURNAL_VERSION, "file" : header.get("file"), "snapshot" : lines}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temporary_path, self.path)
+
+        self.journal_file.close()
+        self.journal_file = open(self.path, "a")
+
+
+    #Stops the writer, after it writes every queued operation. If "delete" is True the journal file is deleted, the changes
+    #are either saved or discarded.
+    def close(self, delete: bool = True) -> None:
+        self.discard = delete
+        self.closing.set()
+        self.queue.put(None)
+        self.writer_thread.join()
+        self.journal_file.close()
+
+        if delete:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
@@ -0,0 +1,192 @@
+import curses, time
+from typing import Union, Callable
+
+
+
+#Every key the editor reacts to is bound to an action by name, like "save" or "line-start". The keymap is a dictionary from key
+#codes to actions, built from "DEFAULT_KEYS" and the "KEYS" section of the configuration file, so keys can be rebound. The
+#editor and the input prompt each give the actions they support their own function, see "KeyBindings", so a key is looked up
+#once instead of being compared against every key the editor knows.
+#Keys are written as names, like "enter" or "page-down", or as chords, like "ctrl+s" or "alt+s". A few keys are more than one
+#key code, terminals send either "10" or "13" for enter. The movement keys can be used with "shift+" to select text, see
+#"clipboard.py".
+"""
+Example "KEYS" section:
+KEYS:
+    quit: ctrl+w
+    find: [ctrl+f, f3]
+"""
+
+#The key codes of every key name.
+KEY_NAMES = {
+    "enter" : [10, 13, curses.KEY_ENTER],
+    "backspace" : [8, curses.KEY_BACKSPACE],
+    "tab" : [9],
+    "esc" : [27],
+    "delete" : [curses.KEY_DC],
+    "left" : [curses.KEY_LEFT],
+    "right" : [curses.KEY_RIGHT],
+    "up" : [curses.KEY_UP],
+    "down" : [curses.KEY_DOWN],
+    "home" : [curses.KEY_HOME],
+    "end" : [curses.KEY_END],
+    "page-up" : [curses.KEY_PPAGE],
+    "page-down" : [curses.KEY_NPAGE],
+    "shift+left" : [curses.KEY_SLEFT],
+    "shift+right" : [curses.KEY_SRIGHT],
+    "shift+up" : [curses.KEY_SR],
+    "shift+down" : [curses.KEY_SF],
+    "shift+home" : [curses.KEY_SHOME],
+    "shift+end" : [curses.KEY_SEND],
+    "shift+page-up" : [curses.KEY_SPREVIOUS],
+    "shift+page-down" : [curses.KEY_SNEXT],
+    #Terminals send "Ctrl+Space" as a null character.
+    "ctrl+space" : [0],
+}
+KEY_NAMES.update({"f{}".format(number) : [getattr(curses, "KEY_F{}".format(number))] for number in range(1, 13)})
+
+#The keys of every action, unless the configuration file changes them.
+DEFAULT_KEYS = {
+    "enter" : ["enter"],
+    "backspace" : ["backspace"],
+    "delete" : ["delete"],
+    "indent" : ["tab"],
+    "left" : ["left"],
+    "right" : ["right"],
+    "up" : ["up"],
+    "down" : ["down"],
+    "line-start" : ["home"],
+    "line-end" : ["end"],
+    "page-up" : ["page-up"],
+    "page-down" : ["page-down"],
+    "select-left" : ["shift+left"],
+    "select-right" : ["shift+right"],
+    "select-up" : ["shift+up"],
+    "select-down" : ["shift+down"],
+    "select-line-start" : ["shift+home"],
+    "select-line-end" : ["shift+end"],
+    "select-page-up" : ["shift+page-up"],
+    "select-page-down" : ["shift+page-down"],
+    "mark" : ["ctrl+space"],
+    "block-selection" : ["ctrl+b"],
+    "cut" : ["ctrl+x"],
+    "copy" : ["ctrl+c"],
+    "paste" : ["ctrl+v"],
+    "cancel" : ["esc"],
+    "quit" : ["ctrl+q"],
+    "save" : ["ctrl+s"],
+    "save-as" : ["alt+s"],
+    "open" : ["ctrl+o"],
+    "find" : ["ctrl+f"],
+    "tools" : ["ctrl+t"],
+}
+
+#The actions that modify the text, they aren't available while a file is loading. "insert" is typing a character, which
+#isn't bound to keys.
+EDITING_ACTIONS = {"insert", "enter", "backspace", "delete", "indent", "cut", "paste"}
+
+#The actions that move the cursor. With "select-" before them they select the text they move over, see "clipboard.py".
+MOVEMENT_ACTIONS = ["left", "right", "up", "down", "line-start", "line-end", "page-up", "page-down"]
+
+#The characters that are typed instead of being looked up, this range covers all of extended ASCII.
+FIRST_CHARACTER = 32
+LAST_CHARACTER = 253
+
+
+
+#Returns the key codes of the given key name or chord. Raises a "ValueError" if it isn't one.
+def parse_key(name: str) -> list[int]:
+    name = name.strip().lower()
+
+    if name in KEY_NAMES:
+        return KEY_NAMES[name]
+
+    modifier, separator, letter = name.partition("+")
+
+    if separator == "" or len(letter) != 1 or not "a" <= letter <= "z":
+        raise ValueError("Invalid key \"{}\"".format(name))
+
+    #"Ctrl" gives the letter's uppercase ASCII code minus 64, so "Ctrl+E" is 5. Curses gives "Alt" keys as the uppercase
+    #ASCII code plus 352.
+    if modifier == "ctrl":
+        return [ord(letter.upper()) - 64]
+    elif modifier == "alt":
+        return [ord(letter.upper()) + 352]
+
+    raise ValueError("Invalid key \"{}\"".format(name))
+
+
+
+#Makes sure the "KEYS" section of the configuration file only binds known actions to valid keys. Raises a "ValueError"
+#explaining the problem otherwise.
+def validate_keys(keys: dict) -> None:
+    for action, names in keys.items():
+        if action not in DEFAULT_KEYS:
+            raise ValueError("Unknown action \"{}\" in section \"KEYS\" of configuration file".format(action))
+
+        if isinstance(names, str):
+            names = [names]
+
+        if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+            raise ValueError("Field \"{}\" in section \"KEYS\" of configuration file must be a key or a list of keys".format(action))
+
+        for name in names:
+            try:
+                parse_key(name)
+            except ValueError as e:
+                raise ValueError("{} for action \"{}\" in configuration file".format(e, action))
+
+
+
+#Returns the keymap, a dictionary from key codes to actions. "keys" are the keys of the actions that are changed, from the
+#configuration file. A key bound by the configuration file is taken from the action it has by default.
+def build_keymap(keys: dict) -> dict[int, str]:
+    keymap = {}
+
+    #The default keys go first, so the ones from the configuration file replace them.
+    for action, names in [(action, names) for action, names in DEFAULT_KEYS.items() if action not in keys] + list(keys.items()):
+        for name in [names] if isinstance(names, str) else names:
+            for key in parse_key(name):
+                keymap[key] = action
+
+    return keymap
+
+
+
+#The functions of the actions one part of the editor supports, by key code. If "profile" is a dictionary the time taken by
+#every action is added to it, as "action : [times run, seconds]", so a replay can tell where the time went.
+class KeyBindings:
+    def __init__(self, keymap: dict[int, str], actions: dict[str, Callable]) -> None:
+        #Every key bound to an action that's supported, as "key : (action, function)".
+        self.bindings = {key : (action, actions[action]) for key, action in keymap.items() if action in actions}
+        self.profile = None
+
+
+    #Returns the "(action, function)" bound to the key, or "None".
+    def get(self, key: int) -> Union[tuple[str, Callable], None]:
+        return self.bindings.get(key)
+
+
+    def run(self, action: str, function: Callable) -> None:
+        if self.profile == None:
+            function()
+            return
+
+        start_time = time.perf_counter()
+
+        try:
+            function()
+        finally:
+            entry = self.profile.setdefault(action, [0, 0])
+            entry[0] += 1
+            entry[1] += time.perf_counter() - start_time
+
+
+    #A table of the time taken by every action, the slowest first.
+    def report(self) -> str:
+        lines = ["{:<14}{:>8}{:>12}{:>12}".format("Action", "Keys", "Total (ms)", "Mean (ms)")]
+
+        for action, (count, seconds) in sorted(self.profile.items(), key=lambda entry: entry[1][1], reverse=True):
+            lines.append("{:<14}{:>8}{:>12.3f}{:>12.3f}".format(action, count, seconds * 1000, seconds * 1000 / count))
+
+        return "\n".join(lines)
@@ -0,0 +1,146 @@
+import json, math, time
+from typing import Union
+
+
+
+#The version of the trace format, it's stored in the header so old traces can be detected if the format ever changes.
+TRACE_VERSION = 1
+
+
+
+#Raised by the replayer once every recorded key has been fed to the editor, it's how the replay loop knows it has to stop.
+class TraceFinished(Exception):
+    pass
+
+
+
+#Records every key the editor receives, along with the time at which it was received. The trace is a text file with one JSON
+#object per line, the first one is a header, then there's one line per key and, if the editor exited properly, a trailer with
+#the checksum of the final buffer.
+"""
+Example trace:
+{"trace": 1, "file": "notes.txt", "checksum": "9f86d0..."}
+{"t": 0.000000, "k": 72}
+{"t": 0.153211, "k": 105}
+{"checksum": "3a6eb0..."}
+"""
+class KeyTraceRecorder:
+    def __init__(self, path: str, file: Union[str, None], checksum: str) -> None:
+        self.trace_file = open(path, "w")
+        #Key times are stored relative to this moment.
+        self.start_time = time.perf_counter()
+
+        self.write_entry({"trace" : TRACE_VERSION, "file" : file, "checksum" : checksum})
+
+
+    def write_entry(self, entry: dict) -> None:
+        self.trace_file.write(json.dumps(entry) + "\n")
+
+
+    #Has to be called with every key the editor receives.
+    def record_key(self, key: int) -> None:
+        self.write_entry({"t" : round(time.perf_counter() - self.start_time, 6), "k" : key})
+
+
+    #Writes the trailer and closes the trace. The checksum is the one of the buffer when the editor exited.
+    def close(self, checksum: str) -> None:
+        if self.trace_file.closed:
+            return
+
+        self.write_entry({"checksum" : checksum})
+        self.trace_file.close()
+
+
+
+#Loads a trace from the given path. Returns the header, a list of "(time, key)" tuples and the trailer, which is an empty
+#dictionary if the recording didn't finish properly.
+def load_trace(path: str) -> tuple[dict, list[tuple[float, int]], dict]:
+    header = {}
+    events = []
+    trailer = {}
+
+    with open(path, "r") as f:
+        for line_number, line in enumerate(f):
+            if line.strip() == "":
+                continue
+
+            entry = json.loads(line)
+
+            if line_number == 0:
+                if entry.get("trace") != TRACE_VERSION:
+                    raise ValueError("\"{}\" is not a supported key trace".format(path))
+                header = entry
+            elif "k" in entry:
+                events.append((entry["t"], entry["k"]))
+            else:
+                trailer = entry
+
+    return header, events, trailer
+
+
+
+#Feeds recorded keys back to the editor, to do so "next_key" has to be set as the editor's key source. If "realtime" is True
+#keys are given at the same pace they were recorded, otherwise as fast as possible. The time between handing a key to the
+#editor and the editor asking for the next one is that key's latency, it includes both handling the key and drawing the frame.
+class KeyTraceReplayer:
+    def __init__(self, events: list[tuple[float, int]], realtime: bool) -> None:
+        self.events = events
+        self.realtime = realtime
+
+        self.event_index = 0
+        #The latency of every replayed key, in seconds.
+        self.latencies = []
+        #When the last key was handed to the editor, "None" until the first key is given.
+        self.last_key_time = None
+        self.start_time = time.perf_counter()
+
+
+    def next_key(self) -> int:
+        now = time.perf_counter()
+
+        if self.last_key_time != None:
+            self.latencies.append(now - self.last_key_time)
+
+        if self.event_index >= len(self.events):
+            raise TraceFinished()
+
+        key_time, key = self.events[self.event_index]
+        self.event_index += 1
+
+        #Wait until the moment the key was originally pressed.
+        if self.realtime:
+            delay = self.start_time + key_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        self.last_key_time = time.perf_counter()
+
+        return key
+
+
+    #Creates a human readable report of the replay. "total_time" is how long the whole replay took, in seconds.
+    def report(self, total_time: float, final_checksum: str, expected_checksum: Union[str, None]) -> str:
+        lines = ["Replayed {} of {} keys in {:.3f} s".format(self.event_index, len(self.events), total_time)]
+
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            mean = sum(ordered) / len(ordered)
+
+            lines.append("Key latency (ms): mean {:.3f} | p50 {:.3f} | p90 {:.3f} | p99 {:.3f} | max {:.3f}".format(mean * 1000,
+                percentile(ordered, 50) * 1000, percentile(ordered, 90) * 1000, percentile(ordered, 99) * 1000, ordered[-1] * 1000))
+
+        if expected_checksum == None:
+            lines.append("Final buffer checksum {} (the trace has no checksum to compare against)".format(final_checksum))
+        elif final_checksum == expected_checksum:
+            lines.append("Final buffer matches the recorded checksum")
+        else:
+            lines.append("Final buffer DOES NOT match the recorded checksum ({} != {})".format(final_checksum, expected_checksum))
+
+        return "\n".join(lines)
+
+
+
+#Nearest rank percentile of an already sorted, non empty list.
+def percentile(ordered: list[float], percent: float) -> float:
+    index = max(0, min(len(ordered) - 1, math.ceil(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
@@ -0,0 +1,324 @@
+import unicodedata
+from bisect import bisect_right
+from itertools import accumulate
+
+
+
+#Everything about where things go on the screen that can be calculated once and reused between frames. It has to be updated
+#every frame with "update", but it only recalculates anything when the console size or the number of digits in the line count
+#change.
+"""
+Screen layout:
+ 1hello         <- The gutter, with the line numbers, is "gutter_width" wide. The text uses the rest of the width.
+ 2world
+~               <- "max_displayed_lines" rows of text.
+status-bar      <- Row "status_bar_row".
+prompt          <- Row "prompt_row".
+"""
+class EditorLayout:
+    def __init__(self) -> None:
+        self.y_size = 0
+        self.x_size = 0
+        self.line_count = 0
+
+        #The number of characters required to fit the line numbers, a minimum of 2.
+        self.gutter_width = 2
+        #The line count at which the gutter has to grow, and below which it has to shrink.
+        self.gutter_grow_count = 0
+        self.gutter_shrink_count = 0
+
+        #How many lines of text fit in the screen.
+        self.max_displayed_lines = 0
+        #Maximum allowed text width, in chars.
+        self.max_text_width = 0
+        self.status_bar_row = 0
+        self.prompt_row = 0
+
+        #Line numbers already padded to the gutter's width, by line index. Only the lines around the viewport are kept.
+        self.line_number_cache = {}
+
+
+    #Has to be called every frame, before anything that depends on the layout. Returns True if the layout changed.
+    def update(self, y_size: int, x_size: int, line_count: int) -> bool:
+        changed = False
+
+        if y_size != self.y_size or x_size != self.x_size:
+            self.y_size = y_size
+            self.x_size = x_size
+
+            self.max_displayed_lines = max(y_size - 2, 1)
+            self.status_bar_row = self.max_displayed_lines
+            self.prompt_row = self.max_displayed_lines + 1
+            changed = True
+
+        if line_count != self.line_count:
+            self.line_count = line_count
+
+            #The gutter only changes when the line count crosses a power of ten.
+            if line_count >= self.gutter_grow_count or line_count < self.gutter_shrink_count:
+                digits = len(str(max(line_count, 1)))
+
+                self.gutter_width = max(digits, 2)
+                self.gutter_grow_count = 10 ** digits
+                self.gutter_shrink_count = 10 ** (digits - 1)
+                changed = True
+
+        if changed:
+            self.max_text_width = max(self.x_size - self.gutter_width, 1)
+            self.line_number_cache = {}
+
+        return changed
+
+
+    #Returns the line number of the line with the given index, padded to the gutter's width.
+    def line_number(self, y: int) -> str:
+        try:
+            return self.line_number_cache[y]
+        except KeyError:
+            pass
+
+        #Keep only the numbers of a few screens worth of lines, so scrolling through a large file doesn't fill the cache.
+        if len(self.line_number_cache) > self.max_displayed_lines * 4:
+            self.line_number_cache = {}
+
+        self.line_number_cache[y] = str(y + 1).rjust(self.gutter_width)
+
+        return self.line_number_cache[y]
+
+
+
+
+#How many terminal cells the given char takes when it starts at the given display column. Tabs go up to the next tabstop,
+#control characters are shown as "^X", wide east asian characters take two cells and combining characters none.
+def char_width(char: str, column: int, tabstop: int) -> int:
+    if char == "\t":
+        return tabstop - column % tabstop
+
+    if char < " " or char == "\x7f":
+        return 2
+
+    if char.isascii():
+        return 1
+
+    if unicodedata.combining(char) or unicodedata.category(char) == "Cf":
+        return 0
+
+    if unicodedata.east_asian_width(char) in ("W", "F"):
+        return 2
+
+    return 1
+
+
+
+#Returns what has to be printed to show the display columns "[start, end)" of the given line. Tabs are expanded to spaces and
+#control characters are shown as "^X". A wide character that's cut by the start or the end is replaced by spaces, so the
+#result is always exactly as wide as the columns it covers, up to the end of the line.
+def render_columns(line, start: int, end: int, tabstop: int) -> str:
+    x = line.index_at_column(start, tabstop)
+
+    #Lines with only one cell characters don't need anything else.
+    if line.column_offsets == None:
+        return line.slice(x, x + end - start)
+
+    column = line.column_of(x, tabstop)
+    pieces = []
+
+    while column < end and x < len(line):
+        #At least as many characters as columns are left are needed, more if there are combining characters.
+        for char in line.slice(x, x + max(end - column, 16)):
+            width = char_width(char, column, tabstop)
+
+            if column < start or column + width > end:
+                pieces.append(" " * (min(column + width, end) - max(column, start)))
+            elif char == "\t":
+                pieces.append(" " * width)
+            elif width == 2 and (char < " " or char == "\x7f"):
+                pieces.append("^" + chr(ord(char) ^ 64))
+            else:
+                pieces.append(char)
+
+            column += width
+            x += 1
+
+            if column >= end:
+                break
+
+    return "".join(pieces)
+
+
+
+
+#How many lines each block of the wrap index holds. Blocks are split when they get twice as big.
+WRAP_BLOCK_SIZE = 512
+
+
+
+#Maps between logical positions (line, display column) and visual rows when soft-wrap is enabled. Each line takes
+#"display width // width + 1" rows, which always leaves room for the cursor at the end of the line. The row count of every
+#line is stored in blocks of lines, along with the total of each block, so editing a line only recalculates that line's entry
+#and it's block's total. The cumulative totals of the blocks are recalculated lazily, only when a query needs them after a
+#change, and queries use a binary search on them, then on the block.
+"""
+Example with a width of 4:
+Line 0 "hello world" -> 3 rows: "hell", "o wo", "rld"
+Line 1 ""            -> 1 row
+Line 2 "abcd"        -> 2 rows: "abcd", "" (room for the cursor)
+Visual row 4 is line 2, segment 0. Line 2 starts at visual row 4.
+"""
+class WrapIndex:
+    def __init__(self) -> None:
+        self.width = 0
+        #The tabstop width, tabs change how wide lines are.
+        self.tabstop = 8
+        #Whether the index matches the text. It's invalidated when the width changes or the whole text is replaced, and
+        #rebuilt the next time it's needed. Drawing doesn't need it, so after a resize the visible lines are drawn first.
+        self.valid = False
+
+        #Lists of row counts, one per line.
+        self.blocks = [[]]
+        #The total rows of each block.
+        self.block_rows = [0]
+        #The first line and first row of each block, "None" when they have to be recalculated.
+        self.block_start_lines = None
+        self.block_start_rows = None
+
+
+    #How many rows a line with the given length takes.
+    @staticmethod
+    def line_rows(length: int, width: int) -> int:
+        return length // width + 1
+
+
+    def invalidate(self) -> None:
+        self.valid = False
+
+
+    def set_width(self, width: int, tabstop: int) -> None:
+        if width != self.width or tabstop != self.tabstop:
+            self.width = width
+            self.tabstop = tabstop
+            self.valid = False
+
+
+    #Builds the whole index from the given text, only if it's not valid.
+    def ensure_built(self, text: list) -> None:
+        if self.valid:
+            return
+
+        width = self.width
+        tabstop = self.tabstop
+        counts = [line.display_width(tabstop) // width + 1 for line in text]
+
+        self.blocks = [counts[i:i + WRAP_BLOCK_SIZE] for i in range(0, len(counts), WRAP_BLOCK_SIZE)] or [[]]
+        self.block_rows = [sum(block) for block in self.blocks]
+        self.block_start_lines = None
+        self.block_start_rows = None
+        self.valid = True
+
+
+    def update_block_starts(self) -> None:
+        if self.block_start_lines == None:
+            self.block_start_lines = list(accumulate((len(block) for block in self.blocks), initial=0))
+
+        if self.block_start_rows == None:
+            self.block_start_rows = list(accumulate(self.block_rows, initial=0))
+
+
+    #Returns the block that has the given line and the line's position inside of it.
+    def locate_line(self, y: int) -> tuple[int, int]:
+        self.update_block_starts()
+
+        block = min(bisect_right(self.block_start_lines, y) - 1, len(self.blocks) - 1)
+
+        return block, y - self.block_start_lines[block]
+
+
+    #Has to be called whenever the text changes, lines "[y, y + removed)" were replaced by "added" lines, which are already in
+    #the text. If the index isn't valid there's nothing to update, it will be rebuilt when needed.
+    def replace(self, y: int, removed: int, added: int, text: list) -> None:
+        if not self.valid:
+            return
+
+        width = self.width
+        tabstop = self.tabstop
+        new_counts = [text[i].display_width(tabstop) // width + 1 for i in range(y, y + added)]
+
+        #The most common change, a single line was edited.
+        if removed == 1 and added == 1:
+            block, position = self.locate_line(y)
+            difference = new_counts[0] - self.blocks[block][position]
+
+            if difference != 0:
+                self.blocks[block][position] = new_counts[0]
+                self.block_rows[block] += difference
+                self.block_start_rows = None
+
+            return
+
+        block, position = self.locate_line(y)
+
+        #Remove the old entries, they might span more than one block.
+        remaining = removed
+        current_block = block
+        current_position = position
+
+        while remaining > 0 and current_block < len(self.blocks):
+            taken = self.blocks[current_block][current_position:current_position + remaining]
+            del self.blocks[current_block][current_position:current_position + len(taken)]
+            self.block_rows[current_block] -= sum(taken)
+            remaining -= len(taken)
+
+            current_block += 1
+            current_position = 0
+
+        #Insert the new entries where the old ones started.
+        self.blocks[block][position:position] = new_counts
+        self.block_rows[block] += sum(new_counts)
+
+        #Split the block if it got too big.
+        if len(self.blocks[block]) > WRAP_BLOCK_SIZE * 2:
+            half = len(self.blocks[block]) // 2
+            second_half = self.blocks[block][half:]
+            del self.blocks[block][half:]
+
+            self.blocks.insert(block + 1, second_half)
+            self.block_rows[block] -= sum(second_half)
+            self.block_rows.insert(block + 1, sum(second_half))
+
+        #Remove blocks left empty, there must always be one.
+        for index in range(len(self.blocks) - 1, -1, -1):
+            if self.blocks[index] == [] and len(self.blocks) > 1:
+                self.blocks.pop(index)
+                self.block_rows.pop(index)
+
+        self.block_start_lines = None
+        self.block_start_rows = None
+
+
+    #The visual row at which the given line starts.
+    def visual_row(self, y: int) -> int:
+        block, position = self.locate_line(y)
+
+        return self.block_start_rows[block] + sum(self.blocks[block][:position])
+
+
+    #Returns the line and the segment of the line at the given visual row.
+    def line_at(self, row: int) -> tuple[int, int]:
+        self.update_block_starts()
+
+        row = max(0, min(row, self.block_start_rows[-1] - 1))
+        block = min(bisect_right(self.block_start_rows, row) - 1, len(self.blocks) - 1)
+
+        #Find the line inside the block.
+        row_in_block = row - self.block_start_rows[block]
+        line_ends = list(accumulate(self.blocks[block]))
+        position = bisect_right(line_ends, row_in_block)
+        line_start_row = line_ends[position - 1] if position > 0 else 0
+
+        return self.block_start_lines[block] + position, row_in_block - line_start_row
+
+
+    def total_rows(self) -> int:
+        self.update_block_starts()
+
+        return self.block_start_rows[-1]
@@ -0,0 +1,519 @@
+import threading, weakref, tempfile, marshal, zlib, time
+from buffers import Line
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from collections import OrderedDict
+from typing import Union, Iterator
+
+
+
+#Files bigger than the memory can't be kept as a list of lines. With a hot line budget, see the configuration file, the text of
+#loaded files is a "LineStore" instead, which behaves like the list but keeps the lines in blocks of about "BLOCK_SIZE" lines.
+#Only the most recently used blocks, the ones around the screen, the cursor and the last edits, keep their lines. The rest are
+#compressed in memory, and once the compressed blocks are over their own budget the least recently used ones are written to a
+#temporary file. Blocks are decompressed whenever their lines are needed, by the screen, a search or a save.
+#Every store shares the same "BlockCache", so the budget is for all the open files together. Snapshots of a store share it's
+#blocks, like snapshots of a list share it's lines, see "buffers.snapshot_text". A block from before the last snapshot is
+#copied before it's modified, and it's lines are decompressed in the block's generation, so "TextEditor.editable_line" still
+#copies them too.
+"""
+Example with a hot line budget of two blocks:
+Blocks:    [lines 0-4095]  [4096-8191]  [8192-12287]  [12288-16383]
+State:      compressed      hot          spilled       hot           <- The screen is at line 13000, the last edit was at 5000.
+Recently used, from least to most:  block 2, block 4
+"""
+
+#How many lines blocks are created with. Blocks are split when they get twice as big, and removed when they are empty.
+BLOCK_SIZE = 4096
+#The most recently used blocks are never compressed, even if they are over the budget, so a line that's being modified can't
+#be compressed from under the editor.
+MIN_HOT_BLOCKS = 4
+#Compressing has to be fast, blocks are compressed while typing and loading.
+COMPRESSION_LEVEL = 1
+
+
+
+#Some lines of a store. Only one of "lines", "data" and "spill_position" is set at a time.
+class LineBlock:
+    __slots__ = ("lines", "data", "spill_position", "length", "generation", "__weakref__")
+
+    def __init__(self, lines: list) -> None:
+        #The lines, if the block is hot.
+        self.lines = lines
+        #The compressed text of the lines, if the block is compressed in memory.
+        self.data = None
+        #Where the compressed text is in the spill file, as "(position, size)", if the block was spilled.
+        self.spill_position = None
+        self.length = len(lines)
+        self.generation = Line.current_generation
+
+
+
+#Decides which blocks are hot, compressed or spilled, for all the stores. Blocks are only referenced weakly, a block that's not
+#in any store or snapshot anymore is simply forgotten.
+class BlockCache:
+    def __init__(self) -> None:
+        #How many lines hot blocks can hold in total, "0" means the text isn't stored in blocks at all.
+        self.hot_line_budget = 0
+        #How many bytes compressed blocks can take in memory before the least recently used are spilled, "0" means never.
+        self.compressed_byte_budget = 0
+        #Loading, the autosave and the file watcher read blocks from their own threads.
+        self.lock = threading.RLock()
+
+        #The hot blocks, from the least to the most recently used.
+        self.hot_blocks = OrderedDict()
+        #The compressed blocks, as "(reference, size)", from the first to the last compressed.
+        self.compressed_blocks = OrderedDict()
+        self.compressed_bytes = 0
+        #The spilled blocks are written to the file, it's deleted when the editor exits. The space of the blocks that were
+        #decompressed again or aren't used anymore is reused, and free space at the end of the file is given back.
+        self.spill_file = None
+        self.spill_file_size = 0
+        #The spilled blocks, as "position: (reference, size)", and the free space between them, as "(position, size)" sorted
+        #by position.
+        self.spilled_blocks = {}
+        self.free_regions = []
+        #The positions of the spilled blocks that aren't used anymore. Blocks are forgotten from whatever thread drops them,
+        #even in the middle of changing the free regions, so they are only freed the next time the file is used.
+        self.released_positions = []
+        self.spilled_bytes = 0
+
+        #####COUNTERS#####
+        #Every time a block's lines were needed, whether they were hot or had to be decompressed.
+        self.hits = 0
+        self.misses = 0
+        #How long decompressing took in total, in seconds.
+        self.decompression_time = 0
+        self.compressions = 0
+        self.spills = 0
+
+
+    def configure(self, hot_line_budget: int, compressed_byte_budget: int) -> None:
+        with self.lock:
+            self.hot_line_budget = hot_line_budget
+            self.compressed_byte_budget = compressed_byte_budget
+            self.evict()
+
+
+    #Returns the lines of the block. The lines of a block that isn't hot are decompressed, if "keep" is True the block becomes
+    #hot, otherwise the lines are only returned, so reading the whole text, like saving does, doesn't push the blocks on the
+    #screen out of the budget.
+    def load(self, block: LineBlock, keep: bool = True) -> list:
+        with self.lock:
+            if block.lines != None:
+                self.hits += 1
+
+                if keep:
+                    self.touch(block)
+
+                return block.lines
+
+            self.misses += 1
+            start_time = time.perf_counter()
+
+            if block.data != None:
+                data = block.data
+            else:
+                self.spill_file.seek(block.spill_position[0])
+                data = self.spill_file.read(block.spill_position[1])
+
+            lines = []
+
+            for text in marshal.loads(zlib.decompress(data)):
+                line = Line(text)
+                line.generation = block.generation
+                lines.append(line)
+
+            self.decompression_time += time.perf_counter() - start_time
+
+            if not keep:
+                return lines
+
+            if block.data != None:
+                self.forget(id(block))
+            else:
+                self.spilled_blocks.pop(block.spill_position[0])
+                self.free_region(*block.spill_position)
+
+            block.lines, block.data, block.spill_position = lines, None, None
+            self.touch(block)
+            self.evict()
+
+            return lines
+
+
+    #Makes the block the most recently used one.
+    def touch(self, block: LineBlock) -> None:
+        key = id(block)
+
+        if key in self.hot_blocks:
+            self.hot_blocks.move_to_end(key)
+        else:
+            self.hot_blocks[key] = weakref.ref(block, lambda reference, key=key: self.hot_blocks.pop(key, None))
+
+
+    #Forgets a compressed block, because it was decompressed, spilled or isn't used anymore.
+    def forget(self, key: int) -> None:
+        entry = self.compressed_blocks.pop(key, None)
+
+        if entry != None:
+            self.compressed_bytes -= entry[1]
+
+
+    #Compresses the least recently used blocks until the hot ones are within the budget, then spills the compressed ones until
+    #they are within theirs.
+    def evict(self) -> None:
+        if self.hot_line_budget == 0:
+            return
+
+        hot_blocks = [reference() for reference in list(self.hot_blocks.values())]
+        hot_lines = sum(block.length for block in hot_blocks if block != None)
+
+        for block in hot_blocks[:-MIN_HOT_BLOCKS]:
+            if hot_lines <= self.hot_line_budget:
+                break
+
+            if block != None:
+                hot_lines -= block.length
+                self.compress(block)
+
+        while self.compressed_byte_budget > 0 and self.compressed_bytes > self.compressed_byte_budget:
+            key, (reference, size) = next(iter(self.compressed_blocks.items()))
+            self.forget(key)
+            block = reference()
+
+            if block != None:
+                self.spill(block)
+
+
+    def compress(self, block: LineBlock) -> None:
+        data = zlib.compress(marshal.dumps([line.line_text for line in block.lines]), COMPRESSION_LEVEL)
+        block.lines, block.data = None, data
+
+        key = id(block)
+        self.hot_blocks.pop(key, None)
+        self.compressed_blocks[key] = (weakref.ref(block, lambda reference, key=key: self.forget(key)), len(data))
+        self.compressed_bytes += len(data)
+        self.compressions += 1
+
+
+    def spill(self, block: LineBlock) -> None:
+        if self.spill_file == None:
+            self.spill_file = tempfile.TemporaryFile(prefix="text_editor_blocks_")
+
+        self.release_spilled()
+        size = len(block.data)
+        position = self.allocate_region(size)
+        self.spill_file.seek(position)
+        self.spill_file.write(block.data)
+
+        block.spill_position, block.data = (position, size), None
+        self.spilled_blocks[position] = (weakref.ref(block, lambda reference, position=position: self.released_positions.append(position)), size)
+        self.spilled_bytes += size
+        self.spills += 1
+
+
+    #Frees the space of the spilled blocks that aren't used anymore.
+    def release_spilled(self) -> None:
+        while self.released_positions != []:
+            position = self.released_positions.pop()
+            reference, size = self.spilled_blocks.pop(position)
+            self.free_region(position, size)
+
+
+    #Returns where a block of the given size can be written, the first free region it fits in or the end of the file.
+    def allocate_region(self, size: int) -> int:
+        for index, (position, free_size) in enumerate(self.free_regions):
+            if free_size >= size:
+                if free_size == size:
+                    self.free_regions.pop(index)
+                else:
+                    self.free_regions[index] = (position + size, free_size - size)
+
+                return position
+
+        position = self.spill_file_size
+        self.spill_file_size += size
+
+        return position
+
+
+    #Frees the space of a spilled block, merging it with the free regions next to it.
+    def free_region(self, position: int, size: int) -> None:
+        self.spilled_bytes -= size
+        index = bisect_left(self.free_regions, (position, 0))
+
+        if index < len(self.free_regions) and self.free_regions[index][0] == position + size:
+            size += self.free_regions.pop(index)[1]
+
+        if index > 0 and sum(self.free_regions[index - 1]) == position:
+            index -= 1
+            previous_position, previous_size = self.free_regions.pop(index)
+            position, size = previous_position, previous_size + size
+
+        if position + size == self.spill_file_size:
+            self.spill_file_size = position
+            self.spill_file.truncate(position)
+        else:
+            self.free_regions.insert(index, (position, size))
+
+
+    #The counters, for the "mem" command.
+    def report(self) -> str:
+        with self.lock:
+            self.release_spilled()
+            hot_lines = sum(block.length for block in (reference() for reference in self.hot_blocks.values()) if block != None)
+            accesses = self.hits + self.misses
+
+            return "Line blocks: {} lines hot, {:.1f}MB compressed, {:.1f}MB spilled, {:.2%} hit rate, {} misses, {:.0f}ms decompressing".format(
+                hot_lines, self.compressed_bytes / 2**20, self.spilled_bytes / 2**20, self.hits / accesses if accesses > 0 else 1,
+                self.misses, self.decompression_time * 1000)
+
+
+cache = BlockCache()
+
+
+
+#A list of lines stored in blocks, see the top of the file. It supports what the editor does with it's text: indexing,
+#slicing, slice assignment, "insert", "pop", "append", "extend", iterating and "copy". Slices and iterating don't make the
+#blocks they read hot.
+class LineStore:
+    def __init__(self, lines: list = []) -> None:
+        self.blocks = []
+        self.length = 0
+        #The index of the first line of every block, it's rebuilt when needed after the blocks change.
+        self.starts = None
+
+        self.replace(0, 0, lines)
+
+
+    def __repr__(self) -> str:
+        return "LineStore({} lines in {} blocks)".format(self.length, len(self.blocks))
+
+
+    def __len__(self) -> int:
+        return self.length
+
+
+    #Like lists, stores are equal if they have the same lines.
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, (list, LineStore)):
+            return NotImplemented
+
+        return len(self) == len(other) and list(self) == list(other)
+
+
+    def __iter__(self) -> Iterator[Line]:
+        for block in list(self.blocks):
+            yield from cache.load(block, False)
+
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Line, list]:
+        with cache.lock:
+            if isinstance(index, slice):
+                start, stop, step = index.indices(self.length)
+
+                if step != 1:
+                    return list(self)[index]
+
+                return self.lines_in(start, stop)
+
+            block_index, offset = self.locate(index)
+
+            return cache.load(self.blocks[block_index])[offset]
+
+
+    def __setitem__(self, index: Union[int, slice], value: Union[Line, list]) -> None:
+        with cache.lock:
+            if isinstance(index, slice):
+                start, stop, step = index.indices(self.length)
+
+                if step != 1:
+                    raise ValueError("Line stores only support contiguous slices")
+
+                self.replace(start, max(start, stop), value)
+                return
+
+            block_index, offset = self.locate(index)
+            self.writable_block(block_index).lines[offset] = value
+
+
+    def insert(self, index: int, line: Line) -> None:
+        with cache.lock:
+            index = min(max(index + self.length if index < 0 else index, 0), self.length)
+
+            if self.blocks == []:
+                self.replace(0, 0, [line])
+                return
+
+            if index == self.length:
+                block_index, offset = len(self.blocks) - 1, self.blocks[-1].length
+            else:
+                block_index, offset = self.locate(index)
+
+            block = self.writable_block(block_index)
+            block.lines.insert(offset, line)
+            block.length += 1
+            self.length += 1
+            self.starts = None
+
+            if block.length >= 2 * BLOCK_SIZE:
+                self.blocks[block_index:block_index + 1] = self.new_blocks(block.lines)
+
+
+    def pop(self, index: int = -1) -> Line:
+        with cache.lock:
+            block_index, offset = self.locate(index)
+            block = self.writable_block(block_index)
+
+            line = block.lines.pop(offset)
+            block.length -= 1
+            self.length -= 1
+            self.starts = None
+
+            if block.length == 0:
+                del self.blocks[block_index]
+
+            return line
+
+
+    def append(self, line: Line) -> None:
+        self.insert(self.length, line)
+
+
+    def extend(self, lines: list) -> None:
+        with cache.lock:
+            self.replace(self.length, self.length, lines)
+
+
+    #Returns a store with the same lines, sharing the blocks. It must only be used to take snapshots, see
+    #"buffers.snapshot_text".
+    def copy(self) -> "LineStore":
+        with cache.lock:
+            store = LineStore()
+            store.blocks = list(self.blocks)
+            store.length = self.length
+
+            return store
+
+
+    #Returns a store with the lines "[start, stop)", sharing the blocks that are entirely inside of them, only the lines of
+    #the blocks at both ends are copied. Like "copy", it must only be used to take snapshots, see "buffers.share_lines".
+    def share(self, start: int, stop: int) -> "LineStore":
+        with cache.lock:
+            store = LineStore()
+
+            if start >= stop:
+                return store
+
+            first_block, first_offset = self.locate(start)
+            last_block, last_offset = self.locate(stop - 1)
+            last_offset += 1
+
+            if first_block == last_block:
+                store.blocks = store.new_blocks(cache.load(self.blocks[first_block], False)[first_offset:last_offset])
+            else:
+                head = store.new_blocks(cache.load(self.blocks[first_block], False)[first_offset:]) if first_offset > 0 else [self.blocks[first_block]]
+                tail = store.new_blocks(cache.load(self.blocks[last_block], False)[:last_offset]) if last_offset < self.blocks[last_block].length else [self.blocks[last_block]]
+                store.blocks = head + self.blocks[first_block + 1:last_block] + tail
+
+            store.length = stop - start
+
+            return store
+
+
+    #Returns the block and the index in it of the given line.
+    def locate(self, index: int) -> tuple[int, int]:
+        if index < 0:
+            index += self.length
+
+        if index < 0 or index >= self.length:
+            raise IndexError("line index out of range")
+
+        if self.starts == None:
+            self.starts = list(accumulate((block.length for block in self.blocks[:-1]), initial=0))
+
+        block_index = bisect_right(self.starts, index) - 1
+
+        return block_index, index - self.starts[block_index]
+
+
+    #Returns the block at the given index, ready to be modified. A block from before the last snapshot is replaced by a copy.
+    def writable_block(self, block_index: int) -> LineBlock:
+        block = self.blocks[block_index]
+        lines = cache.load(block)
+
+        if block.generation < Line.current_generation:
+            block = LineBlock(lines[:])
+            self.blocks[block_index] = block
+            cache.touch(block)
+
+        return block
+
+
+    #Returns new hot blocks with the given lines.
+    def new_blocks(self, lines: list) -> list[LineBlock]:
+        blocks = [LineBlock(lines[start:start + BLOCK_SIZE]) for start in range(0, len(lines), BLOCK_SIZE)]
+
+        for block in blocks:
+            cache.touch(block)
+
+        cache.evict()
+
+        return blocks
+
+
+    #Returns the lines "[start, stop)" as a list.
+    def lines_in(self, start: int, stop: int) -> list:
+        lines = []
+
+        if start >= stop:
+            return lines
+
+        block_index, offset = self.locate(start)
+
+        while len(lines) < stop - start:
+            lines.extend(cache.load(self.blocks[block_index], False)[offset:offset + stop - start - len(lines)])
+            block_index += 1
+            offset = 0
+
+        return lines
+
+
+    #Replaces the lines "[start, stop)" by the given ones. The blocks involved are replaced by new ones, along with the last
+    #block when adding lines at the end, so loading a file doesn't leave small blocks behind. If the lines are a store it's
+    #blocks are shared instead of copying it's lines, so it must be a snapshot, see "share".
+    def replace(self, start: int, stop: int, lines: list) -> None:
+        shared_blocks = None
+
+        if isinstance(lines, LineStore):
+            shared_blocks = list(lines.blocks)
+            added = lines.length
+            lines = []
+        else:
+            lines = list(lines)
+            added = len(lines)
+
+        if start == self.length and self.blocks != []:
+            first_block, first_offset = len(self.blocks) - 1, self.blocks[-1].length
+        elif start == self.length:
+            first_block, first_offset = 0, 0
+        else:
+            first_block, first_offset = self.locate(start)
+
+        if stop == start:
+            last_block, last_offset = first_block, first_offset
+        else:
+            last_block, last_offset = self.locate(stop - 1)
+            last_offset += 1
+
+        head = cache.load(self.blocks[first_block], False)[:first_offset] if first_offset > 0 else []
+        tail = cache.load(self.blocks[last_block], False)[last_offset:] if last_block < len(self.blocks) else []
+
+        if shared_blocks == None:
+            self.blocks[first_block:last_block + 1] = self.new_blocks(head + lines + tail)
+        else:
+            self.blocks[first_block:last_block + 1] = self.new_blocks(head) + shared_blocks + self.new_blocks(tail)
+
+        self.length += added - (stop - start)
+        self.starts = None
@@ -0,0 +1,130 @@
+import heapq, marshal, tempfile, struct, re, os
+from buffers import Line
+from typing import Union, Callable, Iterator
+
+
+
+#Transformations of whole ranges of lines, used by the tool console commands "sort", "uniq", "rev" and "trim". They take the
+#lines of the range and return the new lines, reusing the same "Line" objects whenever a line doesn't change, so they never
+#copy the text. The editor replaces the range at once, as a single change.
+#Sorting more lines than the line budget is done with an external merge sort. Runs of at most "line_budget" lines are sorted
+#in memory and written to temporary files, as blocks of keys and their line indexes, then the runs are merged and the lines are
+#put in the order of the merged indexes. Only the keys of one run are in memory at a time, besides a block of each run while merging.
+"""
+Example with a line budget of 2:
+Lines:  "c" "a" "d" "b"
+Runs:   [("a", 1), ("c", 0)]  [("b", 3), ("d", 2)]
+Merged: 1 3 0 2  ->  "a" "b" "c" "d"
+"""
+
+#How many records of a run are written, and read back, at a time.
+RUN_BLOCK_SIZE = 10000
+#Every block is stored with it's size first, so it can be read at once, "marshal.load" reads files in tiny pieces.
+BLOCK_HEADER = struct.Struct("<Q")
+
+#The number at the start of a line or field, for numeric sorting. Like "sort -n", anything without one counts as zero.
+NUMBER_PATTERN = re.compile("\\s*([-+]?(\\d+\\.?\\d*|\\.\\d+)([eE][-+]?\\d+)?)")
+
+
+
+#Returns the function that gives the sort key of a line. "column" is the whitespace separated field to sort by, starting from
+#1, or "None" for the whole line.
+def sort_key(numeric: bool, column: Union[int, None]) -> Callable:
+    if not numeric and column == None:
+        return Line.get_text
+
+    def key(line: Line) -> Union[str, float]:
+        text = line.line_text
+
+        if column != None:
+            fields = text.split(None, column)
+            text = fields[column - 1] if len(fields) >= column else ""
+
+        if numeric:
+            match = NUMBER_PATTERN.match(text)
+            return float(match.group(1)) if match else 0.0
+
+        return text
+
+    return key
+
+
+
+#Returns the lines sorted, lexically or numerically, by the whole line or by a column. The sort is stable, lines with the same
+#key keep their order, also when "reverse" is True.
+def sort_lines(lines: list, numeric: bool = False, column: Union[int, None] = None, reverse: bool = False, line_budget: int = 1000000) -> list:
+    key = sort_key(numeric, column)
+
+    if len(lines) <= line_budget:
+        return sorted(lines, key=key, reverse=reverse)
+
+    with tempfile.TemporaryDirectory(prefix="text_editor_sort_") as directory:
+        runs = []
+
+        for start in range(0, len(lines), line_budget):
+            keys = [key(line) for line in lines[start:start + line_budget]]
+            #Sorting the indexes by their key is faster than sorting "(key, index)" tuples.
+            order = sorted(range(len(keys)), key=keys.__getitem__, reverse=reverse)
+            runs.append(os.path.join(directory, "run{}".format(len(runs))))
+
+            #Records are merged as "(key, index)" tuples, so equal keys are ordered by index. When merging in reverse the
+            #indexes are negative, so equal keys still keep their order.
+            with open(runs[-1], "wb") as f:
+                for block_start in range(0, len(order), RUN_BLOCK_SIZE):
+                    block = order[block_start:block_start + RUN_BLOCK_SIZE]
+                    data = marshal.dumps(([keys[index] for index in block], [-(start + index) if reverse else start + index for index in block]))
+                    f.write(BLOCK_HEADER.pack(len(data)) + data)
+
+            del keys, order
+
+        merged = heapq.merge(*(read_run(path) for path in runs), reverse=reverse)
+
+        return [lines[abs(index)] for key, index in merged]
+
+
+#Yields the "(key, index)" records of a run written by "sort_lines", a block at a time.
+def read_run(path: str) -> Iterator[tuple]:
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(BLOCK_HEADER.size)
+
+            if header == b"":
+                return
+
+            keys, indexes = marshal.loads(f.read(BLOCK_HEADER.unpack(header)[0]))
+            yield from zip(keys, indexes)
+
+
+
+#Returns the lines without the ones that are the same as an earlier line.
+def unique_lines(lines: list) -> list:
+    seen = set()
+    unique = []
+
+    for line in lines:
+        text = line.line_text
+
+        if text not in seen:
+            seen.add(text)
+            unique.append(line)
+
+    return unique
+
+
+
+#Returns the lines without trailing whitespace, and how many lines had it.
+def trim_lines(lines: list) -> tuple[list, int]:
+    trimmed = []
+    changed = 0
+
+    for line in lines:
+        text = line.line_text
+        trimmed_text = text.rstrip()
+
+        if len(trimmed_text) != len(text):
+            trimmed.append(Line(trimmed_text))
+            changed += 1
+        else:
+            trimmed.append(line)
+
+    return trimmed, changed
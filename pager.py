@@ -0,0 +1,716 @@
+import editor_config, buffers, layout, utils, keymap, prompt_history, curses, mmap, struct, re, os, time
+from array import array
+from bisect import bisect_right
+from typing import Union
+
+
+
+#View mode is a read-only pager for files too big to edit, like multi-GB logs. The file is never loaded into lines, it's mapped
+#into memory with "mmap" and read directly from the mapping. To find where lines start a sparse index is kept, with the offset
+#and number of one line every "INDEX_BLOCK_SIZE" bytes, so it's memory stays small no matter how big the file is. The lines
+#between two entries are found by searching for newlines from the closest entry. The index is built by reading the file
+#instead of through the mapping, and the mapped pages a search goes through are released after it, so memory use stays flat.
+"""
+Example index of a file with 10 byte lines and a block size of 64:
+offsets: [0, 60, 120, ...]  <- Every entry is the start of a line.
+lines:   [0, 6, 12, ...]    <- The number of that line.
+Line 8 starts 2 lines after the entry for line 6, at offset 80.
+"""
+
+#How many bytes are scanned for each entry of the index.
+INDEX_BLOCK_SIZE = 65536
+#How many bytes are indexed per frame while the file is being indexed in the background.
+INDEX_BYTES_PER_FRAME = 16 * 1024 * 1024
+#How many bytes are searched at a time when searching backwards.
+SEARCH_BLOCK_SIZE = 1024 * 1024
+#How often, in seconds, the file's size is checked in follow mode.
+FOLLOW_POLL_INTERVAL = 0.25
+
+
+
+#With "line-index-cache" enabled the index of files at least "INDEX_CACHE_MIN_SIZE" bytes big is stored in a cache file when
+#the pager exits or finishes indexing. When the file is viewed again the cached index is used if the indexed part of the file
+#didn't change, and if the file only grew the rest is indexed as usual. To check that the indexed part didn't change the cache
+#has the file's modification time and a hash of the first and last blocks of the indexed part. If the modification time changed
+#the file must also have grown, so a file rewritten with the same size isn't trusted.
+"""
+Cache file layout:
+header  <- "INDEX_CACHE_HEADER", see "LineIndex.save".
+offsets <- The "offsets" array.
+lines   <- The "lines" array, it has the same length.
+"""
+
+#Increment it whenever the format of the cache changes, so old caches are discarded.
+INDEX_CACHE_VERSION = 1
+#Magic, version, indexed bytes, newlines, modification time, number of entries and hash.
+INDEX_CACHE_HEADER = struct.Struct("<4sIqqqq32s")
+INDEX_CACHE_MIN_SIZE = 16 * 1024 * 1024
+
+
+
+#The path of the cached index for the file in the given path. Caches are kept in the user's cache directory, not next to the
+#files, since logs are often in directories that can't be written.
+def index_cache_path(path: str) -> str:
+    import hashlib
+
+    cache_directory = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    name = hashlib.sha256(os.path.abspath(path).encode("utf-8", "surrogateescape")).hexdigest()[:32]
+
+    return os.path.join(cache_directory, "text_editor", name + ".lineindex")
+
+
+
+#The sparse line index of a file, see above. The file is indexed lazily, queries only index as much as they need.
+class LineIndex:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = open(path, "rb")
+
+        self.data = b""
+        self.size = 0
+        self.map_file()
+
+        self.offsets = array("q", [0])
+        self.lines = array("q", [0])
+        #How many bytes have been indexed, and how many newlines there are in them.
+        self.indexed_bytes = 0
+        self.newlines = 0
+
+
+    #Maps the whole file. An empty file can't be mapped, so it's data is simply empty.
+    def map_file(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+        self.size = os.fstat(self.file.fileno()).st_size
+
+        if self.size > 0:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.data = b""
+
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+        self.file.close()
+
+
+    #Whether the whole file has been indexed.
+    @property
+    def complete(self) -> bool:
+        return self.indexed_bytes >= self.size
+
+
+    #The number of lines, as the editor counts them, in the indexed part of the file. A newline at the end of the file
+    #doesn't start another line.
+    @property
+    def line_count(self) -> int:
+        if self.indexed_bytes == 0 or self.data[self.indexed_bytes - 1] != ord("\n"):
+            return self.newlines + 1
+
+        return self.newlines
+
+
+    #Indexes at most "max_bytes" more of the file. Returns True if anything was indexed.
+    def extend(self, max_bytes: int = INDEX_BYTES_PER_FRAME) -> bool:
+        end_of_work = min(self.indexed_bytes + max_bytes, self.size)
+        extended = self.indexed_bytes < end_of_work
+
+        while self.indexed_bytes < end_of_work:
+            start = self.indexed_bytes
+            end = min(start + INDEX_BLOCK_SIZE, self.size)
+            block = os.pread(self.file.fileno(), end - start, start)
+
+            newlines = block.count(b"\n")
+
+            #Blocks inside a very long line have no line start to add.
+            if newlines > 0:
+                self.newlines += newlines
+                self.offsets.append(start + block.rfind(b"\n") + 1)
+                self.lines.append(self.newlines)
+
+            self.indexed_bytes = start + len(block)
+
+            #The file was truncated while it was being indexed, "refresh" will notice.
+            if block == b"":
+                break
+
+        return extended
+
+
+    #Checks whether the file changed size, used by follow mode. If it grew the new part is indexed as usual, if it shrank it was
+    #probably truncated or rotated and the index is started again. Returns True if the size changed.
+    def refresh(self) -> bool:
+        size = os.fstat(self.file.fileno()).st_size
+
+        if size == self.size:
+            return False
+
+        if size < self.size:
+            self.offsets = array("q", [0])
+            self.lines = array("q", [0])
+            self.indexed_bytes = 0
+            self.newlines = 0
+
+        self.map_file()
+
+        return True
+
+
+    #Returns the offset at which the given line starts. The line must exist.
+    def line_offset(self, y: int) -> int:
+        #Index until the line is known.
+        while not self.complete and self.newlines < y:
+            self.extend(INDEX_BLOCK_SIZE * 64)
+
+        entry = bisect_right(self.lines, y) - 1
+        offset = self.offsets[entry]
+
+        for i in range(y - self.lines[entry]):
+            offset = self.data.find(b"\n", offset) + 1
+
+        return offset
+
+
+    #Returns the number of the line that has the byte at the given offset.
+    def line_at_offset(self, offset: int) -> int:
+        while not self.complete and self.indexed_bytes <= offset:
+            self.extend(INDEX_BLOCK_SIZE * 64)
+
+        entry = bisect_right(self.offsets, offset) - 1
+        y = self.lines[entry]
+
+        for start in range(self.offsets[entry], offset, INDEX_BLOCK_SIZE):
+            y += os.pread(self.file.fileno(), min(INDEX_BLOCK_SIZE, offset - start), start).count(b"\n")
+
+        return y
+
+
+    #Returns the offset at which the line that starts at the given offset ends, without the newline.
+    def line_end(self, offset: int) -> int:
+        end = self.data.find(b"\n", offset)
+
+        return self.size if end == -1 else end
+
+
+    #Returns the text of the line that starts at the given offset, up to "max_bytes" of it. Lines ending in "\r\n" have the
+    #"\r" removed, like when the editor reads a file.
+    def line_text(self, offset: int, max_bytes: int) -> str:
+        end = self.line_end(offset)
+        raw = self.data[offset:min(end, offset + max_bytes)]
+
+        if raw.endswith(b"\r") and offset + len(raw) == end:
+            raw = raw[:-1]
+
+        return raw.decode("utf-8", "replace")
+
+
+    #A hash of the first and the last blocks of the first "length" bytes of the file, used to check that the indexed part
+    #didn't change.
+    def prefix_digest(self, length: int) -> bytes:
+        import hashlib
+
+        digest = hashlib.sha256()
+        digest.update(os.pread(self.file.fileno(), min(length, INDEX_BLOCK_SIZE), 0))
+        digest.update(os.pread(self.file.fileno(), min(length, INDEX_BLOCK_SIZE), max(length - INDEX_BLOCK_SIZE, 0)))
+
+        return digest.digest()
+
+
+    #Stores the index in the given cache file. Failing to write it is not a problem, the file will simply be indexed again.
+    def save(self, cache_path: str) -> None:
+        header = INDEX_CACHE_HEADER.pack(b"TEIX", INDEX_CACHE_VERSION, self.indexed_bytes, self.newlines,
+            os.fstat(self.file.fileno()).st_mtime_ns, len(self.offsets), self.prefix_digest(self.indexed_bytes))
+
+        #It's written to a temporary file first so a reader never finds half an index.
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            temporary_path = cache_path + ".{}".format(os.getpid())
+
+            with open(temporary_path, "wb") as f:
+                f.write(header)
+                f.write(self.offsets.tobytes())
+                f.write(self.lines.tobytes())
+
+            os.replace(temporary_path, cache_path)
+        except OSError:
+            pass
+
+
+    #Replaces the index with the one in the given cache file, if it's valid for the file. Returns True if it was used.
+    def load(self, cache_path: str) -> bool:
+        try:
+            with open(cache_path, "rb") as f:
+                magic, version, indexed_bytes, newlines, mtime, entries, digest = INDEX_CACHE_HEADER.unpack(f.read(INDEX_CACHE_HEADER.size))
+
+                if magic != b"TEIX" or version != INDEX_CACHE_VERSION:
+                    return False
+
+                offsets = array("q")
+                lines = array("q")
+                offsets.fromfile(f, entries)
+                lines.fromfile(f, entries)
+        except (OSError, EOFError, struct.error):
+            return False
+
+        if indexed_bytes > self.size or (mtime != os.fstat(self.file.fileno()).st_mtime_ns and indexed_bytes == self.size):
+            return False
+
+        if digest != self.prefix_digest(indexed_bytes):
+            return False
+
+        self.offsets = offsets
+        self.lines = lines
+        self.indexed_bytes = indexed_bytes
+        self.newlines = newlines
+
+        return True
+
+
+    #Tells the system the mapped pages aren't needed anymore, they are read again if they are used. Searches can go through the
+    #whole file, without this every page they touch would stay in memory.
+    def release_pages(self) -> None:
+        if isinstance(self.data, mmap.mmap) and hasattr(mmap, "MADV_DONTNEED"):
+            self.data.madvise(mmap.MADV_DONTNEED)
+
+
+    #Returns the first match of the pattern at or after the given offset, starting again from the beginning of the file if
+    #there's none. Returns "None" if there are no matches at all. The regular expression runs directly over the mapped file.
+    def search_forward(self, pattern: re.Pattern, offset: int) -> Union[re.Match, None]:
+        match = self.search_lines(pattern, offset, self.size)
+
+        if match == None:
+            match = self.search_lines(pattern, 0, offset)
+
+        return match
+
+
+    #Returns the first match of the pattern in "[start, end)" that's inside of a single line, like the editor's matches. The
+    #pattern must be compiled with "re.MULTILINE", so "^" and "$" match at every line. A match that spans lines, like "\s+"
+    #over a newline, is searched again in the line it starts in, and otherwise in the lines after it.
+    def search_lines(self, pattern: re.Pattern, start: int, end: int) -> Union[re.Match, None]:
+        while start <= end:
+            match = pattern.search(self.data, start, end)
+
+            if match == None or b"\n" not in match.group():
+                return match
+
+            line_end = self.data.find(b"\n", match.start(), end)
+            match = pattern.search(self.data, match.start(), line_end)
+
+            if match != None:
+                return match
+
+            start = line_end + 1
+
+        return None
+
+
+    #Returns the last match of the pattern before the given offset, starting again from the end of the file if there's none.
+    #The file is searched backwards in blocks that start at the beginning of a line.
+    def search_backward(self, pattern: re.Pattern, offset: int) -> Union[re.Match, None]:
+        for start_offset, end_offset in ((0, offset), (offset, self.size)):
+            end = end_offset
+
+            while end > start_offset:
+                start = max(start_offset, self.data.rfind(b"\n", start_offset, max(end - SEARCH_BLOCK_SIZE, start_offset)) + 1)
+                last_match = None
+                position = None
+
+                for match in pattern.finditer(self.data, start, end):
+                    if b"\n" in match.group():
+                        position = match.start()
+                        break
+
+                    last_match = match
+
+                #A match spanned lines, the rest of the block is searched a match at a time, see "search_lines".
+                while position != None and position <= end:
+                    match = self.search_lines(pattern, position, end)
+
+                    if match == None:
+                        break
+
+                    last_match = match
+                    position = match.end() if match.end() > match.start() else match.end() + 1
+
+                if last_match != None:
+                    return last_match
+
+                end = start
+
+        return None
+
+
+
+class Pager(utils.CursesUtils):
+    def __init__(self, path: str, headless: bool = False) -> None:
+        super().__init__(headless)
+
+        #####CONFIGURATION#####
+        #Make "getch" non-blocking.
+        self.stdscr.nodelay(True)
+
+        #####GENERAL VARIABLES#####
+        #Last pressed key.
+        self.key = 0
+        #The file being viewed, and it's index.
+        self.file = path
+        self.index = LineIndex(os.path.join(os.getcwd(), path))
+
+        #The text displayed at the bottom of the pager, can be used for messages.
+        self.prompt = utils.Prompt("VIEW: q - quit | g/G - top/bottom | n/N - next/previous match | F - follow | Ctrl+F - find | Ctrl+T - tools", 3.5)
+
+        #####SCROLLING#####
+        #The topmost visible line, and the offset at which it starts.
+        self.top_line = 0
+        self.top_offset = 0
+        #The leftmost visible display column.
+        self.horizontal_scroll_column = 0
+
+        #####SEARCH FUNCTION#####
+        #The pattern being searched, as bytes for searching the file and as text for highlighting the visible lines.
+        self.search_pattern = None
+        self.highlight_pattern = None
+        #The offset of the match the view was last moved to, the next search starts after it.
+        self.match_offset = 0
+
+        #####FOLLOW MODE#####
+        #Like "tail -f", when enabled the view stays at the end of the file as it grows.
+        self.follow = False
+        self.next_follow_poll_time = 0
+
+        #####INDEX CACHE#####
+        #Where the index is cached, only if "line-index-cache" is enabled and the file is big enough.
+        self.index_cache_path = None
+        #How much of the file the cached index covers, it's only saved again if it covers more.
+        self.cached_bytes = 0
+
+        #####BUFFER DISPLAY#####
+        self.layout = layout.EditorLayout()
+
+        #####CONFIGURATION FILE#####
+        self.config = None
+        self.attributes = {}
+
+
+    #The setup preformed before the pager starts.
+    def setup(self, follow: bool) -> None:
+        #Loads the configuration file. An invalid configuration stops the pager, explaining what's wrong.
+        try:
+            config, cached = editor_config.read_config_file()
+        except ValueError as e:
+            self.end_curses()
+            raise SystemExit(str(e))
+
+        self.config = config
+        self.attributes = {field : self.get_colour(getattr(config, field)) for field in config.colour_fields()}
+        self.keymap = keymap.build_keymap(config.keys)
+        self.prompt_history = prompt_history.PromptHistory(prompt_history.history_path())
+
+        if config.line_index_cache and self.index.size >= INDEX_CACHE_MIN_SIZE:
+            self.index_cache_path = index_cache_path(self.index.path)
+
+            if self.index.load(self.index_cache_path):
+                self.cached_bytes = self.index.indexed_bytes
+
+        if follow:
+            self.toggle_follow()
+
+
+    def pager(self) -> None:
+        try:
+            while True:
+                self.stdscr.erase()
+
+                self.detect_key()
+                self.index_handler()
+                self.layout.update(self.y_size, self.x_size, self.index.line_count)
+
+                self.print_screen()
+                self.prompt.prompt_handler()
+
+                self.stdscr.refresh()
+                self.key = self.read_key()
+        finally:
+            self.save_index()
+            self.index.close()
+
+
+    def resize_handler(self) -> None:
+        self.layout.update(self.y_size, self.x_size, self.index.line_count)
+
+
+    #Caches the index if it covers more of the file than the cached one.
+    def save_index(self) -> None:
+        if self.index_cache_path != None and self.index.indexed_bytes > self.cached_bytes:
+            self.index.save(self.index_cache_path)
+            self.cached_bytes = self.index.indexed_bytes
+
+
+    #Properly exits curses and the program.
+    def quit_pager(self) -> None:
+        self.end_curses()
+        raise SystemExit()
+
+
+    """
+    INPUT HANDLING
+    """
+    #Besides it's own keys, the pager uses the editor's keys to cancel, quit, find and open the tool console, see "keymap.py".
+    def detect_key(self) -> None:
+        screen_rows = self.layout.max_displayed_lines
+        action = self.keymap.get(self.key)
+
+        if self.key == curses.KEY_DOWN:
+            self.scroll_to(self.top_line + 1)
+
+        elif self.key == curses.KEY_UP:
+            self.scroll_to(self.top_line - 1)
+
+        elif self.key == curses.KEY_NPAGE or self.key == ord(" "):
+            self.scroll_to(self.top_line + screen_rows)
+
+        elif self.key == curses.KEY_PPAGE:
+            self.scroll_to(self.top_line - screen_rows)
+
+        elif self.key == curses.KEY_RIGHT:
+            self.horizontal_scroll_column += 1
+
+        elif self.key == curses.KEY_LEFT:
+            self.horizontal_scroll_column = max(self.horizontal_scroll_column - 1, 0)
+
+        elif self.key == curses.KEY_HOME or self.key == ord("g"):
+            self.scroll_to(0)
+
+        #Going to the end requires indexing the whole file.
+        elif self.key == curses.KEY_END or self.key == ord("G"):
+            self.scroll_to_end()
+
+        #The matches are highlighted again if escape was pressed.
+        elif self.key == ord("n") or self.key == ord("N"):
+            self.highlight_pattern = re.compile(self.search_pattern.pattern.decode("utf-8")) if self.search_pattern != None else None
+            self.next_match(1 if self.key == ord("n") else -1)
+
+        elif self.key == ord("F"):
+            self.toggle_follow()
+
+        #"ESC" key, stops highlighting the matches.
+        elif action == "cancel":
+            self.highlight_pattern = None
+
+        elif self.key == ord("q") or action == "quit":
+            self.quit_pager()
+
+        #"CTRL+F" key combination.
+        elif action == "find":
+            pattern = self.get_input("Find: ", "find")
+
+            if pattern != None:
+                self.find_handler(pattern)
+
+        #"CTRL+T" key combination. Activates the tool console, only the commands that don't modify the file are available.
+        elif action == "tools":
+            full_command = self.get_input("Command: ", "command")
+
+            if full_command != None:
+                self.run_command(full_command)
+
+
+    #Asks the user for input in the bottom line of the pager, showing the given prompt. Returns the entered text, or "None"
+    #if the escape key was pressed.
+    def get_input(self, prompt_text: str, history_name: Union[str, None] = None) -> Union[str, None]:
+        self.prompt.toggle_prompt()
+
+        basic_input = utils.BasicInput(self, self.y_size - 1, 0, prompt_text, self.attributes["input_colour"], self.attributes["normal_cursor_colour"], self.attributes["over_text_cursor_colour"], history_name)
+        entered_text = basic_input.basic_input()
+
+        self.prompt.toggle_prompt()
+
+        return entered_text
+
+
+    def run_command(self, full_command: str) -> None:
+        if full_command.split() == []:
+            return
+
+        command_name = full_command.split()[0]
+        command_arguments = full_command.split()[1:]
+
+        match command_name:
+            #Line jump.
+            case "j":
+                if len(command_arguments) != 1 or not command_arguments[0].isdigit():
+                    self.prompt.change_prompt("Usage: j <line>")
+                    return
+
+                self.scroll_to(int(command_arguments[0]) - 1)
+
+            #Find, everything after the command is the pattern.
+            case "f":
+                if command_arguments == []:
+                    self.prompt.change_prompt("Usage: f <pattern>")
+                    return
+
+                self.find_handler(full_command.split(None, 1)[1])
+
+            case "q" | "qf":
+                self.quit_pager()
+
+            case _:
+                self.prompt.change_prompt("Command \"{}\" isn't available in view mode".format(command_name))
+
+
+    """
+    SCROLLING
+    """
+    #Makes the given line the topmost visible one. The line is limited to the lines that exist.
+    def scroll_to(self, y: int) -> None:
+        y = max(y, 0)
+
+        #Index until the line is known, or until there's nothing left to index.
+        while not self.index.complete and self.index.newlines < y:
+            self.index.extend()
+
+        self.top_line = min(y, self.index.line_count - 1)
+        self.top_offset = self.index.line_offset(self.top_line)
+
+
+    #Shows the last screen of the file.
+    def scroll_to_end(self) -> None:
+        while self.index.extend():
+            pass
+
+        self.scroll_to(self.index.line_count - self.layout.max_displayed_lines)
+
+
+    def toggle_follow(self) -> None:
+        self.follow = not self.follow
+
+        if self.follow:
+            self.scroll_to_end()
+            self.prompt.change_prompt("Following the end of the file")
+        else:
+            self.prompt.change_prompt("Stopped following the end of the file")
+
+
+    #Indexes a part of the file each frame, and in follow mode checks whether the file grew.
+    def index_handler(self) -> None:
+        if self.follow and time.monotonic() > self.next_follow_poll_time:
+            self.next_follow_poll_time = time.monotonic() + FOLLOW_POLL_INTERVAL
+
+            try:
+                changed = self.index.refresh()
+            except OSError:
+                changed = False
+
+            if changed:
+                self.scroll_to_end()
+
+        #The index is cached as soon as it's complete, so it's not lost if the pager doesn't exit cleanly.
+        if self.index.extend() and self.index.complete:
+            self.save_index()
+
+
+    """
+    SEARCH FUNCTION
+    """
+    def find_handler(self, pattern: str) -> None:
+        try:
+            #Lines are searched one at a time, see "LineIndex.search_lines".
+            self.search_pattern = re.compile(pattern.encode("utf-8"), re.MULTILINE)
+            self.highlight_pattern = re.compile(pattern)
+        except re.error:
+            self.prompt.change_prompt("Invalid pattern \"{}\"".format(pattern))
+            return
+
+        #The search starts at the topmost visible line.
+        self.match_offset = self.top_offset - 1
+        self.next_match(1)
+
+
+    #Moves the view to the next match of the current pattern, or to the previous one if "direction" is negative. The line with
+    #the match is shown at the top.
+    def next_match(self, direction: int) -> None:
+        if self.search_pattern == None:
+            self.prompt.change_prompt("Nothing to find, use Ctrl+F or \"f <pattern>\"")
+            return
+
+        if direction > 0:
+            match = self.index.search_forward(self.search_pattern, self.match_offset + 1)
+        else:
+            match = self.index.search_backward(self.search_pattern, max(self.match_offset, 0))
+
+        self.index.release_pages()
+
+        if match == None:
+            self.prompt.change_prompt("No matches found")
+            return
+
+        self.match_offset = match.start()
+        self.follow = False
+        self.scroll_to(self.index.line_at_offset(self.match_offset))
+
+
+    """
+    PRINTING FUNCTIONS
+    """
+    def print_screen(self) -> None:
+        self.display()
+        self.status_bar()
+
+
+    #Displays the visible lines. Only the visible part of each line is read from the file.
+    def display(self) -> None:
+        gutter_width = self.layout.gutter_width
+        text_width = self.layout.max_text_width
+        tabstop = self.config.tabstop_width
+        start_column = self.horizontal_scroll_column
+        end_column = start_column + text_width
+
+        offset = self.top_offset
+
+        for print_y in range(self.layout.max_displayed_lines):
+            y = self.top_line + print_y
+
+            if y >= self.index.line_count or offset > self.index.size:
+                self.stdscr.addstr(print_y, 0, "~", self.attributes["empty_line_colour"])
+                continue
+
+            #A character takes at most 4 bytes, and at least a column unless it's a combining character.
+            line = buffers.Line(self.index.line_text(offset, end_column * 4 + 4))
+            offset = self.index.line_end(offset) + 1
+
+            self.stdscr.addstr(print_y, 0, self.layout.line_number(y), self.attributes["line_colour"])
+
+            visible_text = layout.render_columns(line, start_column, end_column, tabstop)
+
+            if visible_text != "":
+                self.stdscr.addstr(print_y, gutter_width, visible_text, self.attributes["text_colour"])
+
+            if self.highlight_pattern != None:
+                for match in self.highlight_pattern.finditer(line.line_text):
+                    match_start = max(line.column_of(match.start(), tabstop), start_column)
+                    match_end = min(line.column_of(match.end(), tabstop), end_column)
+
+                    if match_start < match_end:
+                        self.stdscr.addstr(print_y, gutter_width + match_start - start_column, layout.render_columns(line, match_start, match_end, tabstop), self.attributes["find_match_colour"])
+
+
+    #Shows the status-bar and the prompt.
+    def status_bar(self) -> None:
+        if self.index.complete:
+            lines_text = "{} lines".format(self.index.line_count)
+        else:
+            lines_text = "{}+ lines (indexing {}%)".format(self.index.line_count, self.index.indexed_bytes * 100 // self.index.size)
+
+        left_status_text = "{} - {} [view]".format(self.file, lines_text)
+        right_status_text = "{}{},{} ".format("FOLLOW | " if self.follow else "", self.top_line + 1, self.horizontal_scroll_column + 1)
+
+        status_text = left_status_text + " " * (self.x_size - len(left_status_text) - len(right_status_text)) + right_status_text
+        self.stdscr.addstr(self.layout.status_bar_row, 0, status_text[:self.x_size], self.attributes["status_bar_colour"])
+
+        if self.prompt.prompt_enabled:
+            self.stdscr.addstr(self.layout.prompt_row, 0, self.prompt.prompt[:self.x_size - 1], self.attributes["prompt_colour"])
@@ -0,0 +1,92 @@
+import json, os
+from collections import deque
+from typing import Union
+
+
+
+#What was entered in every kind of prompt, like the find patterns, the tool console commands and the filenames, so they can
+#be entered again with the up and down keys, see "utils.BasicInput". Every prompt keeps at most "HISTORY_SIZE" entries, the
+#oldest are forgotten first, and entering something again moves it to the end. The history is kept in the user's cache
+#directory, so it's there the next time the editor starts.
+"""
+Example "prompt_history.json":
+{"find": ["TODO", "def \\w+"], "command": ["wrap", "sort n"], "file": ["notes.txt"]}
+"""
+
+#How many entries every prompt keeps.
+HISTORY_SIZE = 200
+
+
+
+#The path of the history, in the user's cache directory, like the line index cache of view mode.
+def history_path() -> str:
+    cache_directory = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_directory, "text_editor", "prompt_history.json")
+
+
+
+class PromptHistory:
+    #If "path" is "None" the history is only kept in memory.
+    def __init__(self, path: Union[str, None]) -> None:
+        self.path = path
+        #The entries of every prompt, from the oldest to the newest.
+        self.entries = {}
+
+        self.load()
+
+
+    #Reads the history again, other editors might have added entries to it.
+    def load(self) -> None:
+        if self.path == None:
+            return
+
+        try:
+            with open(self.path, "r") as f:
+                history = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if not isinstance(history, dict):
+            return
+
+        for name, entries in history.items():
+            if isinstance(entries, list):
+                self.entries[name] = deque((entry for entry in entries if isinstance(entry, str)), maxlen=HISTORY_SIZE)
+
+
+    #The entries of the given prompt, from the oldest to the newest.
+    def get(self, name: str) -> deque:
+        return self.entries.setdefault(name, deque(maxlen=HISTORY_SIZE))
+
+
+    def add(self, name: str, entry: str) -> None:
+        self.load()
+        entries = self.get(name)
+
+        if entry in entries:
+            entries.remove(entry)
+
+        entries.append(entry)
+        self.save()
+
+
+    #The history is written to a temporary file which then replaces it, so an editor reading it never sees half of it. It's
+    #only a convenience, so failing to write it is ignored.
+    def save(self) -> None:
+        if self.path == None:
+            return
+
+        temporary_path = self.path + ".{}.tmp".format(os.getpid())
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+            with open(temporary_path, "w") as f:
+                json.dump({name : list(entries) for name, entries in self.entries.items()}, f)
+
+            os.replace(temporary_path, self.path)
+        except OSError:
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
@@ -1,61 +1,13 @@
-import utils, curses, curses.ascii, math, re, yaml, sys, getopt, datetime, time, os
-from dataclasses import dataclass, field
-from typing import Union, Callable, Iterable, Any
-
-
-
-#Each line is stored as a dataclass. They are similar to structs in other languages, however they retain all the
-#characteristics of a class.
-@dataclass
-class Line:
-    line_text: str = ""
-
-
-
-#This class is what makes the search function work. It handles all the search cursor logic. It stores the variables needed for
-#the search function. They are separated manly to avoid cluttering the program's class with variables.
-@dataclass
-class SearchMatch:
-    #This dictionary contains the line and index of a match. The line is the key for the dictionary entry.
-    line_and_index: dict = field(default_factory=dict)
-    #This dictionary contains the length of every match found, to account for the possibility of matches with different
-    #lengths.
-    line_match_length: dict = field(default_factory=dict)
-    #Whether or not the find function is currently active
-    find_enabled: bool = False
-    #The line of the the match the cursor was last set to.
-    current_match_line: int = 0
-    #The number of match in the line the cursor was last set to.
-    current_match_number_in_line: int = 0
-
-
-
-#A simple prompt, with default text and the option to change it for a specified period of time. Beware that the prompt class
-#only takes care of the actual text of the prompt, printing has to be handled by the user.
-class Prompt:
-    def __init__(self, default_prompt: str, restore_time_ms: int):
-        self.default_prompt = default_prompt
-        #How long the modified prompt will last in ms before being changed back to the default prompt.
-        self.restore_time_ms = restore_time_ms
-
-        self.prompt = default_prompt
-        self.restore_time_counter = 0
-        self.prompt_enabled = True
-
-
-    def toggle_prompt(self) -> None:
-        self.prompt_enabled = not self.prompt_enabled
-
-
-    def change_prompt(self, new_prompt: str) -> None:
-        self.prompt = new_prompt
-        self.restore_time_counter = time.time()
+#Imports are timed for "--startup-profile". Modules that are only needed by some features ("yaml", "getopt", "datetime",
+#"keytrace", "batch_edit", etc) are imported where they are used, so they don't slow down starting the editor.
+import time
+IMPORT_START_TIME = time.perf_counter()
 
+import utils, editor_config, buffers, layout, keymap, clipboard, curses, curses.ascii, threading, re, sys, os
+from buffers import Line, SearchMatch
+from typing import Union, Callable, Iterable, Any
 
-    #Changes the new prompt back to the default prompt once the specified time has passed. Has to be called each program loop.
-    def prompt_handler(self) -> None:
-        if time.time() > self.restore_time_counter + self.restore_time_ms:
-            self.prompt = self.default_prompt
+IMPORT_END_TIME = time.perf_counter()
 
 
 
@@ -83,17 +35,43 @@ class FPSMeter:
 
 
 
+#Measures how long each step of starting the editor takes, it's used by "--startup-profile". Each call to "mark" records the time
+#since the previous one. If "now" is given it's used as the time at which the step ended.
+class StartupProfiler:
+    def __init__(self, start_time: float) -> None:
+        self.start_time = start_time
+        self.last_time = start_time
+        #A list of "(step, seconds)" tuples, in order.
+        self.steps = []
+
+
+    def mark(self, step: str, now: float = None) -> None:
+        if now == None:
+            now = time.perf_counter()
+
+        self.steps.append((step, now - self.last_time))
+        self.last_time = now
+
+
+    def report(self) -> str:
+        lines = ["{:<28}{:>9.2f} ms".format(step, seconds * 1000) for step, seconds in self.steps]
+        lines.append("{:<28}{:>9.2f} ms".format("Time to first frame", (self.last_time - self.start_time) * 1000))
+
+        return "\n".join(lines)
+
+
+
 class TextEditor(utils.CursesUtils):
-    def __init__(self) -> None:
-        super().__init__()
+    def __init__(self, headless: bool = False) -> None:
+        super().__init__(headless)
 
         #####CONFIGURATION#####
         #Make "getch" non-blocking.
         self.stdscr.nodelay(True)
 
         #####GENERAL VARIABLES#####
-        #Last pressed key.
-        self.key = 0
+        #Last pressed key, "-1" is no key, like "read_key" gives. Not "0", terminals send it for "Ctrl+Space".
+        self.key = -1
         #The text in the editor, a list of lines.
         self.text = [Line()]
         #The file currently being edited.
@@ -122,19 +100,26 @@ class TextEditor(utils.CursesUtils):
         self.desired_cursor_x_pos = 0
 
         #The text displayed at the bottom of the editor, can be used for messages.
-        self.prompt = Prompt("COMMANDS: Ctrl+S - save | Alt+S - save as | Ctrl+O - open | Ctrl+F - find | Ctrl+Q - quit | Ctrl+T - tools", 3.5)
+        self.prompt = utils.Prompt("COMMANDS: Ctrl+S - save | Alt+S - save as | Ctrl+O - open | Ctrl+F - find | Ctrl+Q - quit | Ctrl+T - tools", 3.5)
 
         #####SCROLLING#####
         #The line to which the editor is scrolled, vertically. IE: the topmost visible line.
         self.vertical_scroll_line = 0
         #The character to which the editor is scrolled, horizontally. IE: the leftmost visible character.
         self.horizontal_scroll_character = 0
+        #With soft-wrap enabled, which row of the topmost visible line is at the top of the screen.
+        self.vertical_scroll_segment = 0
+
+        #####SOFT-WRAP#####
+        #Whether long lines are wrapped instead of scrolled horizontally.
+        self.soft_wrap = False
+        #Maps between lines and visual rows when soft-wrap is enabled, see "layout.py".
+        self.wrap_index = layout.WrapIndex()
 
         #####BUFFER DISPLAY#####
-        self.max_displayed_lines = self.y_size - 2
-        #Maximum allowed text width, in chars. The -2 is an approximation expecting a file with less than a thousand lines
-        #to be loaded. 
-        self.max_text_width = self.x_size - 3
+        #The gutter width, text width, number of displayed lines, etc. See "layout.py".
+        self.layout = layout.EditorLayout()
+        self.layout.update(self.y_size, self.x_size, len(self.text))
 
         #####SEARCH FUNCTION#####
         """
@@ -143,19 +128,104 @@ class TextEditor(utils.CursesUtils):
         """
         self.find_results = SearchMatch()
 
+        #####SELECTION AND REGISTERS#####
+        """
+        Text is selected with shift and the movement keys, or from the mark, and cut, copied and pasted through registers, see
+        "clipboard.py". The registers belong to the editor, not to a buffer, so text can be pasted into any file.
+        """
+        #The selected text, see "clipboard.Selection", or "None".
+        self.selection = None
+        #The registers that have something, as "name : clipboard.Register".
+        self.registers = {}
+
+        #####BUFFERS#####
+        """
+        Every open file has it's own buffer, see "buffers.py". The variables of the current buffer (text, cursor, scroll, search
+        results and modification counter) are the editor's own variables, they are only stored back into the buffer when
+        switching to another one.
+        """
+        self.buffers = buffers.BufferList()
+
         #####EXIT CONFIRMATION#####
         #Counts how many times the buffer's been modified since the file was loaded or saved. That way we can determine if
         #are unsaved changes.
         self.buffer_modification_counter = 0
+        #Whether the text changed since the last modification was counted. Keys that don't change anything, like backspace at
+        #the start of the text, aren't modifications, otherwise the buffer would look modified while it still matches the file.
+        self.text_modified = False
         #Used to count how many times a certain key combination that would result in losing unsaved changes has been pressed.
         self.confirmation_counter = 0
 
+        #####RECOVERY JOURNAL#####
+        """
+        While a buffer with a file has unsaved changes they are also written to a recovery journal next to the file, see
+        "journal.py". The journal is started by the first change after loading or saving, and deleted when the buffer is saved
+        or closed, or the editor exits properly. If the editor finds a journal when opening a file it offers to recover it.
+        """
+        self.journal = None
+        #Whether changes are journaled, it's never done without a terminal.
+        self.journaling = False
+
+        #####AUTOSAVE#####
+        """
+        If autosaving is enabled in the configuration file, the current buffer is saved in the background after some time
+        without modifications or after some number of them, see "autosave.py". Only one buffer is autosaved at a time.
+        """
+        self.autosave_job = None
+        #When the buffer was last modified, autosaving waits for the user to stop typing.
+        self.last_modification_time = time.monotonic()
+        #After an autosave fails it's not tried again until this time.
+        self.autosave_retry_time = 0
+
+        #####EXTERNAL CHANGES#####
+        """
+        The file of the current buffer is watched for changes made by other programs, see "file_watcher.py". Without unsaved
+        changes the buffer is simply updated, otherwise the user chooses between merging the changes, reloading the file or
+        keeping the buffer as it is.
+        """
+        #A snapshot of the text as it is on disk and the file's stat, see "buffers.Buffer".
+        self.disk_text = None
+        self.disk_stat = None
+        self.file_watcher = None
+        #Reading and comparing the file after it changed, see "file_watcher.FileChangeJob".
+        self.file_change_job = None
+        #A file that keeps changing isn't compared again until this time.
+        self.next_file_check_time = 0
+
+        #####EXTERNAL FILTERS#####
+        """
+        Lines filtered through a shell command are replaced once the command finishes, meanwhile the editor shows it's progress
+        and it can be cancelled, see "filter_handler".
+        """
+        #Whether keys are read while the command runs. Without a terminal, like when replaying a key trace, they aren't. A daemon
+        #session has a terminal, it's just not this process's.
+        self.interactive = not headless
+        #Incremented by every change to the text. In a daemon session other sessions can change it while the command runs, then
+        #it's output is dropped.
+        self.text_version = 0
+
         #####CONFIGURATION FILE#####
-        self.config_file = None
+        #The validated configuration, see "editor_config.py". It's only replaced as a whole, by "apply_config".
+        self.config = None
+        #The curses attribute of every colour in the configuration, by field name. It's derived from the configuration, so
+        #it's only recalculated when the configuration changes.
+        self.attributes = {}
+        #The functions of the editor's actions by key code, built from the keymap, see "keymap.py".
+        self.key_bindings = None
+        #Watches the configuration file for changes, only if hot reloading is enabled.
+        self.config_watcher = None
 
         #####FPS HANDLING#####
         self.fps_meter = FPSMeter()
 
+        #####KEY TRACES#####
+        #Records the keys the editor receives when "--record" is used.
+        self.trace_recorder = None
+
+        #####STARTUP PROFILE#####
+        #If set by "--startup-profile", the editor exits after drawing the first frame and prints how long starting took.
+        self.startup_profiler = None
+
         #####NOTES#####
         """
         Something very important to remember about the editor is that the cursor and text are independent from the displayed
@@ -163,29 +233,21 @@ class TextEditor(utils.CursesUtils):
         """
 
 
-    #Parse any given command line arguments.
-    def parse(self) -> None:
-        #Short and long version of all options.
-        short_options = "vh"
-        long_options = ["version", "help"]
+    #Handles the options given in the command line, see "parse_arguments". The options must already have been checked.
+    def parse(self, options: dict, arguments: list[str]) -> None:
+        #A replay must never modify the starting file, so the replay happens on a copy of it in a temporary directory.
+        if "--replay" in options:
+            import shutil, tempfile, atexit
 
-        version_text = "Text editor - Version 1.2 - January 2021\n"
-        usage_text = "Usage: python {} [-v/--version] | [-h/--help] <file>\n".format(sys.argv[0])
+            replay_directory = tempfile.mkdtemp(prefix="text_editor_replay_")
+            #The copy is removed however the replay ends, replaying a big file would otherwise leave a copy of it every time.
+            atexit.register(shutil.rmtree, replay_directory, True)
 
-        options, arguments = getopt.getopt(sys.argv[1:], short_options, long_options)
-
-        #Parse all the options.
-        for o, a in options:
-            if o in ("-v", "--version"):
-                raise SystemExit(version_text)
-            elif o in ("-h", "--help"):
-                raise SystemExit(usage_text)
-            else:
-                raise SystemExit(usage_text)
+            if len(arguments) == 1 and os.path.lexists(arguments[0]):
+                shutil.copy(arguments[0], replay_directory)
+                arguments = [os.path.basename(arguments[0])]
 
-        #If more than one file was given as an argument show usage and exit.
-        if len(arguments) > 1:
-            raise SystemExit(usage_text)
+            os.chdir(replay_directory)
 
         if len(arguments) == 1:
             path = os.path.join(os.getcwd(), arguments[0])
@@ -194,284 +256,546 @@ class TextEditor(utils.CursesUtils):
             #name of the file that's being edited.
             if os.path.lexists(path):
                 self.load_file(path)
-            else:
-                self.file = arguments[0]
+
+            self.file = arguments[0]
+
+        #A journal is only left behind if the editor didn't exit properly. There's no one to answer when replaying or
+        #profiling the startup.
+        if self.file != None and self.journaling and "--replay" not in options and self.startup_profiler == None:
+            self.recovery_handler()
+
+        #Start recording keys, the recorder is given the starting state of the buffer so a replay can check it.
+        if "--record" in options:
+            import keytrace
+
+            self.trace_recorder = keytrace.KeyTraceRecorder(options["--record"], self.file, self.buffer_checksum())
+            self.key_recorder = self.trace_recorder.record_key
 
 
 
     #The setup preformed before the editor starts.
-    def setup(self) -> None:
+    def setup(self, options: dict, arguments: list[str]) -> None:
+        #Loads the configuration file. An invalid configuration stops the editor, explaining what's wrong.
+        try:
+            config, cached = editor_config.read_config_file()
+        except ValueError as e:
+            self.end_curses()
+            raise SystemExit(str(e))
+
+        self.apply_config(config)
+
+        #The prompts remember what was entered in them. When a trace is recorded or replayed the history starts empty and
+        #isn't saved, so the trace replays the same way.
+        import prompt_history
+
+        if "--record" in options or "--replay" in options:
+            self.prompt_history = prompt_history.PromptHistory(None)
+        else:
+            self.prompt_history = prompt_history.PromptHistory(prompt_history.history_path())
+
+        if config.config_hot_reload:
+            self.config_watcher = editor_config.ConfigWatcher()
+
+        if self.startup_profiler != None:
+            self.startup_profiler.mark("Load config (cached)" if cached else "Load config (parsed YAML)")
+
         #Parses arguments.
-        self.parse()
+        self.parse(options, arguments)
 
-        #Loads the configuration file.
-        with open("config.yaml", "r") as f:
-            self.config_file = yaml.safe_load(f)
+        if self.startup_profiler != None:
+            self.startup_profiler.mark("Parse arguments and load file")
 
 
     def editor(self) -> None:
         while True:
-            self.stdscr.clear()
-            self.get_size()
+            self.stdscr.erase()
 
             self.detect_key()
+            self.layout_handler()
             self.scroll_handler()
 
             self.fps_meter.fps_handler()
 
+            if self.config_watcher != None:
+                self.config_reload_handler()
+
+            self.buffer_load_handler()
+            self.autosave_handler()
+            self.file_change_handler()
+
             self.print_screen()
             self.prompt.prompt_handler()
 
             self.stdscr.refresh()
-            self.key = self.stdscr.getch()
+
+            if self.startup_profiler != None:
+                self.startup_profiler.mark("First frame")
+                self.end_curses()
+
+                raise SystemExit(self.startup_profiler.report())
+
+            self.key = self.read_key()
+
+
+    #Makes the given configuration the current one, and recalculates everything derived from it.
+    def apply_config(self, config: editor_config.EditorConfig) -> None:
+        self.attributes = {field : self.get_colour(getattr(config, field)) for field in config.colour_fields()}
+
+        #Only follow the configuration's soft-wrap if it changed, so reloading doesn't undo the "wrap" command.
+        if self.config == None or config.soft_wrap != self.config.soft_wrap:
+            self.soft_wrap = config.soft_wrap
+            self.vertical_scroll_segment = 0
+
+        self.config = config
+        self.journaling = config.recovery_journal and not self.headless
+
+        #A replay that's being profiled keeps it's profile.
+        profile = self.key_bindings.profile if self.key_bindings != None else None
+        self.keymap = keymap.build_keymap(config.keys)
+        self.key_bindings = keymap.KeyBindings(self.keymap, self.key_actions())
+        self.key_bindings.profile = profile
+
+        import line_store
+
+        line_store.cache.configure(config.hot_line_budget, config.compressed_block_budget * 2**20)
+
+
+    #Reloads the configuration if the file changed. If the new configuration is invalid the old one is kept.
+    def config_reload_handler(self) -> None:
+        try:
+            config = self.config_watcher.poll()
+        except (ValueError, OSError) as e:
+            self.prompt.change_prompt("Configuration not reloaded: {}".format(e))
+            return
+
+        if config != None:
+            self.apply_config(config)
+            self.prompt.change_prompt("Configuration reloaded")
+
+
+    #Asks the user for input in the bottom line of the editor, showing the given prompt. Returns the entered text, or "None"
+    #if the escape key was pressed. "history_name" is the prompt's history, like "find" or "file", see "prompt_history.py".
+    #"listener" is told about the text as it's typed, see "utils.BasicInput".
+    def get_input(self, prompt_text: str, history_name: Union[str, None] = None, listener: Any = None) -> Union[str, None]:
+        #Disable editor prompt.
+        self.prompt.toggle_prompt()
+
+        basic_input = utils.BasicInput(self, self.y_size - 1, 0, prompt_text, self.attributes["input_colour"], self.attributes["normal_cursor_colour"], self.attributes["over_text_cursor_colour"], history_name, listener)
+        #The "basic_input" method halts the program.
+        entered_text = basic_input.basic_input()
+
+        #Re-enable editor prompt.
+        self.prompt.toggle_prompt()
+
+        return entered_text
+
+
+    #Replays the key trace in the given path, see "keytrace.py". If "realtime" is False the keys are replayed as fast as
+    #possible. Once the trace ends a report with the key latencies, the time taken by each action and whether the final buffer
+    #matches the recorded one is printed.
+    def replay_handler(self, trace_path: str, realtime: bool) -> None:
+        import keytrace
+
+        header, events, trailer = keytrace.load_trace(trace_path)
+
+        replayer = keytrace.KeyTraceReplayer(events, realtime)
+        self.key_source = replayer.next_key
+
+        starting_checksum = self.buffer_checksum()
+        start_time = time.perf_counter()
+        #Time every action, so the report shows which ones the time went to.
+        self.key_bindings.profile = {}
+
+        #The replay ends when the trace runs out of keys or when a replayed key quits the editor.
+        try:
+            self.editor()
+        except (keytrace.TraceFinished, SystemExit):
+            pass
+
+        total_time = time.perf_counter() - start_time
+        self.end_curses()
+
+        if header.get("checksum") != starting_checksum:
+            print("Warning: the starting file differs from the one the trace was recorded with")
+
+        print(replayer.report(total_time, self.buffer_checksum(), trailer.get("checksum")))
+
+        if self.key_bindings.profile != {}:
+            print(self.key_bindings.report())
+
+
+    #Properly exits curses and the program. If keys are being recorded the trace is finished first. The recovery journals are
+    #deleted, since quitting either saved or discarded the changes.
+    def quit_editor(self) -> None:
+        if self.trace_recorder != None:
+            self.trace_recorder.close(self.buffer_checksum())
+
+        #An autosave that's being written is finished, so it doesn't leave it's temporary file behind.
+        self.finish_autosave(True)
+        self.store_buffer_state()
+
+        for buffer in self.buffers.buffers:
+            if buffer.journal != None:
+                buffer.journal.close()
+
+        self.end_curses()
+        raise SystemExit()
+
+
+    #Returns a checksum of the buffer's text, as it would be written to disk.
+    def buffer_checksum(self) -> str:
+        import hashlib
+
+        checksum = hashlib.sha256()
+
+        for line in self.text:
+            checksum.update(line.line_text.encode("utf-8", "surrogateescape"))
+            checksum.update(b"\n")
+
+        return checksum.hexdigest()
 
     """
     INPUT HANDLING
     """
+    #Runs the action bound to the key, see "keymap.py". Characters that aren't bound to anything are typed.
     def detect_key(self) -> None:
-        #Text characters, this range covers all of extended ASCII.
-        if self.key >= 32 and self.key <= 253:
-            self.insert_char(chr(self.key))
+        binding = self.key_bindings.get(self.key)
 
-            #Disables find function and increments buffer modification counter.
-            self.modification_handler()
+        if binding == None and self.key >= keymap.FIRST_CHARACTER and self.key <= keymap.LAST_CHARACTER:
+            binding = ("insert", self.type_character)
 
-        #Backspace
-        elif self.key == 8:
-            #If the line isn't empty delete the corresponding character.
-            if len(self.text[self.cursor_pos_y].line_text) > 0 and self.cursor_pos_x > 0:
-                #Copy all the text in the current line except the char to the left of the cursor.
-                text_with_removed_char = self.text[self.cursor_pos_y].line_text[:self.cursor_pos_x - 1]
-                text_after = self.text[self.cursor_pos_y].line_text[self.cursor_pos_x:]
-                self.text[self.cursor_pos_y].line_text = text_with_removed_char + text_after
-
-                self.cursor_pos_x -= 1
-
-            #If at the begging of a line and not at the first line. The current line's text should join the end of the line
-            #above. This also works for "deleting" empty lines, since you are appending an empty string.
-            elif self.cursor_pos_x == 0 and self.cursor_pos_y > 0:
-                #Make the cursor's x position be at the end of the line to which you are moving. This has to be done first
-                #because otherwise the cursor would be at the end of the line with the appended new text.
-                self.cursor_pos_x = len(self.text[self.cursor_pos_y - 1].line_text)
-
-                self.text[self.cursor_pos_y - 1].line_text += self.text[self.cursor_pos_y].line_text
-                self.text.pop(self.cursor_pos_y)
-                self.cursor_pos_y -= 1
+        if binding == None:
+            return
 
-            #Update the desired cursor position
-            self.desired_cursor_x_pos = self.cursor_pos_x
+        #A buffer that's still loading can't be modified.
+        if self.buffers.current.loading and binding[0] in keymap.EDITING_ACTIONS:
+            self.prompt.change_prompt("The file is still loading, it can't be modified yet")
+            return
 
-            #Disables find function and increments buffer modification counter.
-            self.modification_handler()
+        #Moving the cursor without shift ends the selection, unless it was started with the mark.
+        if self.selection != None and not self.selection.marked and binding[0] in keymap.MOVEMENT_ACTIONS:
+            self.selection = None
 
-        #"SUPR" key.
-        elif self.key == curses.KEY_DC:
-            #Make sure there's text to delete.
-            if self.cursor_pos_x < len(self.text[self.cursor_pos_y].line_text):
-                #Copy all the text in the current line except the char to the right of the cursor.
-                text_before = self.text[self.cursor_pos_y].line_text[:self.cursor_pos_x]
-                text_with_removed_char = self.text[self.cursor_pos_y].line_text[self.cursor_pos_x + 1:]
-                self.text[self.cursor_pos_y].line_text = text_before + text_with_removed_char
+        self.key_bindings.run(*binding)
 
-            #Move the line below to the current line. Make sure there's a line to move up.
-            elif len(self.text) - 1 > self.cursor_pos_y:
-                self.text[self.cursor_pos_y].line_text += self.text[self.cursor_pos_y + 1].line_text
-                self.text.pop(self.cursor_pos_y + 1)
 
-            #Disables find function and increments buffer modification counter.
-            self.modification_handler()
+    #The actions of the editor, by name.
+    def key_actions(self) -> dict[str, Callable]:
+        actions = {"enter" : self.new_line, "backspace" : self.delete_previous_char, "delete" : self.delete_next_char,
+            "indent" : self.indent, "left" : self.cursor_left, "right" : self.cursor_right, "up" : self.cursor_up,
+            "down" : self.cursor_down, "line-start" : self.cursor_line_start, "line-end" : self.cursor_line_end,
+            "page-up" : self.page_up, "page-down" : self.page_down, "cancel" : self.cancel, "quit" : self.quit_handler,
+            "save" : self.save_key_handler, "save-as" : lambda: self.save_handler(True), "open" : self.load_handler, "find" : self.find_handler,
+            "tools" : self.tool_console_handler, "mark" : self.mark_handler, "block-selection" : self.block_selection_handler,
+            "cut" : lambda: self.copy_handler(clipboard.DEFAULT_REGISTER, True), "copy" : lambda: self.copy_handler(clipboard.DEFAULT_REGISTER),
+            "paste" : lambda: self.paste_handler(clipboard.DEFAULT_REGISTER)}
 
-        #Enter key
-        #The actual code given by the enter key is 10, however the rest are left here for compatibility. Beware that
-        #"CTRL+J" also has a keycode of 10.
-        elif self.key == 10 or self.key == 13 or self.key == curses.KEY_ENTER:
-            #Since the text is accessed multiple times store it in a variable.
-            line_text = self.text[self.cursor_pos_y].line_text
+        #Every movement selects with shift.
+        for action in keymap.MOVEMENT_ACTIONS:
+            actions["select-" + action] = lambda move=actions[action]: self.select(move)
 
-            #When enter is pressed all the text to the right of the cursor goes down to the new line.
-            text_before = line_text[:self.cursor_pos_x]
-            text_after = line_text[self.cursor_pos_x:]
-            #Calculates the amount of spaces at the beginning of the new line by getting the amount of spaces at the
-            #beginning of the old line.
-            spaces_to_add = len(line_text) - len(line_text.lstrip(" "))
+        return actions
 
-            #The old line retains what was left of the cursor.
-            self.text[self.cursor_pos_y].line_text = text_before
 
-            #Create the new line and add corresponding text.
-            self.text.insert(self.cursor_pos_y + 1, Line())
+    def type_character(self) -> None:
+        self.insert_char(chr(self.key))
 
-            #Creates the new line by adding the corresponding spaces and then the text that was right of the cursor.
-            self.text[self.cursor_pos_y + 1].line_text = (" " * spaces_to_add) + text_after
+        #Disables find function and increments buffer modification counter.
+        self.modification_handler()
 
-            self.cursor_pos_y += 1
-            self.cursor_pos_x = spaces_to_add
-            self.desired_cursor_x_pos = self.cursor_pos_x
 
-            #Disables find function and increments buffer modification counter.
-            self.modification_handler()
+    def delete_previous_char(self) -> None:
+        #If the line isn't empty delete the corresponding character.
+        if len(self.text[self.cursor_pos_y]) > 0 and self.cursor_pos_x > 0:
+            #Remove the char to the left of the cursor.
+            self.editable_line(self.cursor_pos_y).delete(self.cursor_pos_x - 1, 1)
+            self.text_changed(self.cursor_pos_y, 1, 1, edits=[(self.cursor_pos_x - 1, 1, "")])
 
-        #TAB key
-        elif self.key == 9:
-            #Add the remaining spaces to reach the desired tab width.
-            spaces_to_add = 4 - (self.cursor_pos_x % self.config_file["MISC"]["tabstop-width"])
+            self.cursor_pos_x -= 1
 
-            for x in range(spaces_to_add):
-                self.insert_char(" ")
+        #If at the begging of a line and not at the first line. The current line's text should join the end of the line
+        #above. This also works for "deleting" empty lines, since you are appending an empty string.
+        elif self.cursor_pos_x == 0 and self.cursor_pos_y > 0:
+            #Make the cursor's x position be at the end of the line to which you are moving. This has to be done first
+            #because otherwise the cursor would be at the end of the line with the appended new text.
+            self.cursor_pos_x = len(self.text[self.cursor_pos_y - 1])
 
-            #Disables find function and increments buffer modification counter.
-            self.modification_handler()
+            self.editable_line(self.cursor_pos_y - 1).append(self.text[self.cursor_pos_y])
+            self.text.pop(self.cursor_pos_y)
+            self.cursor_pos_y -= 1
+            self.text_changed(self.cursor_pos_y, 2, 1)
+
+        #Update the desired cursor position
+        self.desired_cursor_x_pos = self.cursor_pos_x
 
+        #Disables find function and increments buffer modification counter.
+        self.modification_handler()
 
-        #Moves the cursor. Before doing so check that there's text to move it to.
-        elif self.key == curses.KEY_LEFT:
-            #Move the cursor normally.
-            if self.cursor_pos_x > 0:
-                self.cursor_pos_x -= 1
-            #If the cursor is at the beginning of the line then it should move to the end of the line above. Make sure there's
-            #a line to move up to.
-            elif self.cursor_pos_y > 0:
-                    self.cursor_pos_y -= 1
-                    self.cursor_pos_x = len(self.text[self.cursor_pos_y].line_text)
 
-            #Update the desired cursor position
-            self.desired_cursor_x_pos = self.cursor_pos_x
+    #"SUPR" key.
+    def delete_next_char(self) -> None:
+        #Make sure there's text to delete.
+        if self.cursor_pos_x < len(self.text[self.cursor_pos_y]):
+            #Remove the char to the right of the cursor.
+            self.editable_line(self.cursor_pos_y).delete(self.cursor_pos_x, 1)
+            self.text_changed(self.cursor_pos_y, 1, 1, edits=[(self.cursor_pos_x, 1, "")])
 
-        elif self.key == curses.KEY_RIGHT:
-            #Move the cursor normally.
-            if self.cursor_pos_x < len(self.text[self.cursor_pos_y].line_text):
-                self.cursor_pos_x += 1
+        #Move the line below to the current line. Make sure there's a line to move up.
+        elif len(self.text) - 1 > self.cursor_pos_y:
+            self.editable_line(self.cursor_pos_y).append(self.text[self.cursor_pos_y + 1])
+            self.text.pop(self.cursor_pos_y + 1)
+            self.text_changed(self.cursor_pos_y, 2, 1)
 
-            #If the cursor is at the end of the line then it should move to the beginning of the line below. Make sure there's
-            #a line to move down to.
-            elif len(self.text) - 1 > self.cursor_pos_y:
-                    self.cursor_pos_y += 1
-                    self.cursor_pos_x = 0
+        #Disables find function and increments buffer modification counter.
+        self.modification_handler()
 
-            #Update the desired cursor position
-            self.desired_cursor_x_pos = self.cursor_pos_x
 
-        elif self.key == curses.KEY_DOWN and len(self.text) - 1 > self.cursor_pos_y:
+    def new_line(self) -> None:
+        line = self.editable_line(self.cursor_pos_y)
+
+        #Calculates the amount of spaces at the beginning of the new line by getting the amount of spaces at the
+        #beginning of the old line.
+        spaces_to_add = line.indentation()
+
+        #When enter is pressed all the text to the right of the cursor goes down to the new line, the old line retains what
+        #was left of the cursor.
+        new_line = line.split(self.cursor_pos_x)
+        #The new line starts with the corresponding spaces and then the text that was right of the cursor.
+        new_line.insert(0, " " * spaces_to_add)
+
+        self.text.insert(self.cursor_pos_y + 1, new_line)
+        self.text_changed(self.cursor_pos_y, 1, 2)
+
+        self.cursor_pos_y += 1
+        self.cursor_pos_x = spaces_to_add
+        self.desired_cursor_x_pos = self.cursor_pos_x
+
+        #Disables find function and increments buffer modification counter.
+        self.modification_handler()
+
+
+    def indent(self) -> None:
+        #Add the remaining spaces to reach the desired tab width.
+        spaces_to_add = self.config.tabstop_width - (self.cursor_column() % self.config.tabstop_width)
+
+        for x in range(spaces_to_add):
+            self.insert_char(" ")
+
+        #Disables find function and increments buffer modification counter.
+        self.modification_handler()
+
+
+    #Moves the cursor. Before doing so check that there's text to move it to.
+    def cursor_left(self) -> None:
+        #Move the cursor normally.
+        if self.cursor_pos_x > 0:
+            self.cursor_pos_x -= 1
+        #If the cursor is at the beginning of the line then it should move to the end of the line above. Make sure there's
+        #a line to move up to.
+        elif self.cursor_pos_y > 0:
+                self.cursor_pos_y -= 1
+                self.cursor_pos_x = len(self.text[self.cursor_pos_y])
+
+        #Update the desired cursor position
+        self.desired_cursor_x_pos = self.cursor_pos_x
+
+
+    def cursor_right(self) -> None:
+        #Move the cursor normally.
+        if self.cursor_pos_x < len(self.text[self.cursor_pos_y]):
+            self.cursor_pos_x += 1
+
+        #If the cursor is at the end of the line then it should move to the beginning of the line below. Make sure there's
+        #a line to move down to.
+        elif len(self.text) - 1 > self.cursor_pos_y:
+                self.cursor_pos_y += 1
+                self.cursor_pos_x = 0
+
+        #Update the desired cursor position
+        self.desired_cursor_x_pos = self.cursor_pos_x
+
+
+    def cursor_down(self) -> None:
+        if len(self.text) - 1 > self.cursor_pos_y:
             self.interline_cursor_handler(1)
 
-        elif self.key == curses.KEY_UP and self.cursor_pos_y > 0:
+
+    def cursor_up(self) -> None:
+        if self.cursor_pos_y > 0:
             self.interline_cursor_handler(-1)
 
-        #"HOME" and "END" keys.
-        elif self.key == curses.KEY_HOME:
-            self.cursor_pos_x = 0
-            #Update the desired cursor position
-            self.desired_cursor_x_pos = 0
 
-        elif self.key == curses.KEY_END:
-            self.cursor_pos_x = len(self.text[self.cursor_pos_y].line_text)
-            #Update the desired cursor position
-            self.desired_cursor_x_pos = self.cursor_pos_x
+    #"HOME" and "END" keys.
+    def cursor_line_start(self) -> None:
+        self.cursor_pos_x = 0
+        #Update the desired cursor position
+        self.desired_cursor_x_pos = 0
 
 
-        #"Page Up" and "Page Down" keys.
-        elif self.key == curses.KEY_PPAGE:
-            if self.find_results.find_enabled:
-                self.match_line_handler(-1)
-            else:
-                #Move the y cursor "up" by the size of the screen.
-                new_cursor_pos = self.cursor_pos_y - self.max_displayed_lines
+    def cursor_line_end(self) -> None:
+        self.cursor_pos_x = len(self.text[self.cursor_pos_y])
+        #Update the desired cursor position
+        self.desired_cursor_x_pos = self.cursor_pos_x
 
-                #If the cursor goes past the beginning of the text set it to the first line.
-                if new_cursor_pos < 0:
-                    new_cursor_pos = 0
 
-                #So that the cursor moves to the correct x position. This is required because when we change lines we have
-                #to handle the cursor, otherwise we'll be prone to getting index errors.
-                self.interline_cursor_handler(-abs(new_cursor_pos - self.cursor_pos_y))
+    #"Page Up" and "Page Down" keys.
+    def page_up(self) -> None:
+        if self.find_results.find_enabled:
+            self.match_line_handler(-1)
+        elif self.soft_wrap:
+            self.wrapped_page_handler(-self.layout.max_displayed_lines)
+        else:
+            #Move the y cursor "up" by the size of the screen.
+            new_cursor_pos = self.cursor_pos_y - self.layout.max_displayed_lines
 
+            #If the cursor goes past the beginning of the text set it to the first line.
+            if new_cursor_pos < 0:
+                new_cursor_pos = 0
 
-        elif self.key == curses.KEY_NPAGE:
-            if self.find_results.find_enabled:
-                self.match_line_handler(1)
-            else:
-                #Move the y cursor "down" by the size of the screen.
-                new_cursor_pos = self.cursor_pos_y + self.max_displayed_lines
-
-                #If the cursor goes past the end of the text set it to the last line.
-                if new_cursor_pos >= len(self.text):
-                    new_cursor_pos = len(self.text) - 1
-
-                #So that the cursor moves to the correct x position. This is required because when we change lines we have
-                #to handle the cursor, otherwise we'll be prone to getting index errors.
-                self.interline_cursor_handler(abs(new_cursor_pos - self.cursor_pos_y))
-
-        #"ESC" key.
-        elif self.key == 27:
-            if self.find_results.find_enabled:
-                self.find_results.find_enabled = False
-
-        #"CTRL" keys.
-        #NOTE: The way in which "CTRL" works is, it takes the keycode of the key that was pressed in conjunction with "CTRL"
-        #(ex: CTRL+A, the key is "A") and returns it's value, using the uppercase ASCII code minus 64. So if you pressed
-        #CTRL+E you would get a keycode of 5.
-
-        #"CTRL+Q"
-        elif self.key == ord("Q") - 64:
-            required_confirmation = self.config_file["MISC"]["confirmation-key-count"]
-
-            #If the buffer has been modified since the last save check if "Ctrl+Q" has been pressed the required number of
-            #times to exit.
-            if self.buffer_modification_counter > 0:
-                if self.confirmation_counter < required_confirmation:
-                    self.prompt.change_prompt("File has unsaved changes, press Ctrl+Q {} more times to quit".format(required_confirmation - self.confirmation_counter))
-                    self.confirmation_counter += 1
+            #So that the cursor moves to the correct x position. This is required because when we change lines we have
+            #to handle the cursor, otherwise we'll be prone to getting index errors.
+            self.interline_cursor_handler(-abs(new_cursor_pos - self.cursor_pos_y))
 
-                    return
 
-            #Properly exit curses and exit the program.
-            curses.endwin()
-            quit()
+    def page_down(self) -> None:
+        if self.find_results.find_enabled:
+            self.match_line_handler(1)
+        elif self.soft_wrap:
+            self.wrapped_page_handler(self.layout.max_displayed_lines)
+        else:
+            #Move the y cursor "down" by the size of the screen.
+            new_cursor_pos = self.cursor_pos_y + self.layout.max_displayed_lines
+
+            #If the cursor goes past the end of the text set it to the last line.
+            if new_cursor_pos >= len(self.text):
+                new_cursor_pos = len(self.text) - 1
+
+            #So that the cursor moves to the correct x position. This is required because when we change lines we have
+            #to handle the cursor, otherwise we'll be prone to getting index errors.
+            self.interline_cursor_handler(abs(new_cursor_pos - self.cursor_pos_y))
+
+
+    #"ESC" key.
+    def cancel(self) -> None:
+        self.selection = None
+
+        if self.find_results.find_enabled:
+            self.find_results.find_enabled = False
+
+
+    def quit_handler(self) -> None:
+        required_confirmation = self.config.confirmation_key_count
+
+        #If any buffer has been modified since the last save check if the quit key has been pressed the required number of
+        #times to exit.
+        if self.unsaved_buffers() > 0:
+            if self.confirmation_counter < required_confirmation:
+                self.prompt.change_prompt("File has unsaved changes, press Ctrl+Q {} more times to quit".format(required_confirmation - self.confirmation_counter))
+                self.confirmation_counter += 1
+
+                return
+
+        #Properly exit curses and exit the program.
+        self.quit_editor()
+
 
+    def save_key_handler(self) -> None:
+        #If there's no filename get one from the user.
+        if self.file == None:
+            self.save_handler(True)
+        else:
+            self.save_handler()
+
+
+    #Has to be called whenever the text changes, lines "[y, y + removed)" were replaced by "added" lines, which must already be
+    #in the text. Keeps everything that's derived from the text up to date. "record" is False for changes that come from the
+    #file itself, they aren't unsaved changes. A change inside of the lines, with as many lines removed as added, can also be
+    #given as "edits", an "(x, deleted, inserted)" for every line, "deleted" characters at index "x" were replaced by
+    #"inserted", so long lines aren't joined to record it.
+    def text_changed(self, y: int, removed: int, added: int, record: bool = True, edits: Union[list[tuple[int, int, str]], None] = None) -> None:
+        self.wrap_index.replace(y, removed, added, self.text)
+        self.text_version += 1
+
+        if not record:
+            return
+
+        self.text_modified = True
 
-        #"CTRL+S" key combination.
-        elif self.key == ord("S") - 64:
-            #If there's no filename get one from the user.
-            if self.file == None:
-                self.save_handler(True)
+        #The journal starts from the file on disk, so it can only start while the buffer still matches it.
+        if self.journal == None and self.journaling and self.file != None and self.buffer_modification_counter == 0:
+            import journal
+
+            try:
+                self.journal = journal.RecoveryJournal(os.path.join(os.getcwd(), self.file), self.file)
+            #A journal that wasn't recovered, or another editor's, is never overwritten.
+            except FileExistsError:
+                self.prompt.change_prompt("{} already has a recovery journal, unsaved changes won't be recoverable".format(self.file))
+            except OSError:
+                self.journaling = False
+                self.prompt.change_prompt("Can't write the recovery journal, unsaved changes won't be recoverable")
+
+        if self.journal != None:
+            if edits != None and any(self.text[y + i].chunks != None for i in range(added)):
+                operations = [(y + i,) + edit if self.text[y + i].chunks != None else (y + i, 1, [self.text[y + i].line_text]) for i, edit in enumerate(edits)]
             else:
-                self.save_handler()
+                operations = [(y, removed, [line.line_text for line in self.text[y:y + added]])]
 
-        #"CTRL+O" key combination.
-        elif self.key == ord("O") - 64:
-            self.load_handler()
+            for operation in operations:
+                self.journal.record(operation)
 
-        #"CTRL+F" key combination.
-        elif self.key == ord("F") - 64:
-            self.find_handler()
+                #Once the autosave finishes the journal starts again from the new file, with the changes made while it was written.
+                if self.autosave_job != None and self.autosave_job.buffer is self.buffers.current:
+                    self.autosave_job.operations.append(operation)
 
-        #"CTRL+T" key combination. Activates the "tool console", which allows to write commands in a VIM like console.
-        elif self.key == ord("T") - 64:
-            self.tool_console_handler()
 
-        #"ALT" keys.
-        #NOTE: "ALT" keys use the same principle as the "CTRL" keys, but you add 352 instead of subtracting 64.
-        elif self.key == ord("S") + 352:
-            self.get_save_name()
+    #Returns the line at the given index, ready to be modified. A line from before the last snapshot of the text, like the
+    #one of an autosave or the text on disk, might be shared with it, so it's replaced by a copy first, see
+    #"buffers.snapshot_text". Lines must never be modified in place without it.
+    def editable_line(self, y: int) -> Line:
+        if self.text[y].generation < Line.current_generation:
+            self.text[y] = self.text[y].copy()
+
+        return self.text[y]
+
+
+    #Updates the layout, and everything that depends on it, to the current console size and text.
+    def layout_handler(self) -> None:
+        self.layout.update(self.y_size, self.x_size, len(self.text))
+        self.wrap_index.set_width(self.layout.max_text_width, self.config.tabstop_width)
+
+        #Lines are still being added by the loader, so the index can't be kept up to date.
+        if self.buffers.current.loading:
+            self.wrap_index.invalidate()
+
+
+    #The console was resized, the layout and the scroll are updated right away, so a prompt that's open draws the screen
+    #behind it with the new size.
+    def resize_handler(self) -> None:
+        self.layout_handler()
+        self.scroll_handler()
 
 
     #Handles everting that happens whenever the buffer's modified.
     def modification_handler(self) -> None:
-        #Increment the buffer modification counter.
-        self.buffer_modification_counter += 1
+        #Increment the buffer modification counter, if the text actually changed.
+        if self.text_modified:
+            self.buffer_modification_counter += 1
+            self.last_modification_time = time.monotonic()
+            self.text_modified = False
+
         #Whenever the buffer is modified we also reset the number of times "Ctrl+Q" has to be pressed to exit.
         self.confirmation_counter = 0
 
         #Disable the find function since the buffer was modified.
         self.find_results.find_enabled = False
+        #The selection might not be where the text it selected is anymore.
+        self.selection = None
 
 
     def insert_char(self, char: str) -> None:
-        #Insert the given char at the current cursor position. Since python strings are immutable we create a new string
-        #consisting of the previous string split where the cursor is plus the added character.
-        text_before = self.text[self.cursor_pos_y].line_text[:self.cursor_pos_x]
-        text_after = self.text[self.cursor_pos_y].line_text[self.cursor_pos_x:]
-        self.text[self.cursor_pos_y].line_text = text_before + char + text_after
+        #Insert the given char at the current cursor position. Only the chunk of the line with the cursor is copied, see "Line".
+        self.editable_line(self.cursor_pos_y).insert(self.cursor_pos_x, char)
+        self.text_changed(self.cursor_pos_y, 1, 1, edits=[(self.cursor_pos_x, 0, char)])
 
         #Move the cursor's position in that line.
         self.cursor_pos_x += 1
@@ -482,29 +806,145 @@ class TextEditor(utils.CursesUtils):
     """
     CURSOR HANDLING
     """
+    #The display column of the cursor, it's different from "cursor_pos_x" if there are tabs or wide characters before it.
+    def cursor_column(self) -> int:
+        return self.text[self.cursor_pos_y].column_of(self.cursor_pos_x, self.config.tabstop_width)
+
+
     #Allows for vertical and horizontal scrolling.
     def scroll_handler(self) -> None:
+        if self.soft_wrap:
+            self.wrapped_scroll_handler()
+            return
+
         #Vertical scrolling
         #If the cursor is above the scroll line simply make it equal to the cursor.
         if self.cursor_pos_y < self.vertical_scroll_line:
             self.vertical_scroll_line = self.cursor_pos_y
         #If the cursor gets to the end of the text window then move it down by one.
-        elif self.cursor_pos_y > (self.vertical_scroll_line + self.max_displayed_lines) - 1:
-            self.vertical_scroll_line = self.cursor_pos_y - self.max_displayed_lines + 1
+        elif self.cursor_pos_y > (self.vertical_scroll_line + self.layout.max_displayed_lines) - 1:
+            self.vertical_scroll_line = self.cursor_pos_y - self.layout.max_displayed_lines + 1
+
+        #Horizontal scrolling, in display columns. The whole character under the cursor has to be visible.
+        line = self.text[self.cursor_pos_y]
+        cursor_column = line.column_of(self.cursor_pos_x, self.config.tabstop_width)
+
+        if self.cursor_pos_x < len(line):
+            cursor_end_column = max(line.column_of(self.cursor_pos_x + 1, self.config.tabstop_width), cursor_column + 1)
+        else:
+            cursor_end_column = cursor_column + 1
 
-        #Horizontal scrolling
         #If the cursor is further left than the scroll line simply make it equal to the cursor.
-        if self.cursor_pos_x < self.horizontal_scroll_character:
-            self.horizontal_scroll_character = self.cursor_pos_x
+        if cursor_column < self.horizontal_scroll_character:
+            self.horizontal_scroll_character = cursor_column
         #If the cursor gets to the end of the text window move it right by one.
-        elif self.cursor_pos_x > (self.horizontal_scroll_character + self.max_text_width) - 1:
-            self.horizontal_scroll_character = self.cursor_pos_x - self.max_text_width + 1
+        elif cursor_end_column > self.horizontal_scroll_character + self.layout.max_text_width:
+            self.horizontal_scroll_character = cursor_end_column - self.layout.max_text_width
+
+
+    #Scrolling when soft-wrap is enabled. There's no horizontal scrolling, instead the top of the screen can be any row of a
+    #wrapped line, the row is "vertical_scroll_segment". Only the lines between the top of the screen and the cursor are looked
+    #at, so it doesn't need the wrap index.
+    def wrapped_scroll_handler(self) -> None:
+        width = self.layout.max_text_width
+        tabstop = self.config.tabstop_width
+        screen_rows = self.layout.max_displayed_lines
+        cursor_segment = self.cursor_column() // width
+
+        self.horizontal_scroll_character = 0
+
+        #If the cursor is above the top of the screen simply make it the top.
+        if (self.cursor_pos_y, cursor_segment) < (self.vertical_scroll_line, self.vertical_scroll_segment):
+            self.vertical_scroll_line = self.cursor_pos_y
+            self.vertical_scroll_segment = cursor_segment
+            return
+
+        #Count the rows from the top of the screen to the cursor. Every line takes at least a row, so if the cursor is further
+        #than a screen of lines there's no need to count.
+        if self.cursor_pos_y - self.vertical_scroll_line < screen_rows:
+            rows = -self.vertical_scroll_segment
+
+            for y in range(self.vertical_scroll_line, self.cursor_pos_y):
+                rows += layout.WrapIndex.line_rows(self.text[y].display_width(tabstop), width)
+
+            rows += cursor_segment
+
+            if rows < screen_rows:
+                return
+
+        #The cursor is below the screen, the top of the screen is moved so the cursor is in the last row.
+        y = self.cursor_pos_y
+        segment = cursor_segment
+        rows_above = screen_rows - 1
+
+        while rows_above > 0:
+            if segment > 0:
+                moved = min(segment, rows_above)
+                segment -= moved
+                rows_above -= moved
+            elif y > 0:
+                y -= 1
+                segment = layout.WrapIndex.line_rows(self.text[y].display_width(tabstop), width) - 1
+                rows_above -= 1
+            else:
+                break
+
+        self.vertical_scroll_line = y
+        self.vertical_scroll_segment = segment
+
+
+    #Returns the rows that are visible on the screen, as a list of "(line, first display column)" tuples. Lines past the end of the
+    #text are included, to be shown as empty lines.
+    def visible_rows(self) -> list[tuple[int, int]]:
+        screen_rows = self.layout.max_displayed_lines
+
+        if not self.soft_wrap:
+            return [(y, self.horizontal_scroll_character) for y in range(self.vertical_scroll_line, self.vertical_scroll_line + screen_rows)]
+
+        width = self.layout.max_text_width
+        tabstop = self.config.tabstop_width
+        rows = []
+        y = self.vertical_scroll_line
+        segment = self.vertical_scroll_segment
+
+        while len(rows) < screen_rows:
+            if y >= len(self.text):
+                rows.append((y, 0))
+            else:
+                line_rows = layout.WrapIndex.line_rows(self.text[y].display_width(tabstop), width)
+
+                for row_segment in range(segment, min(line_rows, segment + screen_rows - len(rows))):
+                    rows.append((y, row_segment * width))
+
+            y += 1
+            segment = 0
+
+        return rows
+
+
+    #Moves the cursor by the given number of visual rows when soft-wrap is enabled, used by "Page Up" and "Page Down". The
+    #cursor keeps it's desired column inside the row.
+    def wrapped_page_handler(self, rows: int) -> None:
+        width = self.layout.max_text_width
+        self.wrap_index.ensure_built(self.text)
+
+        target_row = self.wrap_index.visual_row(self.cursor_pos_y) + self.cursor_column() // width + rows
+        y, segment = self.wrap_index.line_at(target_row)
+
+        #The desired position is an index, the row it's kept in is found by it's display column in the current line. Past the
+        #end of the line every index is a column.
+        line = self.text[self.cursor_pos_y]
+        desired_x = min(self.desired_cursor_x_pos, len(line))
+        desired_column = line.column_of(desired_x, self.config.tabstop_width) + self.desired_cursor_x_pos - desired_x
+
+        self.cursor_pos_y = y
+        self.cursor_pos_x = self.text[y].index_at_column(segment * width + desired_column % width, self.config.tabstop_width)
 
 
     #Handles what happens when the cursor changes lines via the up and down arrow. "line_index" is the index to the line the
     #cursor is moving, relative to the current line.
     def interline_cursor_handler(self, line_index: int) -> None:
-        moving_to_line_length = len(self.text[self.cursor_pos_y + line_index].line_text)
+        moving_to_line_length = len(self.text[self.cursor_pos_y + line_index])
 
         #If the line to move to is shorter than the desired cursor length go to the end of the line.
         if self.desired_cursor_x_pos > moving_to_line_length:
@@ -575,18 +1015,11 @@ class TextEditor(utils.CursesUtils):
     #Displays the buffer and cursor. Also handles search function highlighting.
     def display(self) -> None:
         line_count = len(self.text)
-        #The number of characters required to fit the line counter.
-        line_display_width = int(math.log10(line_count)) + 1
-        #Makes the width of the line number display a minimum of 3.
-        line_display_width = max(line_display_width, 2)
-
-        #The variable is set in the function because it depends on "line_display_width"
-        self.max_text_width = self.x_size - line_display_width
+        #The number of characters required to fit the line counter, it's kept by the layout.
+        line_display_width = self.layout.gutter_width
 
         #What is the y coordinate to print to, doesn't represent the y position of the cursor.
         print_y = 0
-        #What is the x coordinate to print to, doesn't represent the x position of the cursor.
-        print_x = 0
 
         #The index for the matched text in the current line. If there's no matched text on the line it's set to "None".
         matched_text_index = None
@@ -595,23 +1028,35 @@ class TextEditor(utils.CursesUtils):
 
         #Since all the colours are going to be used a significant number of times they are stored in variables. It would be
         #inefficient to access a dictionary several hundred times per cycle.
-        text_colour = self.config_file["TEXT-COLOUR"]["text-colour"]
-        normal_cursor_colour = self.config_file["TEXT-COLOUR"]["normal-cursor-colour"]
-        over_text_cursor_colour = self.config_file["TEXT-COLOUR"]["over-text-cursor-colour"]
-        find_match_colour = self.config_file["TEXT-COLOUR"]["find-match-colour"]
-        line_colour = self.config_file["EDITOR-COLOUR"]["line-colour"]
-        empty_line_colour = self.config_file["EDITOR-COLOUR"]["empty-line-colour"]
-
-        #Prints the text, matched text from the found function and the cursor.
-        for y in range(self.vertical_scroll_line, self.vertical_scroll_line + self.max_displayed_lines):
-            #This is so that if there are less than "self.vertical_scroll_line + self.max_displayed_lines" lines(Empty lines)
+        text_colour = self.attributes["text_colour"]
+        normal_cursor_colour = self.attributes["normal_cursor_colour"]
+        over_text_cursor_colour = self.attributes["over_text_cursor_colour"]
+        find_match_colour = self.attributes["find_match_colour"]
+        selection_colour = self.attributes["selection_colour"]
+        line_colour = self.attributes["line_colour"]
+        empty_line_colour = self.attributes["empty_line_colour"]
+
+        tabstop = self.config.tabstop_width
+        cursor_column = self.cursor_column()
+        selection_range = self.selection_range()
+
+        #The first display column of the row the cursor is in. Without soft-wrap there's a single row per line, starting at the
+        #horizontal scroll.
+        if self.soft_wrap:
+            cursor_row_start = cursor_column - cursor_column % self.layout.max_text_width
+        else:
+            cursor_row_start = self.horizontal_scroll_character
+
+        #Prints the text, matched text from the found function and the cursor. Each row shows the line "y" starting at column
+        #"row_start".
+        for y, row_start in self.visible_rows():
+            #This is so that if there are less than "self.vertical_scroll_line + max_displayed_lines" lines(Empty lines)
             #the program doesn't try to address non existing lines. Instead it shows "~" to denote no lines.
             if y > line_count - 1:
-                self.stdscr.addstr(print_y, 0, "~", self.get_colour(empty_line_colour))
+                self.stdscr.addstr(print_y, 0, "~", empty_line_colour)
 
             else:
                 line = self.text[y]
-                print_x = line_display_width
 
                 #Sets the array containing the indexes of all matches in the current line, if there are any. The reason for
                 #using a variable instead of doing a check on every iteration of the x for loop is that computationally
@@ -626,42 +1071,60 @@ class TextEditor(utils.CursesUtils):
                     matched_text_indexes = None
                     matched_text_length = None
 
-                #Print line number. Since we're printing y + 1 we must also use y + 1 in the length calculation with the 
-                #logarithm. This also solves the problem with index 0 since 0 + 1 = 1.
-                line_number_text = " " * (line_display_width - (int(math.log10(y + 1)) + 1)) + str(y + 1)
-                self.stdscr.addstr(print_y, 0, line_number_text, self.get_colour(line_colour))
+                #Print line number, already padded by the layout. Rows that continue a wrapped line have no number.
+                if not self.soft_wrap or row_start == 0:
+                    self.stdscr.addstr(print_y, 0, self.layout.line_number(y), line_colour)
+                else:
+                    self.stdscr.addstr(print_y, 0, " " * line_display_width, line_colour)
+
+                #Print line. The text we want to print is the one between the start of the row and the end of the screen, in
+                #display columns. Only that part of the line is taken, so extremely long lines cost the same as short ones.
+                row_end = row_start + self.layout.max_text_width
+                visible_text = layout.render_columns(line, row_start, row_end, tabstop)
 
-                #Print line. The text we want to print is the one between the horizontal scroll and the end of the screen            
-                for x in range(self.horizontal_scroll_character, self.horizontal_scroll_character + self.max_text_width):
-                    #In case the text is shorter than the range of the for loop.
-                    if x > len(line.line_text) - 1:
-                        break
+                if visible_text != "":
+                    self.stdscr.addstr(print_y, line_display_width, visible_text, text_colour)
 
-                    char = line.line_text[x]
+                #Print the selected part of the row over the text. The end of a line that's selected is shown as a space, and so
+                #are the columns of a block that are past the end of the line.
+                if selection_range != None and selection_range[0] <= y <= selection_range[2]:
+                    first_y, first_x, last_y, last_x = selection_range
 
-                    self.stdscr.addstr(print_y, print_x, char, self.get_colour(text_colour))
+                    if self.selection.block:
+                        selection_start, selection_end = first_x, last_x
+                    else:
+                        selection_start = line.column_of(first_x, tabstop) if y == first_y else 0
+                        selection_end = line.column_of(last_x, tabstop) if y == last_y else line.display_width(tabstop) + 1
+
+                    selection_start = max(selection_start, row_start)
+                    selection_end = min(selection_end, row_end)
 
-                    #If the current line has matched text that has to be highlighted, and the current x char is on the correct
-                    #range highlight it by printing over the original white text.
-                    if matched_text_indexes != None and matched_text_length != None:
-                        #Get match and length for each occurrence.
-                        for match, length in zip(matched_text_indexes, matched_text_length):
-                            if x >= match and x < match + length:
-                                self.stdscr.addstr(print_y, print_x, char, self.get_colour(find_match_colour))
+                    if selection_start < selection_end:
+                        self.stdscr.addstr(print_y, line_display_width + selection_start - row_start, layout.render_columns(line, selection_start, selection_end, tabstop).ljust(selection_end - selection_start), selection_colour)
 
-                    print_x += 1
+                #If the current line has matched text that has to be highlighted, print the part of each match that's in the
+                #row over the original text.
+                if matched_text_indexes != None and matched_text_length != None:
+                    #Get match and length for each occurrence.
+                    for match, length in zip(matched_text_indexes, matched_text_length):
+                        match_start = max(line.column_of(match, tabstop), row_start)
+                        match_end = min(line.column_of(match + length, tabstop), row_end)
+
+                        if match_start < match_end:
+                            self.stdscr.addstr(print_y, line_display_width + match_start - row_start, layout.render_columns(line, match_start, match_end, tabstop), find_match_colour)
 
             #Print the cursor, it has to be printed after the text to appear over it.
-            if self.cursor_pos_y == y:
-                #Apart of taking the line display into account the horizontal scroll has to be subtracted, so in case it's
+            if self.cursor_pos_y == y and cursor_row_start == row_start:
+                #Apart of taking the line display into account the start of the row has to be subtracted, so in case it's
                 #not zero and the text is shifted the cursor will follow.
-                cursor_x_print_pos = self.cursor_pos_x + line_display_width - self.horizontal_scroll_character
+                cursor_x_print_pos = cursor_column + line_display_width - row_start
 
                 #Detect if you are in the last char or and react accordingly.
-                if self.cursor_pos_x == len(line.line_text):
-                    self.stdscr.addstr(print_y, cursor_x_print_pos, " ", self.get_colour(normal_cursor_colour))
+                if self.cursor_pos_x == len(line):
+                    self.stdscr.addstr(print_y, cursor_x_print_pos, " ", normal_cursor_colour)
                 else:
-                    self.stdscr.addstr(print_y, cursor_x_print_pos, line.line_text[self.cursor_pos_x], self.get_colour(over_text_cursor_colour))
+                    cursor_end_column = min(max(line.column_of(self.cursor_pos_x + 1, tabstop), cursor_column + 1), row_start + self.layout.max_text_width)
+                    self.stdscr.addstr(print_y, cursor_x_print_pos, layout.render_columns(line, cursor_column, cursor_end_column, tabstop), over_text_cursor_colour)
 
             print_y += 1
             
@@ -673,20 +1136,19 @@ class TextEditor(utils.CursesUtils):
         #The complete status bar.
         status_text = left_status_text + " " * (self.x_size - len(left_status_text) - len(right_status_text)) + right_status_text
 
-        #Note: In this case we directly access the dictionary instead of using a variable because this only occurs once per
-        #program loop.
         #Print the status bar.
-        self.stdscr.addstr(self.max_displayed_lines, 0, status_text, self.get_colour(self.config_file["STATUS-BAR"]["status-bar-colour"]))
+        self.stdscr.addstr(self.layout.status_bar_row, 0, status_text, self.attributes["status_bar_colour"])
 
         #If the editor prompt is enabled print it.
         if self.prompt.prompt_enabled:
-            self.stdscr.addstr(self.max_displayed_lines + 1, 0, self.prompt.prompt, self.get_colour(self.config_file["EDITOR-COLOUR"]["prompt-colour"]))
+            self.stdscr.addstr(self.layout.prompt_row, 0, self.prompt.prompt, self.attributes["prompt_colour"])
 
 
-    #Creates the status-bar based on the style in the configuration file.
-    def build_statusbar(self) -> None:
+    #Creates the status-bar based on the style in the configuration file. The style was already parsed and validated when the
+    #configuration was loaded.
+    def build_statusbar(self) -> tuple[str, str]:
         #If there's nothing for the style return empty strings.
-        if self.config_file["STATUS-BAR"]["status-bar-style"] == None:
+        if self.config.status_bar_template == ():
             return "", ""
 
         #Whether we add elements to the left or right status text
@@ -699,26 +1161,25 @@ class TextEditor(utils.CursesUtils):
         #Automatically determines what the displayed filename should be, depending on whether or not a name has been given.
         filename_text = self.file if self.file != None else "[No filename]"
         line_text = str(len(self.text)) + " lines"
-        #Whether or not the file is "dirty", if it's been modified since loading or saving.
-        modified_text = " (modified)" if self.buffer_modification_counter > 0 else ""
+        #Whether or not the file is "dirty", if it's been modified since loading or saving. While it's being autosaved the
+        #file on disk isn't current yet either.
+        if self.autosave_job != None and self.autosave_job.buffer is self.buffers.current:
+            modified_text = " (autosaving)"
+        else:
+            modified_text = " (modified)" if self.buffer_modification_counter > 0 else ""
         #FPS meter it's mainly there for efficiency testing.
         fps_text = "FPS: " + str(self.fps_meter.fps_final_count)
         #The cursors position.
         cursor_text = str(self.cursor_pos_y + 1) + "," + str(self.cursor_pos_x + 1) + " "
         #Time, only displays hours and minutes, in 24 hs format.
-        current_time = datetime.datetime.now()
-        time_text = "{:02d}:{:02d}".format(current_time.hour, current_time.minute)
+        current_time = time.localtime()
+        time_text = "{:02d}:{:02d}".format(current_time.tm_hour, current_time.tm_min)
 
         #A dictionary containing all possible elements for the status bar.
         status_elements_dict = {"filename" : filename_text, "lines" : line_text, "modified" : modified_text, "fps" : fps_text, "cursor" : cursor_text, "time" : time_text}
 
-        #Isolates the added elements.
-        status_added_elements = re.findall("\w+", self.config_file["STATUS-BAR"]["status-bar-style"])
-        #Isolates the separators.
-        status_added_separators = re.findall("[-\\\/]", self.config_file["STATUS-BAR"]["status-bar-style"])
-
         #Create left and right status-bar.
-        for element, separator in zip(status_added_elements, status_added_separators):
+        for separator, element in self.config.status_bar_template:
             #The contents are used as a way to avoid repeating the switch check.
             contents = ""
 
@@ -726,21 +1187,11 @@ class TextEditor(utils.CursesUtils):
                 case "-":
                     contents += " - "
 
-                case "\\":
-                    pass
-
                 case "/":
                     switch_right = True
 
-                case _:
-                    raise Exception("Invalid separator in statusbar configuration!")
-
-            #Make sure the element exists and is valid.
-            try:
-                #Get proper value from dictionary.
-                contents += status_elements_dict[element]
-            except:
-                raise Exception("Invalid element, \"{}\" in statusbar configuration!".format(element))
+            #Get proper value from dictionary.
+            contents += status_elements_dict[element]
 
             #Check whether the element must be added to left or right status-bar.
             if switch_right:
@@ -760,32 +1211,46 @@ class TextEditor(utils.CursesUtils):
     """
     SAVE AND LOAD FUNCTIONS
     """
-    #Handles the calling of the actual save function.
-    def save_handler(self, filename: str = False) -> None:
+    #Handles the calling of the actual save function. The file can be given instead of asking for it.
+    def save_handler(self, filename: str = False, file: Union[str, None] = None) -> None:
+        #Only the lines read so far would be written, cutting the file short.
+        if self.buffers.current.loading:
+            self.prompt.change_prompt("The file is still loading, it can't be saved yet")
+            return
+
+        #The file the buffer was read from or last saved to, the one "disk_stat" belongs to.
+        disk_path = os.path.join(os.getcwd(), self.file) if self.file != None else None
+
         #To allow for entering a filename to load
         if filename:
-            #Disable editor prompt.
-            self.prompt.toggle_prompt()
-
             #Get the filename.
-            basic_input = utils.BasicInput(self, self.y_size - 1, 0, "Save file: ", self.get_colour(self.config_file["EDITOR-COLOUR"]["input-colour"]), self.get_colour(self.config_file["TEXT-COLOUR"]["normal-cursor-colour"]), self.get_colour(self.config_file["TEXT-COLOUR"]["over-text-cursor-colour"]))
-            #The "basic_input" method halts the program.
-            file = basic_input.basic_input()
-
-            #Re-enable editor prompt.
-            self.prompt.toggle_prompt()
+            file = self.get_input("Save file: ", "file")
 
             #In case the user pressed the escape key.
             if file == None:
                 return
 
-            #Otherwise set filename.
-            else:
-                self.file = file
+        #Otherwise set filename.
+        if file != None:
+            self.file = file
 
         #Get complete filepath.
         path = os.path.join(os.getcwd(), self.file)
 
+        #The file changed since it was read or saved, and the change hasn't been noticed yet, like when it's very recent or
+        #it's still being compared. Saving would silently overwrite it.
+        if path == disk_path and buffers.file_stat(path) != self.disk_stat:
+            answer = self.get_input("{} changed outside the editor, (o)verwrite it or (c)ancel? ".format(self.file))
+
+            if answer == None or answer.strip().lower()[:1] != "o":
+                #The change is checked right away, which offers to merge it, reload the file or keep your version.
+                if self.file_watcher != None:
+                    self.file_watcher.changed.set()
+                    self.next_file_check_time = 0
+
+                self.prompt.change_prompt("{} wasn't saved, it changed outside the editor".format(self.file))
+                return
+
         #Save the file in the given path.
         if self.save_file(path) == 0:
             #Change the prompt to display how many bytes have been written.
@@ -794,24 +1259,41 @@ class TextEditor(utils.CursesUtils):
             self.prompt.change_prompt("Failed to save file, please try again")
 
 
-    #Saves the current file to the given path, returns false if it was successful.
+    #Saves the current file to the given path, returns false if it was successful. Compressed files stay compressed, see
+    #"compressed_files.py".
     def save_file(self, path: str) -> bool:
+        import compressed_files
+
+        #An autosave finishing after this would overwrite the file with an older version.
+        self.finish_autosave(True)
         file_text = ""
 
         try:
-            #Put all lines in one variable, separated by newlines.
-            for line in self.text:
-                file_text += line.line_text
-                #Separate lines
-                file_text += "\n"
+            codec = compressed_files.save_codec(path)
+
+            if codec != None:
+                compressed_files.write_compressed(path, codec, self.text)
+            else:
+                #Put all lines in one variable, separated by newlines.
+                for line in self.text:
+                    file_text += line.line_text
+                    #Separate lines
+                    file_text += "\n"
 
-            #Write to the file.
-            file = open(path, "w")
-            file.write(file_text)
-            file.close()
+                #Write to the file.
+                file = open(path, "w")
+                file.write(file_text)
+                file.close()
 
             #Reset the modification counter.
             self.buffer_modification_counter = 0
+            self.disk_text = buffers.snapshot_text(self.text)[0]
+            self.disk_stat = buffers.file_stat(path)
+
+            #The changes are saved, so the journal isn't needed anymore.
+            if self.journal != None:
+                self.journal.close()
+                self.journal = None
 
             return False
 
@@ -820,62 +1302,59 @@ class TextEditor(utils.CursesUtils):
             return True
 
 
-    #Handles the calling of the actual load function.
+    #Opens the given file in a new buffer and switches to it, the file is read in the background. If the file is already open
+    #the editor simply switches to it's buffer.
     def load_handler(self, file: str = None) -> None:
         if file == None:
-            #Disable editor prompt.
-            self.prompt.toggle_prompt()
-
-            basic_input = utils.BasicInput(self, self.y_size - 1, 0, "Open file: ", self.get_colour(self.config_file["EDITOR-COLOUR"]["input-colour"]), self.get_colour(self.config_file["TEXT-COLOUR"]["normal-cursor-colour"]), self.get_colour(self.config_file["TEXT-COLOUR"]["over-text-cursor-colour"]))
-            #The "basic_input" method halts the program.
-            file = basic_input.basic_input()
-
-            #Re-enable editor prompt.
-            self.prompt.toggle_prompt()
+            file = self.get_input("Open file: ", "file")
 
             #If the "file" is still "None" that means that the escape key was pressed.
             if file == None:
                 return
 
-        #Save the file the user is currently working on. If it has a name.
-        if self.file != None:
-            self.save_file(os.path.join(os.getcwd(), self.file))
-
         #Get complete filepath.
         path = os.path.join(os.getcwd(), file)
 
         #Make sure the path we are trying to read exists.
-        if os.path.lexists(path):
-            #Open the file in the given path.
-            if self.load_file(path) == 0:
-                #If the file could be opened set the filename.
-                self.file = file
-                #Change the prompt to display how many bytes have been red.
-                self.prompt.change_prompt("Loaded {} bytes from {}".format(str(os.path.getsize(path)), self.file))
-            else:
-                self.prompt.change_prompt("Failed to read file, please try again")
+        if not os.path.lexists(path):
+            self.prompt.change_prompt("The entered file doesn't exist")
+            return
 
-            #Reset the cursor position, so it's at the begging of the file.
-            self.cursor_pos_y = 0
-            self.cursor_pos_x = 0
+        open_index = self.buffers.find(file)
+
+        if open_index != None:
+            self.switch_buffer(open_index)
+            return
+
+        self.store_buffer_state()
 
+        #An untouched, unnamed buffer is reused instead of keeping it around.
+        if self.buffers.current.is_blank():
+            buffer = self.buffers.current
         else:
-            self.prompt.change_prompt("The entered file doesn't exist")    
+            buffer = buffers.Buffer()
+            self.buffers.select(self.buffers.add(buffer))
 
+        buffer.file = file
+        buffer.start_loading(path)
+        self.restore_buffer_state()
+        self.buffers.trim_idle(self.config.idle_buffer_line_budget)
 
-    #Loads the file in the given path, returns false if it was successful.
-    def load_file(self, path: str) -> bool:
-        try:
-            #Empty the text only if the file we are trying to read exists.
-            self.text = []
+        self.prompt.change_prompt("Loading {}...".format(file))
 
-            file = open(path, "r")
 
-            for line in file.readlines():
-                line = line.replace("\n", "")
-                self.text.append(Line(line))
+    #Loads the file in the given path, returns false if it was successful. Unlike "load_handler" the whole file is read before
+    #returning, into the current buffer.
+    def load_file(self, path: str) -> bool:
+        try:
+            text = buffers.new_text()
+            buffers.load_lines(path, text)
 
-            file.close()
+            #The text is only replaced if the whole file could be read.
+            self.text = text
+            self.wrap_index.invalidate()
+            self.disk_text = buffers.snapshot_text(text)[0]
+            self.disk_stat = buffers.file_stat(path)
 
             #Reset the cursor so it starts at the beginning of the file.
             self.cursor_pos_y = 0
@@ -891,48 +1370,678 @@ class TextEditor(utils.CursesUtils):
             return True
 
 
+    #If the current file has a recovery journal, offers to recover the unsaved changes in it. If the user accepts, the
+    #recovered text replaces the buffer and the journal is kept, with the new changes added to it. Otherwise it's deleted. It's
+    #called once the file is read, at startup or once it's buffer finishes loading.
+    def recovery_handler(self) -> None:
+        import journal
+
+        path = os.path.join(os.getcwd(), self.file)
+        journal_path = journal.journal_path(path)
+
+        if not os.path.exists(journal_path):
+            return
+
+        answer = self.get_input("Unsaved changes to {} were found, recover them? (y/n): ".format(self.file))
+        #The key that answered mustn't reach the editor.
+        self.key = -1
+
+        if answer == None or answer.strip().lower() not in ("y", "yes"):
+            try:
+                os.remove(journal_path)
+            except OSError:
+                pass
+
+            return
+
+        try:
+            header, operations = journal.read_journal(journal_path)
+            lines = journal.recover_lines(header, operations, path)
+        except (ValueError, OSError) as e:
+            self.prompt.change_prompt("Couldn't recover the unsaved changes: {}".format(e))
+            return
+
+        self.text = buffers.new_text([Line(line) for line in lines])
+        self.wrap_index.invalidate()
+        self.buffer_modification_counter = max(len(operations), 1)
+        self.journal = journal.RecoveryJournal(path, self.file, resume=True)
+
+        self.prompt.change_prompt("Recovered the unsaved changes to {}".format(self.file))
+
+
+    #Starts autosaving the current buffer if it has unsaved changes and the user stopped typing for long enough, or made
+    #enough modifications, see the configuration file. Only one autosave runs at a time.
+    def autosave_handler(self) -> None:
+        self.finish_autosave()
+
+        if self.autosave_job != None or self.headless or self.file == None or self.buffer_modification_counter == 0:
+            return
+
+        if self.buffers.current.loading or time.monotonic() < self.autosave_retry_time:
+            return
+
+        #A change made outside the editor is handled first, by merging it, reloading the file or keeping your version, see
+        #"file_change_handler". Autosaving would overwrite it.
+        if self.file_change_job != None or (self.file_watcher != None and self.file_watcher.changed.is_set()):
+            return
+
+        idle_seconds = self.config.autosave_idle_seconds
+        modification_count = self.config.autosave_modification_count
+
+        if (idle_seconds > 0 and time.monotonic() - self.last_modification_time >= idle_seconds) or (modification_count > 0 and self.buffer_modification_counter >= modification_count):
+            import autosave
+
+            path = os.path.join(os.getcwd(), self.file)
+
+            #The watcher hasn't noticed the change yet, it's checked right away instead.
+            if buffers.file_stat(path) != self.disk_stat:
+                if self.file_watcher != None:
+                    self.file_watcher.changed.set()
+                    self.next_file_check_time = 0
+
+                return
+
+            self.autosave_job = autosave.AutosaveJob(self.buffers.current, path, self.text, self.buffer_modification_counter, self.disk_stat)
+
+
+    #Handles a finished autosave, if there's one. If "wait" is True the autosave is waited for if it's still running. The
+    #modifications in the snapshot are saved, so only the ones made while it was written are left.
+    def finish_autosave(self, wait: bool = False) -> None:
+        job = self.autosave_job
+
+        if job == None or not (wait or job.done.is_set()):
+            return
+
+        job.done.wait()
+        self.autosave_job = None
+
+        #The file changed while the snapshot was written, so it was left as it was and the change is checked right away.
+        if job.file_changed:
+            if job.buffer is self.buffers.current and self.file_watcher != None:
+                self.file_watcher.changed.set()
+                self.next_file_check_time = 0
+
+            return
+
+        if job.failed:
+            import autosave
+
+            self.autosave_retry_time = time.monotonic() + autosave.RETRY_INTERVAL
+            self.prompt.change_prompt("Autosave failed, trying again in {} seconds".format(autosave.RETRY_INTERVAL))
+            return
+
+        #The editor's variables are the current buffer's, see "BUFFER_STATE".
+        state = self if job.buffer is self.buffers.current else job.buffer
+        state.buffer_modification_counter = max(state.buffer_modification_counter - job.modification_count, 0)
+        state.disk_text = job.text
+        state.disk_stat = job.stat
+
+        #The journal belongs to the old file.
+        if state.journal != None:
+            import journal
+
+            state.journal.close()
+            state.journal = None
+
+            if state.buffer_modification_counter > 0 and job.operations != []:
+                try:
+                    state.journal = journal.RecoveryJournal(job.path, state.file)
+                except OSError:
+                    self.prompt.change_prompt("Can't write the recovery journal, unsaved changes won't be recoverable")
+                else:
+                    for operation in job.operations:
+                        state.journal.record(operation)
+
+
+    #Checks whether the file of the current buffer was changed by another program, if the watcher noticed something, and
+    #compares it with the buffer in the background. Nothing is checked while the buffer is being loaded or autosaved.
+    def file_change_handler(self) -> None:
+        import file_watcher
+
+        if self.file == None or self.headless:
+            if self.file_watcher != None:
+                self.file_watcher.stop()
+                self.file_watcher = None
+
+            return
+
+        path = os.path.join(os.getcwd(), self.file)
+
+        if self.file_watcher == None or self.file_watcher.path != path:
+            if self.file_watcher != None:
+                self.file_watcher.stop()
+
+            self.file_watcher = file_watcher.FileWatcher(path)
+            #The file might have changed while it wasn't watched, like while it's buffer wasn't the current one.
+            self.file_watcher.changed.set()
+
+        if self.file_change_job != None:
+            if self.file_change_job.done.is_set():
+                self.finish_file_change()
+
+            return
+
+        if not self.file_watcher.changed.is_set() or self.autosave_job != None or self.buffers.current.loading:
+            return
+
+        if time.monotonic() < self.next_file_check_time:
+            return
+
+        self.file_watcher.changed.clear()
+        self.next_file_check_time = time.monotonic() + file_watcher.CHECK_INTERVAL
+
+        if buffers.file_stat(path) == self.disk_stat:
+            return
+
+        #The text on disk is only needed to merge the changes with unsaved ones.
+        disk_text = self.disk_text if self.buffer_modification_counter > 0 else None
+        self.file_change_job = file_watcher.FileChangeJob(self.buffers.current, path, self.text, disk_text, self.buffer_modification_counter, self.disk_stat)
+
+
+    #Applies the result of comparing the changed file with the buffer. Without unsaved changes the buffer is updated to the
+    #file, otherwise the user chooses what to do.
+    def finish_file_change(self) -> None:
+        job = self.file_change_job
+        self.file_change_job = None
+
+        #The buffer changed while the file was compared, so the result is no longer valid. It's compared again.
+        if job.buffer is not self.buffers.current or job.modification_count != self.buffer_modification_counter or job.disk_stat != self.disk_stat:
+            self.file_watcher.changed.set()
+            return
+
+        if job.failed:
+            self.disk_stat = job.stat
+            self.disk_text = None
+            self.prompt.change_prompt("{} changed outside the editor, but it couldn't be read".format(self.file))
+            return
+
+        #The file was deleted, the buffer is now the only copy of the text.
+        if job.stat == None:
+            self.disk_stat = None
+            self.disk_text = None
+            self.buffer_modification_counter = max(self.buffer_modification_counter, 1)
+            self.restart_journal(1)
+            self.prompt.change_prompt("{} was deleted outside the editor".format(self.file))
+            return
+
+        if self.buffer_modification_counter == 0:
+            self.apply_file_hunks(job.reload_hunks)
+            self.disk_text = buffers.snapshot_text(self.text)[0]
+            self.disk_stat = job.stat
+            self.prompt.change_prompt("Reloaded {}, it changed outside the editor".format(self.file))
+            return
+
+        if job.merge_hunks != None:
+            answer = self.get_input("{} changed outside the editor, (m)erge, (r)eload or (k)eep your version? ".format(self.file))
+        else:
+            answer = self.get_input("{} changed outside the editor, (r)eload or (k)eep your version? ".format(self.file))
+
+        answer = answer.strip().lower()[:1] if answer != None else "k"
+
+        if answer == "r":
+            self.apply_file_hunks(job.reload_hunks)
+            self.buffer_modification_counter = 0
+            self.disk_text = buffers.snapshot_text(self.text)[0]
+            self.disk_stat = job.stat
+
+            if self.journal != None:
+                self.journal.close()
+                self.journal = None
+
+            self.prompt.change_prompt("Reloaded {}, the unsaved changes were discarded".format(self.file))
+            return
+
+        if answer == "m" and job.merge_hunks != None:
+            self.apply_file_hunks(job.merge_hunks)
+
+            if job.conflicts > 0:
+                self.prompt.change_prompt("Merged the changes to {}, {} conflicts are marked with \"<<<<<<<\"".format(self.file, job.conflicts))
+            else:
+                self.prompt.change_prompt("Merged the changes to {}".format(self.file))
+        else:
+            self.prompt.change_prompt("Kept your version of {}, saving will overwrite the changes on disk".format(self.file))
+
+        #Either way the buffer is still modified, but compared to the new file.
+        self.disk_text = job.new_lines
+        self.disk_stat = job.stat
+        self.restart_journal(len(job.new_lines))
+
+
+    #Replaces lines of the text with the ones from the file, given as "(y, removed, added lines)" hunks in order. The cursor,
+    #scroll and search results are moved along with the lines around them.
+    def apply_file_hunks(self, hunks: list[tuple[int, int, list]]) -> None:
+        #Starting from the end, the positions of the hunks before are still valid.
+        for y, removed, lines in reversed(hunks):
+            self.text[y:y + removed] = lines
+            self.text_changed(y, removed, len(lines), False)
+
+            self.cursor_pos_y = self.shifted_line(self.cursor_pos_y, y, removed, len(lines))
+            self.vertical_scroll_line = self.shifted_line(self.vertical_scroll_line, y, removed, len(lines))
+            self.shift_search_results(y, removed, len(lines))
+
+        #There must always be a line.
+        if self.text == []:
+            self.text.append(Line())
+            self.wrap_index.invalidate()
+
+        self.cursor_pos_y = min(self.cursor_pos_y, len(self.text) - 1)
+        self.cursor_pos_x = min(self.cursor_pos_x, len(self.text[self.cursor_pos_y]))
+        self.vertical_scroll_line = min(self.vertical_scroll_line, self.cursor_pos_y)
+        self.vertical_scroll_segment = 0
+
+
+    #Where a line ends up after lines "[y, y + removed)" are replaced by "added" lines. A line that was replaced stays at the
+    #same position in the new lines, or at the last one.
+    @staticmethod
+    def shifted_line(line: int, y: int, removed: int, added: int) -> int:
+        if line >= y + removed:
+            return line + added - removed
+
+        if line >= y:
+            return y + min(line - y, max(added - 1, 0))
+
+        return line
+
+
+    #Moves the search results after lines "[y, y + removed)" are replaced by "added" lines. The matches in the replaced lines
+    #are discarded.
+    def shift_search_results(self, y: int, removed: int, added: int) -> None:
+        results = self.find_results
+
+        if results.line_and_index == {}:
+            return
+
+        results.line_and_index = {line if line < y else line + added - removed : matches for line, matches in results.line_and_index.items() if not y <= line < y + removed}
+        results.line_match_length = {line if line < y else line + added - removed : lengths for line, lengths in results.line_match_length.items() if not y <= line < y + removed}
+        results.current_match_line = max(min(results.current_match_line, len(results.line_and_index) - 1), 0)
+
+        if results.line_and_index == {}:
+            results.find_enabled = False
+
+
+    #The journal starts from the file on disk, when the file changes outside the editor it's started again from the new file,
+    #which has "disk_line_count" lines, with the whole text as it's first change.
+    def restart_journal(self, disk_line_count: int) -> None:
+        if self.journal != None:
+            self.journal.close()
+            self.journal = None
+
+        if not self.journaling or self.buffer_modification_counter == 0:
+            return
+
+        import journal
+
+        try:
+            self.journal = journal.RecoveryJournal(os.path.join(os.getcwd(), self.file), self.file)
+        except OSError:
+            self.prompt.change_prompt("Can't write the recovery journal, unsaved changes won't be recoverable")
+            return
+
+        self.journal.record((0, disk_line_count, [line.line_text for line in self.text]))
+
+
+    """
+    BUFFER FUNCTIONS
+    """
+    #Stores the editor's variables in the current buffer, see "buffers.BUFFER_STATE".
+    def store_buffer_state(self) -> None:
+        buffer = self.buffers.current
+
+        for variable in buffers.BUFFER_STATE:
+            setattr(buffer, variable, getattr(self, variable))
+
+
+    #Makes the current buffer's variables the editor's variables.
+    def restore_buffer_state(self) -> None:
+        buffer = self.buffers.current
+
+        for variable in buffers.BUFFER_STATE:
+            setattr(self, variable, getattr(buffer, variable))
+
+        #The index belongs to the old text.
+        self.wrap_index.invalidate()
+
+
+    #Switches to the buffer at the given index. If it's text was dropped to save memory it's read back from the file. After
+    #switching, idle buffers are trimmed to the configured memory budget.
+    def switch_buffer(self, index: int) -> None:
+        self.store_buffer_state()
+        buffer = self.buffers.select(index)
+
+        if buffer.ensure_loaded():
+            self.prompt.change_prompt("Failed to read {} again, the buffer is empty".format(buffer.file))
+
+        self.restore_buffer_state()
+        self.buffers.trim_idle(self.config.idle_buffer_line_budget)
+
+
+    #Closes the buffer at the given index. Unless "force" is True a buffer with unsaved changes isn't closed.
+    def close_buffer(self, index: int, force: bool = False) -> None:
+        self.finish_autosave(True)
+        self.store_buffer_state()
+        buffer = self.buffers.buffers[index]
+
+        if buffer.buffer_modification_counter > 0 and not force:
+            self.prompt.change_prompt("Unsaved changes, use \"bdf\" to close without saving")
+            return
+
+        if buffer.journal != None:
+            buffer.journal.close()
+
+        self.buffers.remove(index)
+        self.buffers.select(self.buffers.current_index)
+
+        if self.buffers.current.ensure_loaded():
+            self.prompt.change_prompt("Failed to read {} again, the buffer is empty".format(self.buffers.current.file))
+
+        self.restore_buffer_state()
+
+
+    #Returns a one line list of the open buffers, the current one is marked with "%" and modified ones with "+".
+    def list_buffers(self) -> str:
+        self.store_buffer_state()
+        entries = []
+
+        for index, buffer in enumerate(self.buffers.buffers):
+            marks = ("%" if index == self.buffers.current_index else "") + ("+" if buffer.buffer_modification_counter > 0 else "")
+            entries.append("{}{} {}".format(index + 1, marks, buffer.file if buffer.file != None else "[No filename]"))
+
+        return "Buffers: " + " | ".join(entries)
+
+
+    #How many buffers have unsaved changes.
+    def unsaved_buffers(self) -> int:
+        self.store_buffer_state()
+
+        return sum(1 for buffer in self.buffers.buffers if buffer.buffer_modification_counter > 0)
+
+
+    #Tells the user once the current buffer finishes loading.
+    def buffer_load_handler(self) -> None:
+        buffer = self.buffers.current
+
+        if buffer.load_reported or buffer.loading:
+            return
+
+        buffer.load_reported = True
+
+        if buffer.load_failed:
+            self.prompt.change_prompt("Failed to read file, please try again")
+        else:
+            self.disk_text = buffers.snapshot_text(self.text)[0]
+            self.prompt.change_prompt("Loaded {} lines from {}".format(len(self.text), self.file))
+
+            if self.journaling:
+                self.recovery_handler()
+
+
+    """
+    SELECTION AND REGISTER FUNCTIONS
+    """
+    #Moves the cursor with the given movement, selecting the text it moves over. See "clipboard.py".
+    def select(self, move: Callable) -> None:
+        if self.selection == None:
+            self.selection = clipboard.Selection(self.cursor_pos_y, self.cursor_pos_x)
+
+        move()
+
+
+    #Starts a selection at the cursor that moving the cursor extends, or cancels the current selection.
+    def mark_handler(self) -> None:
+        if self.selection != None:
+            self.selection = None
+            self.prompt.change_prompt("Selection cancelled")
+        else:
+            self.selection = clipboard.Selection(self.cursor_pos_y, self.cursor_pos_x, marked=True)
+            self.prompt.change_prompt("Mark set")
+
+
+    #Switches the selection between block mode and normal mode. Without a selection a block selection starts at the cursor.
+    def block_selection_handler(self) -> None:
+        if self.selection == None:
+            self.selection = clipboard.Selection(self.cursor_pos_y, self.cursor_pos_x, True, True)
+        else:
+            self.selection.block = not self.selection.block
+
+        self.prompt.change_prompt("Block selection" if self.selection.block else "Normal selection")
+
+
+    #Returns the selection as "(first_y, first_x, last_y, last_x)", the first position before the last, or "None" if there's no
+    #selection. In block mode "first_x" and "last_x" are the display columns of the sides of the rectangle instead. The mark is
+    #kept inside of the text, in daemon mode other sessions can change it.
+    def selection_range(self) -> Union[tuple[int, int, int, int], None]:
+        if self.selection == None:
+            return None
+
+        mark_y = min(self.selection.mark_y, len(self.text) - 1)
+        mark_x = min(self.selection.mark_x, len(self.text[mark_y]))
+
+        if self.selection.block:
+            first_x, last_x = sorted((self.text[mark_y].column_of(mark_x, self.config.tabstop_width), self.cursor_column()))
+            return min(mark_y, self.cursor_pos_y), first_x, max(mark_y, self.cursor_pos_y), last_x
+
+        (first_y, first_x), (last_y, last_x) = sorted([(mark_y, mark_x), (self.cursor_pos_y, self.cursor_pos_x)])
+
+        return first_y, first_x, last_y, last_x
+
+
+    #Copies the selection to the given register, and if "cut" is True removes it from the text. The lines between the first
+    #and the last aren't copied, they are shared by the register and the text, see "clipboard.py".
+    def copy_handler(self, register: str, cut: bool = False) -> None:
+        if cut and self.buffers.current.loading:
+            self.prompt.change_prompt("The file is still loading, it can't be modified yet")
+            return
+
+        selection_range = self.selection_range()
+
+        if selection_range == None or selection_range[1] == selection_range[3] and (self.selection.block or selection_range[0] == selection_range[2]):
+            self.prompt.change_prompt("Nothing is selected")
+            return
+
+        first_y, first_x, last_y, last_x = selection_range
+        block = self.selection.block
+
+        if block:
+            lines = clipboard.copy_block(self.text, first_y, last_y, first_x, last_x, self.config.tabstop_width)
+        else:
+            lines = clipboard.copy_text(self.text, first_y, first_x, last_y, last_x)
+
+        self.registers[register] = clipboard.Register(lines, block)
+        self.selection = None
+
+        if not cut:
+            self.prompt.change_prompt("Copied {} lines to register {}".format(len(lines), register))
+            return
+
+        if block:
+            self.delete_block(first_y, last_y, first_x, last_x)
+        else:
+            self.delete_text(first_y, first_x, last_y, last_x)
+
+        self.vertical_scroll_line = min(self.vertical_scroll_line, self.cursor_pos_y)
+        self.vertical_scroll_segment = 0
+
+        #Disables find function and increments buffer modification counter.
+        self.modification_handler()
+
+        self.prompt.change_prompt("Cut {} lines to register {}".format(len(lines), register))
+
+
+    #Removes the text from "(first_y, first_x)" to "(last_y, last_x)". The lines after the first one are removed at once, as a
+    #single change. The cursor goes where the text was.
+    def delete_text(self, first_y: int, first_x: int, last_y: int, last_x: int) -> None:
+        line = self.editable_line(first_y)
+
+        if first_y == last_y:
+            line.delete(first_x, last_x - first_x)
+            self.text_changed(first_y, 1, 1, edits=[(first_x, last_x - first_x, "")])
+        else:
+            last_line = self.text[last_y]
+            line.delete(first_x, len(line) - first_x)
+            line.append(Line(last_line.slice(last_x, len(last_line))))
+            self.text[first_y + 1:last_y + 1] = []
+            self.text_changed(first_y, last_y - first_y + 1, 1)
+
+        self.cursor_pos_y = first_y
+        self.cursor_pos_x = first_x
+        self.desired_cursor_x_pos = self.cursor_pos_x
+
+
+    #Removes the display columns "[first_column, last_column)" of lines "[first_y, last_y]". The cursor goes to the top left
+    #corner of the block.
+    def delete_block(self, first_y: int, last_y: int, first_column: int, last_column: int) -> None:
+        tabstop = self.config.tabstop_width
+
+        edits = []
+
+        for y in range(first_y, last_y + 1):
+            start = self.text[y].index_at_column(first_column, tabstop)
+            end = self.text[y].index_at_column(last_column, tabstop)
+
+            if start < end:
+                self.editable_line(y).delete(start, end - start)
+
+            edits.append((start, max(end - start, 0), ""))
+
+        self.text_changed(first_y, last_y - first_y + 1, last_y - first_y + 1, edits=edits)
+
+        self.cursor_pos_y = first_y
+        self.cursor_pos_x = self.text[first_y].index_at_column(first_column, tabstop)
+        self.desired_cursor_x_pos = self.cursor_pos_x
+
+
+    #Inserts the given register at the cursor. A block is inserted as a rectangle, at the cursor's column in the lines from
+    #the cursor down.
+    def paste_handler(self, register: str) -> None:
+        if self.buffers.current.loading:
+            self.prompt.change_prompt("The file is still loading, it can't be modified yet")
+            return
+
+        if register not in self.registers:
+            self.prompt.change_prompt("Register {} is empty".format(register))
+            return
+
+        contents = self.registers[register]
+
+        if contents.block:
+            self.paste_block(contents.lines)
+        else:
+            self.paste_text(contents.lines)
+
+        #Disables find function and increments buffer modification counter.
+        self.modification_handler()
+
+        self.prompt.change_prompt("Pasted {} lines from register {}".format(len(contents), register))
+
+
+    #Inserts the lines at the cursor, the text after the cursor ends up after the last one. The lines between the first and the
+    #last are inserted at once, as a single change, and shared with the register instead of copied. The cursor goes to the end
+    #of the pasted text.
+    def paste_text(self, lines: list) -> None:
+        y = self.cursor_pos_y
+        line = self.editable_line(y)
+
+        if len(lines) == 1:
+            line.insert(self.cursor_pos_x, lines[0].line_text)
+            self.text_changed(y, 1, 1, edits=[(self.cursor_pos_x, 0, lines[0].line_text)])
+            self.cursor_pos_x += len(lines[0])
+        else:
+            last_line = lines[-1].copy()
+            last_line.append(line.split(self.cursor_pos_x))
+            line.append(lines[0])
+
+            self.text[y + 1:y + 1] = buffers.share_lines(lines, 1, len(lines) - 1)
+            self.text.insert(y + len(lines) - 1, last_line)
+            self.text_changed(y, 1, len(lines))
+
+            self.cursor_pos_y = y + len(lines) - 1
+            self.cursor_pos_x = len(lines[-1])
+
+        self.desired_cursor_x_pos = self.cursor_pos_x
+
+
+    #Inserts every line of a block at the cursor's column, in the lines from the cursor down. Lines shorter than the column are
+    #filled with spaces, and lines are added at the end of the text if the block doesn't fit. The cursor stays where it is.
+    def paste_block(self, lines: list) -> None:
+        y = self.cursor_pos_y
+        column = self.cursor_column()
+        tabstop = self.config.tabstop_width
+        added = max(y + len(lines) - len(self.text), 0)
+
+        #The lines added at the end are a change of their own, so the block is inserted into as many lines as it replaces.
+        if added > 0:
+            self.text.extend([Line() for i in range(added)])
+            self.text_changed(len(self.text) - added, 0, added)
+
+        edits = []
+
+        for offset, block_line in enumerate(lines):
+            line = self.editable_line(y + offset)
+            width = line.display_width(tabstop)
+
+            #Lines shorter than the column are filled up to it.
+            if width < column:
+                x, inserted = len(line), " " * (column - width) + block_line.line_text
+            else:
+                x, inserted = line.index_at_column(column, tabstop), block_line.line_text
+
+            line.insert(x, inserted)
+            edits.append((x, 0, inserted))
+
+        self.text_changed(y, len(lines), len(lines), edits=edits)
+
+
+    #Lists the registers that have something, with the number of lines in each.
+    def list_registers(self) -> str:
+        if self.registers == {}:
+            return "The registers are empty"
+
+        return ", ".join("{}: {} lines{}".format(name, len(register), " (block)" if register.block else "") for name, register in sorted(self.registers.items()))
+
+
     """
     SEARCH FUNCTIONS
     """
+    #The pattern is searched as it's typed in the prompt, see "incremental_search.py".
     def find_handler(self, pattern: str = None) -> None:
-        if pattern == None:
-            #Disable editor prompt.
-            self.prompt.toggle_prompt()
+        import incremental_search
+
+        search = None
 
+        if pattern == None:
             #Get the text to search, supports regular expressions.
-            basic_input = utils.BasicInput(self, self.y_size - 1, 0, "Find: ", self.get_colour(self.config_file["EDITOR-COLOUR"]["input-colour"]), self.get_colour(self.config_file["TEXT-COLOUR"]["normal-cursor-colour"]), self.get_colour(self.config_file["TEXT-COLOUR"]["over-text-cursor-colour"]))
-            #The "basic_input" method halts the program.
-            pattern_to_find = basic_input.basic_input()
+            search = incremental_search.IncrementalSearch(self)
+            pattern_to_find = self.get_input("Find: ", "find", search)
 
-            #Re-enable editor prompt.
-            self.prompt.toggle_prompt()
+            #Cancelled, the matches shown while typing are removed.
+            if pattern_to_find == None:
+                search.cancel()
+                return
         else:
             #If a pattern was given assign it to the proper variable.
             pattern_to_find = pattern
 
-        #Remove any previous matched text.
-        self.find_results.line_and_index = {}
-
-        #Used to display how many matches were found using the prompt. It's more efficient to simply have a counter
-        #than accessing a dictionary.
-        match_counter = 0
-
-        #Gets every match in a line and puts it in an array. Then that array is added to the dictionary using the line
-        #as it's key.
-        for y in range(0, len(self.text)):
-            line_matches = []
-            matches_length = []
-                    
-            for match in re.finditer(pattern_to_find, self.text[y].line_text):
-                line_matches.append(match.start(0))
-                #Gets the length of the match by subtracting it's start index to it's end index.
-                matches_length.append(match.end(0) - match.start(0))
-
-            if line_matches != []:
-                self.find_results.line_and_index[y] = line_matches
-                self.find_results.line_match_length[y] = matches_length
-                #Add the lines matches to the counter.
-                match_counter += len(line_matches)
+        compiled_pattern = incremental_search.compile_pattern(pattern_to_find)
+
+        if compiled_pattern == None:
+            if search != None:
+                search.cancel()
+
+            self.prompt.change_prompt("Invalid pattern \"{}\"".format(pattern_to_find))
+            return
+
+        #The matches of the prompt's search are used, they might already be found.
+        if search != None:
+            self.find_results = search.finish(pattern_to_find)
+        else:
+            self.find_results = SearchMatch()
+            incremental_search.search_lines(self.find_results, compiled_pattern, self.text)
+
+        #Search mode is only enabled if something was found.
+        self.find_results.find_enabled = False
+
+        #Used to display how many matches were found using the prompt.
+        match_counter = sum(len(line_matches) for line_matches in self.find_results.line_and_index.values())
 
         #Changes the prompt to show how many matches were found for the entered pattern.
         self.prompt.change_prompt("Found {} matches for \"{}\"".format(match_counter, pattern_to_find))
@@ -947,32 +2056,195 @@ class TextEditor(utils.CursesUtils):
             self.match_line_handler(0)
 
 
+    #Replaces every match of the pattern in the buffer with the replacement. Both support regular expressions, so the
+    #replacement can reference groups in the pattern.
+    def replace_handler(self, pattern: str, replacement: str) -> None:
+        if self.buffers.current.loading:
+            self.prompt.change_prompt("The file is still loading, it can't be modified yet")
+            return
+
+        try:
+            compiled_pattern = re.compile(pattern)
+        except re.error:
+            self.prompt.change_prompt("Invalid pattern \"{}\"".format(pattern))
+            return
+
+        replacement_counter = 0
+
+        for y, line in enumerate(self.text):
+            new_text, replacements = compiled_pattern.subn(replacement, line.line_text)
+
+            #Only lines that actually changed are modified.
+            if replacements > 0:
+                self.editable_line(y).line_text = new_text
+                replacement_counter += replacements
+                self.text_changed(y, 1, 1)
+
+        #The cursor might be past the end of it's line after the replacement.
+        self.cursor_pos_x = min(self.cursor_pos_x, len(self.text[self.cursor_pos_y]))
+        self.desired_cursor_x_pos = self.cursor_pos_x
+
+        if replacement_counter > 0:
+            #Disables find function and increments buffer modification counter.
+            self.modification_handler()
+
+        self.prompt.change_prompt("Replaced {} matches of \"{}\"".format(replacement_counter, pattern))
+
+
+    #Replaces lines "[first, last)" with the output of the given shell command, with the lines as it's input. The editor
+    #shows the progress while the command runs, it can be cancelled with the escape key. If the command fails or is
+    #cancelled the buffer isn't changed.
+    def filter_handler(self, first: int, last: int, command: str) -> None:
+        import external_filter
+
+        if self.buffers.current.loading:
+            self.prompt.change_prompt("The file is still loading, it can't be modified yet")
+            return
+
+        try:
+            job = external_filter.FilterJob(command, self.text[first:last])
+        except OSError as e:
+            self.prompt.change_prompt("Couldn't run \"{}\": {}".format(command, e))
+            return
+
+        #The text can only change while the command runs in a daemon session, but the screen is still drawn to show the progress.
+        text_version = self.text_version
+
+        while not self.wait_for_job(job.done, external_filter.REFRESH_INTERVAL):
+            if not self.interactive:
+                continue
+
+            self.prompt.change_prompt("Running \"{}\": {}/{} lines written, {} read, Esc to cancel".format(command, job.written_lines, last - first, len(job.output)))
+
+            self.stdscr.erase()
+            self.layout_handler()
+            self.scroll_handler()
+            self.print_screen()
+            self.stdscr.refresh()
+
+            if self.keymap.get(self.read_key()) == "cancel":
+                job.cancel()
+
+        if job.cancelled:
+            self.prompt.change_prompt("Cancelled \"{}\", the buffer wasn't changed".format(command))
+            return
+
+        if job.returncode != 0:
+            error = job.error_output.strip().split("\n")[-1] if job.error_output.strip() != "" else "no error message"
+            self.prompt.change_prompt("\"{}\" failed with exit status {}: {}".format(command, job.returncode, error))
+            return
+
+        #The lines the command was given might not be there anymore.
+        if self.text_version != text_version:
+            self.prompt.change_prompt("The buffer changed while \"{}\" ran, it's output was dropped".format(command))
+            return
+
+        #Every line is replaced at once.
+        self.text[first:last] = job.output
+
+        #There must always be a line.
+        if self.text == []:
+            self.text.append(Line())
+            self.text_changed(0, last - first, 1)
+        else:
+            self.text_changed(first, last - first, len(job.output))
+
+        self.cursor_pos_y = min(self.cursor_pos_y, len(self.text) - 1)
+        self.cursor_pos_x = min(self.cursor_pos_x, len(self.text[self.cursor_pos_y]))
+        self.desired_cursor_x_pos = self.cursor_pos_x
+        self.vertical_scroll_line = min(self.vertical_scroll_line, self.cursor_pos_y)
+        self.vertical_scroll_segment = 0
+
+        #Disables find function and increments buffer modification counter.
+        self.modification_handler()
+
+        self.prompt.change_prompt("Filtered {} lines through \"{}\", {} lines now".format(last - first, command, len(job.output)))
+
+
+    #Waits until the job is done or the timeout passes, returns whether it's done. A daemon session lets other sessions run
+    #meanwhile, see "daemon.SessionEditor".
+    def wait_for_job(self, done: threading.Event, timeout: float) -> bool:
+        return done.wait(timeout)
+
+
+    #Transforms lines "[first, last)" as a single change, see "line_transforms.py". "options" are the sort options, any of
+    #"n" for numeric sorting, "r" for reversed order and "k<column>" to sort by a whitespace separated column.
+    def transform_handler(self, transform: str, first: int, last: int, options: Union[str, None] = None) -> None:
+        import line_transforms
+
+        if self.buffers.current.loading:
+            self.prompt.change_prompt("The file is still loading, it can't be modified yet")
+            return
+
+        lines = self.text[first:last]
+
+        match transform:
+            case "sort":
+                column = re.search("k(\\d+)", options)
+                new_lines = line_transforms.sort_lines(lines, "n" in options, int(column.group(1)) if column else None, "r" in options, self.config.sort_line_budget)
+                message = "Sorted {} lines".format(len(lines))
+
+            case "uniq":
+                new_lines = line_transforms.unique_lines(lines)
+                message = "Removed {} duplicate lines".format(len(lines) - len(new_lines))
+
+            case "rev":
+                new_lines = lines[::-1]
+                message = "Reversed {} lines".format(len(lines))
+
+            case "trim":
+                new_lines, changed = line_transforms.trim_lines(lines)
+                message = "Trimmed trailing whitespace from {} lines".format(changed)
+
+        #Every line is replaced at once.
+        self.text[first:last] = new_lines
+        self.text_changed(first, last - first, len(new_lines))
+
+        self.cursor_pos_y = min(self.cursor_pos_y, len(self.text) - 1)
+        self.cursor_pos_x = min(self.cursor_pos_x, len(self.text[self.cursor_pos_y]))
+        self.desired_cursor_x_pos = self.cursor_pos_x
+        self.vertical_scroll_line = min(self.vertical_scroll_line, self.cursor_pos_y)
+        self.vertical_scroll_segment = 0
+
+        #Disables find function and increments buffer modification counter.
+        self.modification_handler()
+
+        self.prompt.change_prompt(message)
+
+
     """
     TOOL CONSOLE FUNCTIONS
     """
     #Handles the console and processes it's commands.
     def tool_console_handler(self) -> None:
-        #Disable editor prompt.
-        self.prompt.toggle_prompt()
-
         #Get the command.
-        basic_input = utils.BasicInput(self, self.y_size - 1, 0, "Command: ", self.get_colour(self.config_file["EDITOR-COLOUR"]["input-colour"]), self.get_colour(self.config_file["TEXT-COLOUR"]["normal-cursor-colour"]), self.get_colour(self.config_file["TEXT-COLOUR"]["over-text-cursor-colour"]))
-        #The "basic_input" method halts the program.
-        full_command = basic_input.basic_input()
-
-        #Re-enable editor prompt.
-        self.prompt.toggle_prompt()
+        full_command = self.get_input("Command: ", "command")
 
         #In case the user pressed the escape key.
         if full_command == None:
             return
 
+        self.run_command(full_command)
+
+
+    #Runs a single tool console command. It's separate from "tool_console_handler" so commands can also be run without a
+    #terminal, see "batch_edit.py".
+    def run_command(self, full_command: str) -> None:
+        #Nothing to run.
+        if full_command.split() == []:
+            return
+
         command_name = full_command.split()[0]
         command_arguments = full_command.split()[1:]
 
         match command_name:
             #Save and save as.
             case "s":
+                #Checked before the filename is changed, see "save_handler".
+                if self.buffers.current.loading:
+                    self.prompt.change_prompt("The file is still loading, it can't be saved yet")
+                    return
+
                 #No filename was given.
                 if len(command_arguments) == 0:
                     #If there's no filename given and no file then we cannot save.
@@ -980,7 +2252,7 @@ class TextEditor(utils.CursesUtils):
                         self.prompt.change_prompt("No filename specified, cannot save")
                         return
                     else:
-                        self.save_handler("Invalid argument type for save function")
+                        self.save_handler()
 
                 #A filename was given.
                 elif len(command_arguments) == 1:
@@ -989,8 +2261,7 @@ class TextEditor(utils.CursesUtils):
                         return 1
 
                     #If a name was given then set it as the filename.
-                    self.file = command_arguments[0]
-                    self.save_handler()
+                    self.save_handler(file=command_arguments[0])
                 else:
                     self.prompt.change_prompt("Too many arguments for save function")
                     return
@@ -1011,12 +2282,11 @@ class TextEditor(utils.CursesUtils):
                     return
 
                 #Check if there are unsaved changes.
-                if self.buffer_modification_counter > 0:
+                if self.unsaved_buffers() > 0:
                     self.prompt.change_prompt("Unsaved changes, use \"qf\" to quit without saving")
                 else:
                     #Exit editor.
-                    curses.endwin()
-                    quit()
+                    self.quit_editor()
 
             #Force exit.
             case "qf":
@@ -1025,8 +2295,7 @@ class TextEditor(utils.CursesUtils):
                     return
 
                 #Exit editor.
-                curses.endwin()
-                quit()
+                self.quit_editor()
 
             #Find.
             case "f":
@@ -1036,6 +2305,16 @@ class TextEditor(utils.CursesUtils):
 
                 self.find_handler(command_arguments[0])
 
+            #Toggle soft-wrap.
+            case "wrap":
+                #In case there are too many or to few arguments
+                if self.argument_count(command_arguments, [], "", "soft-wrap function"):
+                    return
+
+                self.soft_wrap = not self.soft_wrap
+                self.vertical_scroll_segment = 0
+                self.prompt.change_prompt("Soft-wrap {}".format("enabled" if self.soft_wrap else "disabled"))
+
             #Word count.
             case "wc":
                 #In case there are too many or to few arguments
@@ -1053,6 +2332,19 @@ class TextEditor(utils.CursesUtils):
                 #Show the count as a prompt
                 self.prompt.change_prompt("There are {} words".format(words))
 
+            #How the line blocks are doing, see "line_store.py".
+            case "mem":
+                if self.argument_count(command_arguments, [], "", "memory function"):
+                    return
+
+                import line_store
+
+                if line_store.cache.hot_line_budget == 0:
+                    self.prompt.change_prompt("Line blocks are disabled, set \"hot-line-budget\" in the configuration file")
+                    return
+
+                self.prompt.change_prompt(line_store.cache.report())
+
 
             case "j":
                 #In case there are too many or to few arguments
@@ -1075,11 +2367,123 @@ class TextEditor(utils.CursesUtils):
                 if self.argument_count(command_arguments, [str, str], "Please specify a pattern to search and it's replacement", "replace function"):
                     return
 
+                self.replace_handler(command_arguments[0], command_arguments[1])
+
+            #Cut, copy and paste the selection through a register, the default one if none is given, see "clipboard.py".
+            case "cut" | "copy" | "paste":
+                if len(command_arguments) == 0:
+                    command_arguments = [clipboard.DEFAULT_REGISTER]
+
+                if self.argument_count(command_arguments, [str], "", "{} function".format(command_name)):
+                    return
+
+                register = command_arguments[0]
+
+                if len(register) != 1 or register not in clipboard.REGISTER_NAMES + clipboard.DEFAULT_REGISTER:
+                    self.prompt.change_prompt("Invalid register \"{}\", registers are named with a lowercase letter".format(register))
+                    return
+
+                if command_name == "paste":
+                    self.paste_handler(register)
+                else:
+                    self.copy_handler(register, command_name == "cut")
+
+            #List registers.
+            case "reg":
+                if self.argument_count(command_arguments, [], "", "register list function"):
+                    return
+
+                self.prompt.change_prompt(self.list_registers())
+
+            #List buffers.
+            case "ls":
+                #In case there are too many or to few arguments
+                if self.argument_count(command_arguments, [], "", "buffer list function"):
+                    return
+
+                self.prompt.change_prompt(self.list_buffers())
+
+            #Switch buffer.
+            case "b":
+                #In case there are too many or to few arguments
+                if self.argument_count(command_arguments, [int], "No buffer number specified, cannot switch", "buffer function"):
+                    return
+
+                if int(command_arguments[0]) < 1 or int(command_arguments[0]) > len(self.buffers):
+                    self.prompt.change_prompt("Please enter a valid buffer number")
+                    return
+
+                self.switch_buffer(int(command_arguments[0]) - 1)
+
+            #Close buffer, and force close buffer.
+            case "bd" | "bdf":
+                #The current buffer is closed unless a number is given.
+                if len(command_arguments) == 0:
+                    command_arguments = [str(self.buffers.current_index + 1)]
+
+                if self.argument_count(command_arguments, [int], "", "buffer close function"):
+                    return
+
+                if int(command_arguments[0]) < 1 or int(command_arguments[0]) > len(self.buffers):
+                    self.prompt.change_prompt("Please enter a valid buffer number")
+                    return
+
+                self.close_buffer(int(command_arguments[0]) - 1, command_name == "bdf")
+
+            #Filter lines through a shell command.
+            case "!":
+                line_range, command_arguments = self.split_line_range(command_arguments)
+
+                if line_range == None:
+                    return
+
+                if command_arguments == []:
+                    self.prompt.change_prompt("No command specified, cannot filter")
+                    return
+
+                #The command is everything after the range, with it's own spacing.
+                command = full_command.split(None, len(full_command.split()) - len(command_arguments))[-1]
+                self.filter_handler(line_range[0], line_range[1], command)
+
+            #Sort, remove duplicates, reverse and trim a range of lines.
+            case "sort" | "uniq" | "rev" | "trim":
+                line_range, command_arguments = self.split_line_range(command_arguments)
+
+                if line_range == None:
+                    return
+
+                #Only sorting has options, see "transform_handler".
+                options = "".join(command_arguments) if command_name == "sort" else None
+
+                if command_name != "sort" and self.argument_count(command_arguments, [], "", "{} function".format(command_name)):
+                    return
+
+                if options != None and not re.fullmatch("([nr]|k[1-9]\\d*)*", options):
+                    self.prompt.change_prompt("Invalid sort options \"{}\"".format(options))
+                    return
+
+                self.transform_handler(command_name, line_range[0], line_range[1], options)
 
             case _:
                 self.prompt.change_prompt("Please enter a valid command!")
 
 
+    #Splits the optional line range, "<first>,<last>" starting from line 1, from the start of the arguments. Returns the range
+    #as "(first, last + 1)" indexes, which is the whole text if there's no range, and the rest of the arguments. The range is
+    #"None" if it's invalid, the user is told why.
+    def split_line_range(self, args: list[str]) -> tuple[Union[tuple[int, int], None], list[str]]:
+        if args == [] or not re.fullmatch("\\d+,\\d+", args[0]):
+            return (0, len(self.text)), args
+
+        first, last = (int(number) for number in args[0].split(","))
+
+        if first < 1 or last < first or last > len(self.text):
+            self.prompt.change_prompt("Please enter a valid line range")
+            return None, args[1:]
+
+        return (first - 1, last), args[1:]
+
+
     #Automatically checks if the number of arguments supplied is correct, along with their types. Returns false if so,
     #otherwise returns true.
     def argument_count(self, args: list[str], args_type: list[Union[int, str, bool, float]], under_text: str, over_text: str) -> bool:
@@ -1120,6 +2524,148 @@ class TextEditor(utils.CursesUtils):
 
 
 
-text_editor = TextEditor()
-text_editor.setup()
-text_editor.editor()
\ No newline at end of file
+#Parses the command line arguments. Exits showing the version or usage if required, or if the arguments are invalid. Returns
+#the options, as a dictionary using their long name as the key, and the remaining arguments.
+def parse_arguments(argv: list[str]) -> tuple[dict, list[str]]:
+    import getopt
+
+    #Short and long version of all options.
+    short_options = "vh"
+    long_options = ["version", "help", "record=", "replay=", "headless", "fast", "batch=", "jobs=", "startup-profile", "view", "follow", "daemon", "attach", "socket="]
+
+    version_text = "Text editor - Version 1.2 - January 2021\n"
+    usage_text = ("Usage: python {0} [-v/--version] | [-h/--help] | [--record <trace>] | [--replay <trace> [--headless] [--fast]] "
+        "[--startup-profile] <file>\n       python {0} --batch <script> [--jobs <processes>] <file>...\n       python {0} --view [--follow] <file>\n"
+        "       python {0} --daemon [--socket <path>]\n       python {0} --attach [--socket <path>] [<file>]\n".format(sys.argv[0]))
+
+    try:
+        options, arguments = getopt.getopt(argv, short_options, long_options)
+    except getopt.GetoptError:
+        raise SystemExit(usage_text)
+
+    parsed_options = {}
+
+    #Parse all the options.
+    for o, a in options:
+        if o in ("-v", "--version"):
+            raise SystemExit(version_text)
+        elif o in ("-h", "--help"):
+            raise SystemExit(usage_text)
+        #Trace paths are made absolute since replaying changes the working directory.
+        elif o in ("--record", "--replay"):
+            parsed_options[o] = os.path.abspath(a)
+        elif o in ("--headless", "--fast", "--batch", "--startup-profile", "--view", "--follow", "--daemon", "--attach"):
+            parsed_options[o] = a
+        #The daemon might be started from another directory.
+        elif o == "--socket":
+            parsed_options[o] = os.path.abspath(a)
+        elif o == "--jobs":
+            if not a.isdigit() or int(a) < 1:
+                raise SystemExit(usage_text)
+            parsed_options[o] = int(a)
+        else:
+            raise SystemExit(usage_text)
+
+    #Batch mode edits any number of files, but it can't be mixed with the other modes.
+    if "--batch" in parsed_options:
+        if len(parsed_options) > 2 or (len(parsed_options) == 2 and "--jobs" not in parsed_options) or len(arguments) == 0:
+            raise SystemExit(usage_text)
+
+        return parsed_options, arguments
+
+    if "--jobs" in parsed_options:
+        raise SystemExit(usage_text)
+
+    #View mode only shows an existing file, it can't be mixed with the other modes.
+    if "--view" in parsed_options:
+        if len(parsed_options) > 2 or (len(parsed_options) == 2 and "--follow" not in parsed_options) or len(arguments) != 1:
+            raise SystemExit(usage_text)
+
+        if not os.path.isfile(arguments[0]):
+            raise SystemExit("Can't view \"{}\", it isn't a file".format(arguments[0]))
+
+        #View mode reads the file directly from disk, a compressed file has to be opened in the editor.
+        import compressed_files
+
+        if compressed_files.detect_codec(arguments[0]) != None:
+            raise SystemExit("Can't view \"{}\", it's compressed, open it without \"--view\"".format(arguments[0]))
+
+        return parsed_options, arguments
+
+    if "--follow" in parsed_options:
+        raise SystemExit(usage_text)
+
+    #The daemon holds the files of the editors attached to it, see "daemon.py". Neither can be mixed with the other modes.
+    if "--daemon" in parsed_options or "--attach" in parsed_options:
+        if len(parsed_options) - ("--socket" in parsed_options) != 1 or len(arguments) > ("--attach" in parsed_options):
+            raise SystemExit(usage_text)
+
+        return parsed_options, arguments
+
+    if "--socket" in parsed_options:
+        raise SystemExit(usage_text)
+
+    #If more than one file was given as an argument show usage and exit.
+    if len(arguments) > 1:
+        raise SystemExit(usage_text)
+
+    #Running without a terminal and replaying at full speed only make sense when replaying.
+    if ("--headless" in parsed_options or "--fast" in parsed_options) and "--replay" not in parsed_options:
+        raise SystemExit(usage_text)
+
+    if "--record" in parsed_options and "--replay" in parsed_options:
+        raise SystemExit(usage_text)
+
+    return parsed_options, arguments
+
+
+
+if __name__ == "__main__":
+    options, arguments = parse_arguments(sys.argv[1:])
+
+    #Batch mode never initializes curses.
+    if "--batch" in options:
+        import batch_edit
+
+        raise SystemExit(batch_edit.run_batch(options["--batch"], arguments, options.get("--jobs")))
+
+    #View mode uses it's own pager instead of the editor, see "pager.py".
+    if "--view" in options:
+        import pager
+
+        file_pager = pager.Pager(arguments[0])
+        file_pager.setup("--follow" in options)
+        file_pager.pager()
+
+    #Daemon mode runs the editors of the clients attached to it, which only draw what it sends them.
+    if "--daemon" in options or "--attach" in options:
+        import daemon
+
+        socket_path = options.get("--socket", daemon.default_socket_path())
+
+        if "--daemon" in options:
+            daemon.EditorDaemon(socket_path).serve()
+            raise SystemExit()
+
+        client = daemon.DaemonClient(socket_path)
+        client.client(os.path.abspath(arguments[0]) if arguments != [] else None)
+
+    startup_profiler = None
+
+    if "--startup-profile" in options:
+        startup_profiler = StartupProfiler(IMPORT_START_TIME)
+        startup_profiler.mark("Imports", IMPORT_END_TIME)
+        startup_profiler.mark("Parse command line")
+
+    text_editor = TextEditor("--headless" in options)
+    text_editor.startup_profiler = startup_profiler
+
+    if startup_profiler != None:
+        startup_profiler.mark("Initialize curses")
+
+    text_editor.setup(options, arguments)
+
+    if "--replay" in options:
+        text_editor.replay_handler(options["--replay"], "--fast" not in options)
+    else:
+        text_editor.editor()
\ No newline at end of file
@@ -1,73 +1,191 @@
-import curses
+import keymap, curses, time
 from typing import final, Union, Callable, Iterable, Any, Type
 
 
 
+#Stands in for the curses screen when the editor runs without a terminal, for example when replaying a key trace. It accepts
+#the same calls as a curses window but draws nothing, it only checks that the coordinates are inside the "screen".
+class HeadlessScreen():
+    def __init__(self, y_size: int = 24, x_size: int = 80) -> None:
+        self.y_size = y_size
+        self.x_size = x_size
+
+
+    def getmaxyx(self) -> tuple[int, int]:
+        return self.y_size, self.x_size
+
+
+    def addstr(self, y_pos: int, x_pos: int, string: str, colour: int = 0) -> None:
+        #Behave like curses and complain about printing outside of the screen.
+        if y_pos < 0 or y_pos >= self.y_size or x_pos < 0 or x_pos >= self.x_size:
+            raise curses.error("addstr() returned ERR")
+
+
+    #There's never a key waiting, keys have to be supplied through "CursesUtils.key_source".
+    def getch(self) -> int:
+        return -1
+
+
+    def clear(self) -> None:
+        pass
+
+
+    def erase(self) -> None:
+        pass
+
+
+    def refresh(self) -> None:
+        pass
+
+
+    def nodelay(self, flag: bool) -> None:
+        pass
+
+
+    def timeout(self, delay: int) -> None:
+        pass
+
+
+    def move(self, y_pos: int, x_pos: int) -> None:
+        pass
+
+
+    def clrtoeol(self) -> None:
+        pass
+
+
+    def keypad(self, flag: bool) -> None:
+        pass
+
+
+
 #A class with functions to use with the curses library, the class that wishes to use the functions must inherit from this one.
+#If "headless" is True curses is never initialized and a "HeadlessScreen" is used instead.
 class CursesUtils():
-    def __init__(self) -> None:
-        self.stdscr = curses.initscr()
-
-        #Configure the console
-        curses.noecho()
-        curses.raw()
-        curses.curs_set(0)
-        curses.start_color()
-        self.stdscr.keypad(True)
+    def __init__(self, headless: bool = False) -> None:
+        self.headless = headless
+
+        #Where keys come from. If it's "None" keys are read from the screen, otherwise it has to be a function that returns the
+        #next key, it's used to feed recorded keys back into the editor.
+        self.key_source = None
+        #If set, every key read is passed to this function, which is used to record key traces.
+        self.key_recorder = None
+        #The action bound to every key code, see "keymap.py". Classes with a configuration build it from it.
+        self.keymap = keymap.build_keymap({})
+        #What was entered in the input prompts, a "prompt_history.PromptHistory". If it's "None" the prompts have no history.
+        self.prompt_history = None
+
+        if headless:
+            self.stdscr = HeadlessScreen()
+        else:
+            self.stdscr = curses.initscr()
+
+            #Configure the console
+            curses.noecho()
+            curses.raw()
+            curses.curs_set(0)
+            curses.start_color()
+            self.stdscr.keypad(True)
+            #Every frame is drawn from scratch, but curses only sends the terminal what changed since the last one. With "idlok"
+            #it also finds the rows that only moved up or down, like when scrolling, and scrolls them in the terminal instead
+            #of drawing them again, so only the rows that appear are drawn. A scroll bigger than the screen has no rows left
+            #to move, so it's drawn in full.
+            self.stdscr.idlok(True)
 
         #Clear and refresh the screen for a blank canvas.
         self.stdscr.clear()
         self.stdscr.refresh()
 
-        #Initialize console size variables.
-        self.y_size = 0
-        self.x_size = 0
-        self.get_size()
+        #Initialize console size variables. They are only updated when the console is resized, see "get_size".
+        self.y_size, self.x_size = self.stdscr.getmaxyx()
 
         #Colour variables.
         self.colour_reference = {"BLACK" : curses.COLOR_BLACK, "BLUE" : curses.COLOR_BLUE, "CYAN" : curses.COLOR_CYAN,
         "GREEN" : curses.COLOR_GREEN, "MAGENTA" : curses.COLOR_MAGENTA, "RED" : curses.COLOR_RED, "WHITE" : curses.COLOR_WHITE,
         "YELLOW" : curses.COLOR_YELLOW}
-        #Gets filled with a reference to each possible colour pair.
+        #Gets filled with the attribute of each colour pair as they are used, see "get_colour".
         self.colours = {}
 
-        self.generate_colours()
-
 
-    #Defines every possible colour pair(without attributes), and then relates their number with the corresponding name in the
+    #Defines the given colour pair(without attributes), and then relates it's attribute with the corresponding name in the
     #"self.colours" dictionary. The naming convention is: Foreground colour first and then the background colour, with an
-    #underscore separating both colours.
+    #underscore separating both colours. Pairs are only defined the first time they are used, instead of defining all 64 of
+    #them when the editor starts.
     @final
-    def generate_colours(self) -> None:
-        colour_cont = 1
-
-        for col_1 in self.colour_reference:
-            for col_2 in self.colour_reference:
-                #Create each colour's name.
-                key = str(col_1) + "_" + str(col_2)
+    def init_colour(self, colour: str) -> int:
+        foreground, background = colour.split("_")
 
-                curses.init_pair(colour_cont, self.colour_reference[col_1], self.colour_reference[col_2])
-                self.colours[key] = colour_cont
+        #Pair 0 is reserved by curses, so pairs are numbered from 1.
+        pair_number = len(self.colours) + 1
+        curses.init_pair(pair_number, self.colour_reference[foreground], self.colour_reference[background])
+        self.colours[colour] = curses.color_pair(pair_number)
 
-                colour_cont += 1
+        return self.colours[colour]
 
 
     #Simplifies using the colour dictionary. Allows the user to use "self.get_colour(colour)" instead of 
     #"curses.color_pair(self.colours[colour])" to select a colour pair.
     @final
     def get_colour(self, colour: str) -> int:
+        #There are no colours without a terminal.
+        if self.headless:
+            return 0
+
+        try:
+            return self.colours[colour]
+        except KeyError:
+            pass
+
         try:
-            return curses.color_pair(self.colours[colour])
+            return self.init_colour(colour)
         except:
-            #(-1) is the default value for a white foreground and black background.
-            return curses.color_pair(-1)
+            #(0) is the default value for a white foreground and black background.
+            return curses.color_pair(0)
 
 
-    #Gets the console size.
+    #Gets the console size. It's only called when curses reports the console was resized, see "read_key", instead of every
+    #frame. Frames are blanked with "erase", so curses only draws what changed, but after the console is resized it's cleared
+    #and drawn again completely.
     @final
     def get_size(self) -> None:
+        y_size, x_size = self.y_size, self.x_size
         self.y_size, self.x_size = self.stdscr.getmaxyx()
 
+        if (y_size, x_size) != (self.y_size, self.x_size):
+            self.stdscr.clear()
+            self.resize_handler()
+
+
+    #Called once every time the console size changes, to update everything that depends on it, like the layout.
+    def resize_handler(self) -> None:
+        pass
+
+
+    #Reads the next key, either from the screen or from the key source. Every key other than "no key"(-1) is passed to the
+    #key recorder, if there is one. When the console is resized curses catches the "SIGWINCH" signal and gives
+    #"KEY_RESIZE" as a key, the size is read then.
+    @final
+    def read_key(self) -> int:
+        if self.key_source != None:
+            key = self.key_source()
+        else:
+            key = self.stdscr.getch()
+
+        if self.key_recorder != None and key != -1:
+            self.key_recorder(key)
+
+        if key == curses.KEY_RESIZE:
+            self.get_size()
+
+        return key
+
+
+    #Restores the terminal to it's normal state, it's safe to call more than once and when running headless.
+    @final
+    def end_curses(self) -> None:
+        if not self.headless and not curses.isendwin():
+            curses.endwin()
+
 
     #Prints a centred string at the specified height. If "fill" is True then both sides of the printed text will be filled with
     #the character in "fill_char", using the provided colour.
@@ -108,7 +226,7 @@ class CursesUtils():
 #this type hint "class_ref: Type[CursesUtils] = CursesUtils", means that "class_ref" should be of type CursesUtils or one of
 #it's descendants.
 class BasicInput():
-    def __init__(self, class_ref: Type[CursesUtils], y_pos: int, x_pos: int, prompt: str, colour: int, cursor_colour: int, cursor_colour_over_text: int) -> None:
+    def __init__(self, class_ref: Type[CursesUtils], y_pos: int, x_pos: int, prompt: str, colour: int, cursor_colour: int, cursor_colour_over_text: int, history_name: Union[str, None] = None, listener: Any = None) -> None:
         #####ARGUMENTS#####
         #A reference to the class that called the function.
         self.class_ref = class_ref
@@ -123,40 +241,91 @@ class BasicInput():
         #The colour of the cursor.
         self.cursor_colour = cursor_colour
         self.cursor_colour_over_text = cursor_colour_over_text
+        #The prompt's entries in the history of the class that called the function, like "find" or "file". If it's "None"
+        #nothing is remembered.
+        self.history_name = history_name
+        #Told about every change of the text while it's typed, like "incremental_search.IncrementalSearch". It has to have
+        #"text_changed(text)", called after a key changes the text, "poll()", called after every key or after waiting
+        #"wait_time()" seconds for one, both returning whether the screen behind the prompt has to be drawn again.
+        self.listener = listener
 
         #####CLASS VARIABLES#####
         self.text = ""
         self.cursor_pos = 0
+        #The prompt stays at the same distance from the bottom of the console when it's resized.
+        self.rows_from_bottom = class_ref.y_size - y_pos
 
+        #####HISTORY#####
+        #The history entry being shown, or "None" when the text is the one being typed.
+        self.history_index = None
+        #The text typed before going through the history, only the entries starting with it are shown.
+        self.history_prefix = ""
 
-    def basic_input(self) -> None:
-        while True:
-            self.class_ref.stdscr.clear()
-            self.class_ref.get_size()
+        #The keys are the same as in the editor, see "keymap.py".
+        self.key_bindings = keymap.KeyBindings(class_ref.keymap, {"backspace" : self.delete_previous_char, "left" : self.cursor_left,
+            "right" : self.cursor_right, "line-start" : self.cursor_line_start, "line-end" : self.cursor_line_end,
+            "up" : self.history_previous, "down" : self.history_next})
 
-            self.detect_key()
-            #Detect the keys that can cause the program to return. Minus one is used as the default value because the class
-            #needs to be able to return "None".
-            returned_value = self.detect_return_key()
-            if returned_value != (-1):
-                return returned_value
 
-            self.display()
-            self.class_ref.print_screen()
+    #The screen behind the prompt is drawn once, when the prompt opens or the console is resized, after that only the prompt's
+    #row is drawn over it, and keys are waited for instead of polled.
+    def basic_input(self) -> Union[str, None]:
+        stdscr = self.class_ref.stdscr
+        redraw = True
 
-            self.class_ref.stdscr.refresh()
-            self.class_ref.key = self.class_ref.stdscr.getch()
+        try:
+            while True:
+                if redraw:
+                    self.y_pos = self.class_ref.y_size - self.rows_from_bottom
+
+                    stdscr.erase()
+                    self.class_ref.print_screen()
+                else:
+                    stdscr.move(self.y_pos, 0)
+                    stdscr.clrtoeol()
+
+                self.display()
+                stdscr.refresh()
+
+                #Curses takes the time to wait in milliseconds, "-1" waits until there's a key.
+                wait_time = self.listener.wait_time() if self.listener != None else None
+                stdscr.timeout(-1 if wait_time == None else int(wait_time * 1000))
+
+                previous_text = self.text
+                self.class_ref.key = self.class_ref.read_key()
+                self.detect_key()
+                #Detect the keys that can cause the program to return. Minus one is used as the default value because the
+                #class needs to be able to return "None".
+                returned_value = self.detect_return_key()
+                if returned_value != (-1):
+                    return returned_value
+
+                #"read_key" already updated the size and layout if the console was resized.
+                redraw = self.class_ref.key == curses.KEY_RESIZE
+
+                if self.listener != None:
+                    if self.text != previous_text:
+                        redraw = self.listener.text_changed(self.text)
+
+                    redraw = self.listener.poll() or redraw
+        finally:
+            stdscr.nodelay(True)
 
 
     #Keys that cause the program to return.
     def detect_return_key(self) -> int:
+        action = self.class_ref.keymap.get(self.class_ref.key)
+
         #Enter key. If pressed returns the entered text.
-        if self.class_ref.key == 10 or self.class_ref.key == 13 or self.class_ref.key == curses.KEY_ENTER:
+        if action == "enter":
             if self.text != "":
+                if self.history_name != None and self.class_ref.prompt_history != None:
+                    self.class_ref.prompt_history.add(self.history_name, self.text)
+
                 return self.text
 
         #Escape key.
-        elif self.class_ref.key == 27:
+        elif action == "cancel":
             return None
 
         #Some weird error occurred, return appropriately.
@@ -164,7 +333,18 @@ class BasicInput():
 
 
     def detect_key(self) -> None:
-        if self.class_ref.key >= 32 and self.class_ref.key <= 253:
+        binding = self.key_bindings.get(self.class_ref.key)
+
+        if binding != None:
+            self.key_bindings.run(*binding)
+
+            #Editing an entry from the history makes it the text being typed.
+            if binding[0] == "backspace":
+                self.history_index = None
+
+        elif self.class_ref.key >= keymap.FIRST_CHARACTER and self.class_ref.key <= keymap.LAST_CHARACTER:
+            self.history_index = None
+
             #Insert the given char at the current cursor position. Since python strings are immutable we create a new string
             #consisting of the previous string split where the cursor is plus the added character.
             text_before = self.text[:self.cursor_pos]
@@ -174,41 +354,135 @@ class BasicInput():
             #Move the cursor's position.
             self.cursor_pos += 1
 
-        #Backspace
-        elif self.class_ref.key == 8:
-            #If the line isn't empty delete the corresponding character.
-            if self.cursor_pos > 0:
-                #Copy all the text in the current line except the char to the left of the cursor.
-                self.text = self.text[:self.cursor_pos - 1] + self.text[self.cursor_pos:]
-                self.cursor_pos -= 1
 
-        elif self.class_ref.key == curses.KEY_LEFT:
-            #Move the cursor.
-            if self.cursor_pos > 0:
-                self.cursor_pos -= 1
+    def delete_previous_char(self) -> None:
+        #If the line isn't empty delete the corresponding character.
+        if self.cursor_pos > 0:
+            #Copy all the text in the current line except the char to the left of the cursor.
+            self.text = self.text[:self.cursor_pos - 1] + self.text[self.cursor_pos:]
+            self.cursor_pos -= 1
+
+
+    def cursor_left(self) -> None:
+        #Move the cursor.
+        if self.cursor_pos > 0:
+            self.cursor_pos -= 1
+
+
+    def cursor_right(self) -> None:
+        #Move the cursor.
+        if self.cursor_pos < len(self.text):
+            self.cursor_pos += 1
+
+
+    #Start key.
+    def cursor_line_start(self) -> None:
+        self.cursor_pos = 0
+
+
+    #End key.
+    def cursor_line_end(self) -> None:
+        self.cursor_pos = len(self.text)
+
 
-        elif self.class_ref.key == curses.KEY_RIGHT:
-            #Move the cursor.
-            if self.cursor_pos < len(self.text):
-                self.cursor_pos += 1
+    #Up key. Shows the previous entry of the history starting with the text that was typed.
+    def history_previous(self) -> None:
+        entries = self.history_entries()
 
-        #Start key.
-        elif self.class_ref.key == curses.KEY_HOME:
-            self.cursor_pos = 0
+        if self.history_index == None:
+            self.history_prefix = self.text
+            start = len(entries)
+        else:
+            start = self.history_index
+
+        for index in range(start - 1, -1, -1):
+            if entries[index].startswith(self.history_prefix) and entries[index] != self.text:
+                self.show_history_entry(index, entries[index])
+                return
+
+
+    #Down key. Shows the next entry of the history starting with the text that was typed, after the newest one it's the typed
+    #text again.
+    def history_next(self) -> None:
+        if self.history_index == None:
+            return
+
+        entries = self.history_entries()
+
+        for index in range(self.history_index + 1, len(entries)):
+            if entries[index].startswith(self.history_prefix) and entries[index] != self.text:
+                self.show_history_entry(index, entries[index])
+                return
 
-        #End key.
-        elif self.class_ref.key == curses.KEY_END:
-            self.cursor_pos = len(self.text)
+        self.show_history_entry(None, self.history_prefix)
+
+
+    def history_entries(self) -> list[str]:
+        if self.history_name == None or self.class_ref.prompt_history == None:
+            return []
+
+        return list(self.class_ref.prompt_history.get(self.history_name))
+
+
+    def show_history_entry(self, index: Union[int, None], text: str) -> None:
+        self.history_index = index
+        self.text = text
+        self.cursor_pos = len(text)
 
 
     def display(self) -> None:
+        #When the text is wider than the console it's scrolled, so the cursor is always visible. The last column is left empty,
+        #curses can't print in the lowermost right corner.
+        width = self.class_ref.x_size - self.x_pos - 1
+        text = self.prompt + self.text
+        cursor_x = len(self.prompt) + self.cursor_pos
+        start = max(0, cursor_x - width + 1)
+
         #Print the prompt and entered text.
-        self.class_ref.stdscr.addstr(self.y_pos, self.x_pos, self.prompt + self.text, self.colour)
-        #Print the escape key reminder.
-        self.class_ref.stdscr.addstr(self.y_pos, self.x_pos + len(self.prompt) + len(self.text) + 2, "(ESC to cancel)", self.colour)
+        self.class_ref.stdscr.addstr(self.y_pos, self.x_pos, text[start:start + width], self.colour)
+
+        #Print the escape key reminder, if there's room for it.
+        reminder_x = len(text) - start + 2
+        if reminder_x + len("(ESC to cancel)") <= width:
+            self.class_ref.stdscr.addstr(self.y_pos, self.x_pos + reminder_x, "(ESC to cancel)", self.colour)
 
         #Print the cursor. Detect if you are in the last char and react accordingly.
         if self.cursor_pos == len(self.text):
-            self.class_ref.stdscr.addstr(self.y_pos, self.cursor_pos + len(self.prompt), " ", self.cursor_colour)
+            self.class_ref.stdscr.addstr(self.y_pos, self.x_pos + cursor_x - start, " ", self.cursor_colour)
         else:
-            self.class_ref.stdscr.addstr(self.y_pos, self.cursor_pos + len(self.prompt), self.text[self.cursor_pos], self.cursor_colour_over_text)
\ No newline at end of file
+            self.class_ref.stdscr.addstr(self.y_pos, self.x_pos + cursor_x - start, self.text[self.cursor_pos], self.cursor_colour_over_text)
+
+
+
+#A simple prompt, with default text and the option to change it for a specified period of time. Beware that the prompt class
+#only takes care of the actual text of the prompt, printing has to be handled by the user.
+class Prompt:
+    def __init__(self, default_prompt: str, restore_time_ms: int):
+        self.default_prompt = default_prompt
+        #How long the modified prompt will last in ms before being changed back to the default prompt.
+        self.restore_time_ms = restore_time_ms
+
+        self.prompt = default_prompt
+        self.restore_time_counter = 0
+        self.prompt_enabled = True
+        #If it's a list every new prompt is also appended to it, it's used to collect the output of the editor when it runs
+        #without a terminal.
+        self.log = None
+
+
+    def toggle_prompt(self) -> None:
+        self.prompt_enabled = not self.prompt_enabled
+
+
+    def change_prompt(self, new_prompt: str) -> None:
+        self.prompt = new_prompt
+        self.restore_time_counter = time.time()
+
+        if self.log != None:
+            self.log.append(new_prompt)
+
+
+    #Changes the new prompt back to the default prompt once the specified time has passed. Has to be called each program loop.
+    def prompt_handler(self) -> None:
+        if time.time() > self.restore_time_counter + self.restore_time_ms:
+            self.prompt = self.default_prompt